@@ -1,10 +1,20 @@
-from fastapi import APIRouter
-from app.core.auth import auth_manager
+from fastapi import APIRouter, Depends
+from fastapi.security import HTTPAuthorizationCredentials
+from app.core.auth import auth_manager, get_current_user, security
 
 router = APIRouter()
 
 @router.post("/token")
 async def create_token(user_id: str):
     """Create authentication token."""
-    access_token = auth_manager.create_access_token(data={"sub": user_id})
-    return {"access_token": access_token, "token_type": "bearer"}
\ No newline at end of file
+    access_token = auth_manager.issue_token(user_id)
+    return {"access_token": access_token, "token_type": "bearer"}
+
+@router.post("/revoke")
+async def revoke_token(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    current_user: dict = Depends(get_current_user)
+):
+    """Revoke the bearer token this request is made with."""
+    await auth_manager.revoke(credentials.credentials, current_user)
+    return {"revoked": True, "user_id": current_user.get("sub")}
\ No newline at end of file
@@ -1,15 +1,30 @@
-import io
+import json
 import time
+import asyncio
 import logging
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException
+from contextlib import AsyncExitStack, nullcontext
+from pathlib import Path
+from typing import List, Optional
+from fastapi import APIRouter, UploadFile, File, Form, Depends, HTTPException, Query
 from fastapi.responses import StreamingResponse
-from PIL import Image
+from starlette.background import BackgroundTask
 
-from app.models.schemas import ProcessingResponse, ImageFormat
+from app.models.schemas import ProcessingResponse, ImageFormat, MaskMode, EncodePreset, OutputMode
 from app.core.auth import get_current_user
 from app.core.rate_limiter import rate_limiter
-from app.core.model_manager import model_manager
+from app.core.inference_pool import inference_pool
+from app.core.model_registry import DEFAULT_MODEL, model_registry
+from app.core.startup import startup_state
+from app.core.url_fetcher import url_fetcher, url_filename
+from app.core import tracing
+from app.core import metrics
 from app.services.file_validator import FileValidator
+from app.services.pipeline import process_source
+from app.services.mask_output import output_extension, output_media_type
+from app.services.postprocessing import MASK_THRESHOLD
+from app.config.settings import settings
+from app.utils.responses import iter_buffer
+from app.utils.zip_stream import ZipStreamWriter
 from app.models.exceptions import ValidationException, ProcessingException, APIException
 
 logger = logging.getLogger(__name__)
@@ -17,72 +32,281 @@ router = APIRouter()
 
 @router.post("/remove-background", response_model=ProcessingResponse)
 async def remove_background(
-    file: UploadFile = File(...),
+    file: Optional[UploadFile] = File(None),
+    url: Optional[str] = Form(None, description="Image URL to fetch instead of uploading a file"),
     output_format: ImageFormat = ImageFormat.PNG,
+    mask_mode: MaskMode = MaskMode.BINARY,
+    threshold: float = Query(MASK_THRESHOLD, ge=0.0, le=1.0),
+    preset: Optional[EncodePreset] = None,
+    output: OutputMode = OutputMode.CUTOUT,
+    model: Optional[str] = Query(None, description="Registered model name; the default model when omitted"),
     current_user: dict = Depends(get_current_user)
 ):
-    """Remove background from uploaded image."""
-    start_time = time.time()
-    
+    """Remove background from an uploaded image, or one fetched from ``url``.
+
+    ``output=mask`` returns only the 8-bit alpha as a PNG/WEBP, ``output=rle``
+    and ``output=bbox`` return it as JSON; none of them composite the image.
+    """
+    startup_state.ensure_ready()
+
     user_id = current_user.get("sub", "anonymous")
     if not await rate_limiter.check_rate_limit(user_id):
         raise HTTPException(
             status_code=429,
             detail="Rate limit exceeded. Please try again later."
         )
-    
+
+    # The trace ends after the body has been streamed (see the background
+    # task below); Server-Timing covers everything up to the headers.
+    trace = tracing.start_trace(
+        "remove_background", output_format=output_format.value, mask_mode=mask_mode.value, output=output.value,
+        model=model or DEFAULT_MODEL, user=user_id
+    )
+    try:
+        async with inference_pool.reserve():
+            return await _remove_background(file, url, output_format, mask_mode, threshold, preset, output, model,
+                                            trace)
+    except Exception as e:
+        trace.finish(error=getattr(e, "error_code", type(e).__name__))
+        raise
+
+async def _remove_background(file: Optional[UploadFile], url: Optional[str], output_format: ImageFormat,
+                             mask_mode: MaskMode, threshold: float, preset: Optional[EncodePreset],
+                             output: OutputMode, model: Optional[str], trace: tracing.Trace) -> StreamingResponse:
+    remote = None
     try:
-        FileValidator.validate_image_file(file)
-        image_data = await file.read()
-        image = await FileValidator.validate_image_content(image_data)
-        
-        original_size = image.size
-        logger.info(f"Processing image with size: {original_size}")
-        
-        processed_image = await model_manager.process_image(image)
-        
-        output_buffer = io.BytesIO()
-        
-        if output_format == ImageFormat.JPEG:
-            bg = Image.new("RGB", processed_image.size, (255, 255, 255))
-            bg.paste(processed_image, mask=processed_image.split()[-1])
-            processed_image = bg
-        
-        processed_image.save(output_buffer, format=output_format.value.upper())
-        output_buffer.seek(0)
-        
-        processing_time = time.time() - start_time
+        if (file is None) == (url is None):
+            raise ValidationException("Send either an image file or an image url")
+        if url is not None:
+            # Hashed and decoded for the model while it downloads
+            remote = await url_fetcher.fetch(url)
+            filename = remote.filename
+            output_buffer, original_size, cache_status, frames = await process_source(
+                remote.source, output_format, mask_mode, threshold, preset, output, model,
+                digest=remote.digest, model_input=remote.model_input
+            )
+        else:
+            FileValidator.validate_image_file(file)
+            filename = file.filename
+            # UploadFile spools to a temp file past 1MB, so the upload is
+            # read from there instead of being loaded into memory.
+            output_buffer, original_size, cache_status, frames = await process_source(
+                file.file, output_format, mask_mode, threshold, preset, output, model
+            )
+
+        processing_time = trace.root.duration_ms / 1000
         file_size = output_buffer.getbuffer().nbytes
-        
+        trace.root.attributes.update(
+            original_size=f"{original_size[0]}x{original_size[1]}", output_bytes=file_size, cache=cache_status
+        )
+        if output == OutputMode.CUTOUT:
+            filename = f"processed_{filename}"
+        else:
+            extension = output_extension(output, output_format)
+            filename = f"{Path(filename or 'image').stem}_{output.value}.{extension}"
+
+        headers = {
+            "Content-Disposition": f"attachment; filename={filename}",
+            "Content-Length": str(file_size),
+            "X-Processing-Time": str(processing_time),
+            "X-Original-Size": f"{original_size[0]}x{original_size[1]}",
+            "X-File-Size": str(file_size),
+            "X-Cache": cache_status,
+            "Server-Timing": trace.server_timing(),
+            "X-Trace-Id": trace.trace_id
+        }
+        if frames is not None:
+            headers.update({
+                "X-Frames": str(frames["total"]),
+                "X-Frames-Inferred": str(frames["inferred"]),
+                "X-Frames-Reused": str(frames["reused"]),
+                "X-Frames-Warped": str(frames["warped"])
+            })
+
         return StreamingResponse(
-            io.BytesIO(output_buffer.getvalue()),
-            media_type=f"image/{output_format.value}",
-            headers={
-                "Content-Disposition": f"attachment; filename=processed_{file.filename}",
-                "X-Processing-Time": str(processing_time),
-                "X-Original-Size": f"{original_size[0]}x{original_size[1]}",
-                "X-File-Size": str(file_size)
-            }
+            iter_buffer(output_buffer),
+            media_type=output_media_type(output, output_format),
+            headers=headers,
+            background=BackgroundTask(trace.finish)
         )
-        
+
     except ValidationException as e:
-        logger.error(f"Validation error: {str(e)}")
+        # Logged once, with its error code, by the API exception handler
         raise APIException(
             message=str(e),
             status_code=400,
             error_code="VALIDATION_ERROR"
         )
     except ProcessingException as e:
-        logger.error(f"Processing error: {str(e)}")
+        logger.error("Processing error: %s", e)
         raise APIException(
             message=str(e),
             status_code=500,
             error_code="PROCESSING_ERROR"
         )
     except Exception as e:
-        logger.error(f"Unexpected error: {str(e)}", exc_info=True)
+        logger.error("Unexpected error: %s", e, exc_info=True)
         raise APIException(
             message="Internal server error",
             status_code=500,
             error_code="INTERNAL_ERROR"
-        )
\ No newline at end of file
+        )
+    finally:
+        if remote is not None:
+            remote.source.close()
+
+@router.post("/remove-background/batch")
+async def remove_background_batch(
+    files: Optional[List[UploadFile]] = File(None),
+    urls: Optional[List[str]] = Form(None, description="Image URLs to fetch, processed after any files"),
+    output_format: ImageFormat = ImageFormat.PNG,
+    mask_mode: MaskMode = MaskMode.BINARY,
+    threshold: float = Query(MASK_THRESHOLD, ge=0.0, le=1.0),
+    preset: Optional[EncodePreset] = None,
+    output: OutputMode = OutputMode.CUTOUT,
+    model: Optional[str] = Query(None, description="Registered model name; the default model when omitted"),
+    current_user: dict = Depends(get_current_user)
+):
+    """Remove backgrounds from many images (or one zip of images, or image URLs) in one request.
+
+    Results are streamed back as a zip in completion order; ``manifest.json``
+    at the end of the archive lists per-item status and errors. URLs are
+    downloaded up to ``URL_PREFETCH`` items ahead of the ones being
+    processed, so downloads overlap with inference.
+    """
+    startup_state.ensure_ready()
+    user_id = current_user.get("sub", "anonymous")
+    model_registry.resolve(model)
+    files = files or []
+    urls = urls or []
+    if not files and not urls:
+        raise ValidationException("Send image files or image urls")
+
+    # Admission counts the whole batch as one in-flight request and is held
+    # until the streamed response finishes.
+    admission = AsyncExitStack()
+    await admission.enter_async_context(inference_pool.reserve())
+    trace = tracing.start_trace("remove_background_batch", output_format=output_format.value,
+                                mask_mode=mask_mode.value, output=output.value, model=model or DEFAULT_MODEL,
+                                user=user_id)
+    admission.callback(trace.finish)
+
+    archive = None
+    try:
+        if len(files) == 1 and FileValidator.is_archive(files[0]):
+            archive, entries = await asyncio.to_thread(FileValidator.open_archive, files[0].file)
+            names = [info.filename for info in entries]
+        else:
+            entries = files
+            names = [file.filename or f"image_{index}" for index, file in enumerate(files)]
+        if len(entries) + len(urls) > settings.BATCH_MAX_ITEMS:
+            raise ValidationException(
+                f"Too many images. Maximum per batch: {settings.BATCH_MAX_ITEMS}"
+            )
+        names += [url_filename(url) for url in urls]
+    except BaseException:
+        await admission.aclose()
+        raise
+
+    semaphore = asyncio.Semaphore(max(1, settings.BATCH_REQUEST_CONCURRENCY))
+    # A URL item holds a download slot from its fetch until it is processed,
+    # which bounds how many downloaded images wait for a processing slot
+    downloads = asyncio.Semaphore(max(1, settings.BATCH_REQUEST_CONCURRENCY) + max(0, settings.URL_PREFETCH))
+
+    async def process_item(index: int):
+        name = names[index]
+        url = urls[index - len(entries)] if index >= len(entries) else None
+        item = {"index": index, "filename": name, "status": "error"}
+        if url is not None:
+            item["url"] = url
+        started = time.perf_counter()
+
+        # Each image counts against the caller's rate limit
+        if not await rate_limiter.check_rate_limit(user_id):
+            item.update(error="Rate limit exceeded", error_code="RATE_LIMITED")
+            return item, None
+
+        async with downloads if url is not None else nullcontext():
+            with tracing.span("item", index=index):
+                source = None
+                remote = None
+                try:
+                    if url is not None:
+                        # Fetched outside the processing slots, while earlier items are inferred
+                        remote = await url_fetcher.fetch(url)
+                        source = remote.source
+                    async with semaphore:
+                        if remote is None and archive is not None:
+                            source = await asyncio.to_thread(
+                                FileValidator.extract_archive_entry, archive, entries[index]
+                            )
+                        elif remote is None:
+                            FileValidator.validate_image_file(entries[index])
+                            source = entries[index].file
+
+                        output_buffer, original_size, cache_status, frames = await process_source(
+                            source, output_format, mask_mode, threshold, preset, output, model,
+                            digest=remote.digest if remote else None,
+                            model_input=remote.model_input if remote else None
+                        )
+                    item.update(
+                        status="ok",
+                        output=f"{index:04d}_{Path(name).stem}.{output_extension(output, output_format)}",
+                        original_size={"width": original_size[0], "height": original_size[1]},
+                        file_size=output_buffer.getbuffer().nbytes,
+                        cache=cache_status
+                    )
+                    if frames is not None:
+                        item["frames"] = frames
+                    return item, output_buffer
+                except APIException as e:
+                    item.update(error=e.message, error_code=e.error_code)
+                except Exception as e:
+                    logger.error("Unexpected error in batch item %d: %s", index, e, exc_info=True)
+                    item.update(error="Internal server error", error_code="INTERNAL_ERROR")
+                finally:
+                    item["processing_time"] = time.perf_counter() - started
+                    if source is not None and (archive is not None or remote is not None):
+                        source.close()
+                return item, None
+
+    async def stream_results():
+        writer = ZipStreamWriter()
+        tasks = [asyncio.create_task(process_item(index)) for index in range(len(names))]
+        manifest = []
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                item, output_buffer = await next_done
+                manifest.append(item)
+                if item["status"] != "ok":
+                    metrics.errors.inc(item["error_code"])
+                if output_buffer is not None:
+                    await asyncio.to_thread(writer.add, item["output"], output_buffer)
+                    yield writer.drain()
+
+            manifest.sort(key=lambda entry: entry["index"])
+            succeeded = sum(1 for entry in manifest if entry["status"] == "ok")
+            writer.add_bytes("manifest.json", json.dumps({
+                "total": len(manifest),
+                "succeeded": succeeded,
+                "failed": len(manifest) - succeeded,
+                "items": manifest
+            }, indent=2).encode("utf-8"))
+            writer.close()
+            yield writer.drain()
+        finally:
+            for task in tasks:
+                task.cancel()
+            if archive is not None:
+                archive.close()
+            await admission.aclose()
+
+    return StreamingResponse(
+        stream_results(),
+        media_type="application/zip",
+        headers={
+            "Content-Disposition": "attachment; filename=processed_batch.zip",
+            "X-Batch-Size": str(len(names)),
+            "X-Trace-Id": trace.trace_id
+        }
+    )
@@ -1,23 +1,47 @@
 import logging
 from fastapi import APIRouter
+from app.config.settings import settings
+from app.core.startup import startup_state
 from app.models.schemas import HealthResponse
+from app.utils.responses import SafeJSONResponse
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
 @router.get("/", response_model=HealthResponse)
 async def health_check():
-    """Health check endpoint."""
+    """Readiness check: 503 until the model is loaded and warmed up."""
     try:
-        model_status = True
+        uptime = f"{startup_state.uptime_seconds:.0f}s"
+        startup = startup_state.get_stats()
+        if startup_state.ready:
+            return HealthResponse.create_healthy_response(
+                model_loaded=True,
+                uptime=uptime,
+                startup=startup
+            )
         
-        return HealthResponse.create_healthy_response(
-            model_loaded=model_status,
-            uptime="Service running normally"
+        if startup_state.error is not None:
+            response = HealthResponse.create_unhealthy_response(
+                reason=f"Startup failed: {startup_state.error}",
+                startup=startup
+            )
+        else:
+            response = HealthResponse.create_starting_response(uptime=uptime, startup=startup)
+        return SafeJSONResponse(
+            status_code=503,
+            content=response.dict(),
+            headers={"Retry-After": str(settings.STARTUP_RETRY_AFTER)}
         )
         
     except Exception as e:
-        logger.error(f"Health check failed: {e}")
-        return HealthResponse.create_unhealthy_response(
-            reason=f"Health check failed: {str(e)}"
+        logger.error("Health check failed: %s", e)
+        return SafeJSONResponse(
+            status_code=503,
+            content=HealthResponse.create_unhealthy_response(reason=f"Health check failed: {str(e)}").dict()
         )
+
+@router.get("/live")
+async def liveness_check():
+    """Liveness check: the process is up, whether or not the model is ready."""
+    return {"status": "alive", "uptime": f"{startup_state.uptime_seconds:.0f}s"}
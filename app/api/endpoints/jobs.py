@@ -0,0 +1,72 @@
+import logging
+from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Query, Response
+
+from typing import Optional
+from app.models.schemas import JobResponse, ImageFormat, MaskMode, EncodePreset, OutputMode
+from app.core.auth import get_current_user
+from app.core.rate_limiter import rate_limiter
+from app.core.job_queue import job_queue, MAX_PRIORITY
+from app.core.model_registry import model_registry
+from app.core.startup import startup_state
+from app.services.file_validator import FileValidator
+from app.services.mask_output import output_media_type, validate_output
+from app.services.postprocessing import MASK_THRESHOLD
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+@router.post("/jobs", response_model=JobResponse, status_code=202)
+async def create_job(
+    file: UploadFile = File(...),
+    output_format: ImageFormat = ImageFormat.PNG,
+    mask_mode: MaskMode = MaskMode.BINARY,
+    threshold: float = Query(MASK_THRESHOLD, ge=0.0, le=1.0),
+    priority: int = Query(0, ge=0, le=MAX_PRIORITY),
+    preset: Optional[EncodePreset] = None,
+    output: OutputMode = OutputMode.CUTOUT,
+    model: Optional[str] = Query(None, description="Registered model name; the default model when omitted"),
+    current_user: dict = Depends(get_current_user)
+):
+    """Queue an image for background removal and return its job id."""
+    startup_state.ensure_ready()
+    user_id = current_user.get("sub", "anonymous")
+    if not await rate_limiter.check_rate_limit(user_id):
+        raise HTTPException(
+            status_code=429,
+            detail="Rate limit exceeded. Please try again later."
+        )
+
+    FileValidator.validate_image_file(file)
+    validate_output(output, output_format)
+    model_registry.resolve(model)
+    # Reject undecodable uploads now rather than when the job runs
+    await FileValidator.open_image(file.file)
+
+    job = await job_queue.submit(
+        file.file, user_id, output_format, mask_mode, threshold, priority,
+        filename=file.filename, preset=preset, output=output, model=model
+    )
+    logger.info("Queued job %s (priority=%d)", job["id"], priority)
+    return JobResponse.from_job(job)
+
+@router.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str, current_user: dict = Depends(get_current_user)):
+    """Get the status of a job."""
+    job = await job_queue.get(job_id, current_user.get("sub", "anonymous"))
+    return JobResponse.from_job(job)
+
+@router.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str, current_user: dict = Depends(get_current_user)):
+    """Download the output of a completed job."""
+    job, result = await job_queue.get_result(job_id, current_user.get("sub", "anonymous"))
+    return Response(
+        content=result,
+        media_type=output_media_type(
+            OutputMode(job.get("output", OutputMode.CUTOUT.value)), ImageFormat(job["output_format"])
+        ),
+        headers={
+            "Content-Disposition": f"attachment; filename=processed_{job.get('filename') or job['id']}",
+            "X-Processing-Time": str(job.get("processing_time")),
+            "X-Cache": job.get("cache", "MISS")
+        }
+    )
@@ -1,17 +1,139 @@
-import time
-from fastapi import APIRouter, Depends
-from app.core.auth import get_current_user
-from app.core.model_manager import model_manager
+import secrets
+from fastapi import APIRouter, Depends, Request, Response
+from app.core.auth import auth_manager, get_current_user
+from app.core.model_registry import model_registry
+from app.core.inference_pool import inference_pool
+from app.core.worker_pool import worker_pool
+from app.core.result_cache import mask_cache
+from app.core.job_queue import job_queue
+from app.core.rate_limiter import rate_limiter
+from app.core.startup import startup_state
+from app.core.tracing import exporter
+from app.core.logging_setup import log_pipeline
+from app.core.thread_topology import thread_topology
+from app.core.url_fetcher import url_fetcher
+from app.core.metrics import registry
 from app.config.settings import settings
+from app.models.exceptions import AuthenticationException
 
 router = APIRouter()
 
+def _queue_depths():
+    return {
+        ("batch",): sum(entry.scheduler.queue.qsize() for entry in model_registry.entries.values()
+                        if entry.scheduler.queue is not None),
+        ("workers",): worker_pool.get_stats()["pending"]
+    }
+
+registry.gauge("rmbg_inference_in_flight", "Requests admitted to the inference pool.",
+               callback=lambda: inference_pool.in_flight)
+# The job queue depth needs store I/O, so it is set on each scrape instead
+queue_depth = registry.gauge("rmbg_queue_depth", "Items waiting per queue.", ("queue",), callback=_queue_depths)
+registry.counter("rmbg_inference_rejected_total", "Requests rejected by inference backpressure.",
+                 callback=lambda: inference_pool.rejected)
+registry.counter("rmbg_mask_cache_requests_total", "Mask cache lookups by result.", ("result",),
+                 callback=lambda: {("hit",): mask_cache.hits + mask_cache.redis_hits, ("miss",): mask_cache.misses})
+registry.counter("rmbg_jobs_total", "Asynchronous jobs by final state.", ("state",),
+                 callback=lambda: {("completed",): job_queue.completed, ("failed",): job_queue.failed,
+                                   ("expired",): job_queue.expired})
+registry.gauge("rmbg_model_ready", "Whether the model is loaded and warmed up.",
+               callback=lambda: int(startup_state.ready))
+registry.gauge("rmbg_uptime_seconds", "Seconds since the API process started.",
+               callback=lambda: startup_state.uptime_seconds)
+registry.histogram("rmbg_batch_size", "Images per batched forward pass.",
+                   model_registry.batch_size_histogram.buckets).adopt(model_registry.batch_size_histogram)
+registry.histogram("rmbg_batch_queue_wait_seconds", "Time a request waited for its batch.",
+                   model_registry.queue_wait_histogram.buckets).adopt(model_registry.queue_wait_histogram)
+
+def _per_model(field: str):
+    return lambda: {(model_id,): getattr(entry, field) for model_id, entry in model_registry.entries.items()}
+
+registry.counter("rmbg_model_loads_total", "Model loads (including reloads after eviction) per model revision.",
+                 ("model",), callback=_per_model("loads"))
+registry.counter("rmbg_model_load_failures_total", "Failed model loads per model revision.",
+                 ("model",), callback=_per_model("load_failures"))
+registry.counter("rmbg_model_evictions_total", "Models unloaded to stay within MODEL_MEMORY_BUDGET_MB.",
+                 ("model",), callback=_per_model("evictions"))
+registry.counter("rmbg_model_requests_total", "Inference requests per model revision.",
+                 ("model",), callback=_per_model("requests"))
+registry.gauge("rmbg_model_loaded", "Whether a model revision is currently loaded.", ("model",),
+               callback=lambda: {(model_id,): int(entry.manager.is_loaded)
+                                 for model_id, entry in model_registry.entries.items()})
+registry.gauge("rmbg_model_memory_bytes", "Estimated memory of each model revision when loaded.",
+               ("model",), callback=_per_model("memory_bytes"))
+registry.counter("rmbg_model_swaps_total", "Model revision hot-swaps.", callback=lambda: model_registry.swaps)
+registry.counter("rmbg_log_records_dropped_total", "Log records dropped because the log queue was full.",
+                 callback=lambda: log_pipeline.get_stats()["dropped"])
+
+registry.counter("rmbg_url_fetches_total", "Image URL downloads by result.", ("result",),
+                 callback=lambda: {("ok",): url_fetcher.fetched, ("failed",): url_fetcher.failed})
+registry.counter("rmbg_url_fetch_bytes_total", "Bytes downloaded from image URLs.",
+                 callback=lambda: url_fetcher.bytes)
+
+registry.counter("rmbg_auth_requests_total", "Authenticated calls by how the credential was checked.", ("path",),
+                 callback=lambda: {("api_key",): auth_manager.api_key_hits, ("cache",): auth_manager.cache_hits,
+                                   ("verified",): auth_manager.verified, ("rejected",): auth_manager.rejected})
+registry.gauge("rmbg_auth_cache_entries", "Verified tokens held in the auth cache.",
+               callback=lambda: len(auth_manager.cache))
+registry.gauge("rmbg_auth_revoked_tokens", "Revoked tokens that have not expired yet.",
+               callback=lambda: len(auth_manager.revocations))
+
+def _topology(field: str):
+    return lambda: thread_topology.get_stats()[field]
+
+registry.gauge("rmbg_cpus", "CPUs available to the API process.", callback=_topology("cpus"))
+registry.gauge("rmbg_torch_threads", "Torch intra-op threads per model process.",
+               callback=_topology("torch_threads"))
+registry.gauge("rmbg_torch_interop_threads", "Torch inter-op threads per model process.",
+               callback=_topology("torch_interop_threads"))
+registry.gauge("rmbg_inference_workers", "Image executor workers (decode, postprocessing, encoding).",
+               callback=_topology("inference_workers"))
+registry.gauge("rmbg_compute_threads_per_cpu", "Torch and executor threads per available CPU; above 1 can oversubscribe under load.",
+               callback=_topology("compute_threads_per_cpu"))
+
+def verify_scrape_token(request: Request):
+    """Require ``METRICS_TOKEN`` as a bearer token when it is configured."""
+    if not settings.METRICS_TOKEN:
+        return
+    authorization = request.headers.get("Authorization", "")
+    if not secrets.compare_digest(authorization, f"Bearer {settings.METRICS_TOKEN}"):
+        raise AuthenticationException("Invalid metrics token")
+
 @router.get("/")
 async def get_metrics(current_user: dict = Depends(get_current_user)):
     """Get API metrics."""
-    return {
-        "model_loaded": model_manager.is_loaded,
+    default = model_registry.default.manager
+    metrics = {
+        "model_loaded": default.is_loaded,
         "device": settings.DEVICE,
-        "model_name": settings.MODEL_NAME,
-        "uptime": time.time()
+        "model_name": default.model_id,
+        "inference_backend": default.backend_name,
+        "uptime": startup_state.uptime_seconds,
+        "started_at": startup_state.started_at,
+        "inference_mode": settings.INFERENCE_MODE,
+        "startup": startup_state.get_stats(),
+        "batching": model_registry.default.scheduler.get_stats(),
+        "models": model_registry.get_stats(),
+        "inference_pool": inference_pool.get_stats(),
+        "mask_cache": mask_cache.get_stats(),
+        "jobs": job_queue.get_stats(),
+        "rate_limiter": rate_limiter.get_stats(),
+        "tracing": exporter.get_stats(),
+        "logging": log_pipeline.get_stats(),
+        "threads": thread_topology.get_stats(),
+        "url_fetcher": url_fetcher.get_stats(),
+        "auth": auth_manager.get_stats()
     }
+
+    if settings.INFERENCE_MODE == "workers":
+        metrics["model_loaded"] = any(w.ready for w in worker_pool.workers.values())
+        metrics["workers"] = worker_pool.get_stats()
+
+    return metrics
+
+@router.get("/prometheus")
+async def get_prometheus_metrics(_: None = Depends(verify_scrape_token)):
+    """Metrics in the Prometheus text exposition format."""
+    if job_queue.is_running:
+        queue_depth.set(await job_queue.store.depth(), "jobs")
+    return Response(content=registry.render(), media_type=registry.content_type)
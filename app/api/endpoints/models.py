@@ -0,0 +1,39 @@
+import logging
+import secrets
+from fastapi import APIRouter, Depends, Query, Request
+from app.core.auth import get_current_user
+from app.core.model_registry import model_registry
+from app.config.settings import settings
+from app.models.exceptions import AuthenticationException, ValidationException
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+def verify_admin_token(request: Request):
+    """Require ``MODEL_ADMIN_TOKEN`` as a bearer token; swaps are disabled without one."""
+    if not settings.MODEL_ADMIN_TOKEN:
+        raise AuthenticationException("Model administration is disabled (MODEL_ADMIN_TOKEN is not set)")
+    authorization = request.headers.get("Authorization", "")
+    if not secrets.compare_digest(authorization, f"Bearer {settings.MODEL_ADMIN_TOKEN}"):
+        raise AuthenticationException("Invalid model admin token")
+
+@router.get("/models")
+async def list_models(current_user: dict = Depends(get_current_user)):
+    """Registered models, the revision each name serves and per-model load statistics."""
+    return model_registry.get_stats()
+
+@router.put("/models/{name}")
+async def swap_model(
+    name: str,
+    revision: str = Query(..., min_length=1, description="Branch, tag or commit to serve under this name"),
+    _: None = Depends(verify_admin_token)
+):
+    """Hot-swap the revision served under ``name``.
+
+    The new revision is loaded and warmed up before it takes over; requests
+    already running finish on the old one.
+    """
+    if settings.INFERENCE_MODE == "workers":
+        raise ValidationException("Revision swaps need INFERENCE_MODE=local")
+    entry = await model_registry.swap(name, revision)
+    return {"name": name, "model": entry.model_id, **entry.get_stats()}
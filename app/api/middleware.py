@@ -1,8 +1,10 @@
 import logging
+import time
 from datetime import datetime
 from fastapi import HTTPException
 from fastapi.applications import FastAPI
 
+from app.core import metrics
 from app.models.exceptions import APIException
 from app.models.schemas import ErrorResponse
 from app.utils.responses import SafeJSONResponse
@@ -15,6 +17,7 @@ def setup_exception_handlers(app: FastAPI):
     @app.exception_handler(APIException)
     async def api_exception_handler(request, exc: APIException):
         """Handle custom API exceptions."""
+        metrics.errors.inc(exc.error_code)
         try:
             error_response = ErrorResponse.create_error(
                 error=exc.message,
@@ -26,15 +29,17 @@ def setup_exception_handlers(app: FastAPI):
                 }
             )
             
-            logger.warning(f"API Exception [{exc.error_code}]: {exc.message}")
+            # Arguments are formatted on the log listener thread, not here
+            logger.warning("API Exception [%s]: %s", exc.error_code, exc.message)
             
             return SafeJSONResponse(
                 status_code=exc.status_code,
-                content=error_response.dict()
+                content=error_response.dict(),
+                headers=exc.headers
             )
             
         except Exception as handler_error:
-            logger.error(f"Error in API exception handler: {handler_error}")
+            logger.error("Error in API exception handler: %s", handler_error)
             return SafeJSONResponse(
                 status_code=exc.status_code,
                 content={
@@ -42,12 +47,14 @@ def setup_exception_handlers(app: FastAPI):
                     "error": exc.message,
                     "error_code": exc.error_code,
                     "timestamp": datetime.now().isoformat()
-                }
+                },
+                headers=exc.headers
             )
     
     @app.exception_handler(HTTPException)
     async def http_exception_handler(request, exc: HTTPException):
         """Handle FastAPI HTTP exceptions."""
+        metrics.errors.inc(f"HTTP_{exc.status_code}")
         try:
             error_message = str(exc.detail) if exc.detail else "HTTP error occurred"
             
@@ -61,7 +68,7 @@ def setup_exception_handlers(app: FastAPI):
                 }
             )
             
-            logger.info(f"HTTP Exception [{exc.status_code}]: {error_message}")
+            logger.info("HTTP Exception [%s]: %s", exc.status_code, error_message)
             
             return SafeJSONResponse(
                 status_code=exc.status_code,
@@ -69,7 +76,7 @@ def setup_exception_handlers(app: FastAPI):
             )
             
         except Exception as handler_error:
-            logger.error(f"Error in HTTP exception handler: {handler_error}")
+            logger.error("Error in HTTP exception handler: %s", handler_error)
             return SafeJSONResponse(
                 status_code=exc.status_code,
                 content={
@@ -83,8 +90,9 @@ def setup_exception_handlers(app: FastAPI):
     @app.exception_handler(Exception)
     async def general_exception_handler(request, exc: Exception):
         """Handle all other unexpected exceptions."""
+        metrics.errors.inc("INTERNAL_ERROR")
         try:
-            logger.error(f"Unexpected error: {str(exc)}", exc_info=True)
+            logger.error("Unexpected error: %s", exc, exc_info=True)
             
             error_response = ErrorResponse.create_error(
                 error="Internal server error",
@@ -102,7 +110,7 @@ def setup_exception_handlers(app: FastAPI):
             )
             
         except Exception as handler_error:
-            logger.error(f"Critical error in exception handler: {handler_error}")
+            logger.error("Critical error in exception handler: %s", handler_error)
             return SafeJSONResponse(
                 status_code=500,
                 content={
@@ -112,3 +120,41 @@ def setup_exception_handlers(app: FastAPI):
                     "timestamp": datetime.now().isoformat()
                 }
             )
+
+
+class MetricsMiddleware:
+    """ASGI middleware counting requests by route and status code.
+
+    Routes are labelled by name (the endpoint function, e.g. ``get_job``)
+    rather than by URL, so label cardinality stays bounded; duration is
+    measured to the response start.
+    """
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        started = time.perf_counter()
+        status = 500
+        
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                route = scope.get("route")
+                metrics.http_request_seconds.labels(getattr(route, "name", "unmatched")).observe(
+                    time.perf_counter() - started
+                )
+            await send(message)
+        
+        metrics.http_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            metrics.http_in_flight.dec()
+            route = scope.get("route")
+            metrics.http_requests.inc(scope["method"], getattr(route, "name", "unmatched"), status)
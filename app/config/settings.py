@@ -1,9 +1,28 @@
+import json
 import os
-from typing import List
+from typing import Dict, List
 from dotenv import load_dotenv
 
 load_dotenv()
 
+def _load_tuning(path: str) -> Dict:
+    """The file written by ``python -m benchmarks.tune``, or an empty one if there is none."""
+    if not path or not os.path.isfile(path):
+        return {}
+    try:
+        with open(path, encoding="utf-8") as tuning_file:
+            return json.load(tuning_file)
+    except (OSError, ValueError) as e:
+        raise ValueError(f"Invalid tuning file {path}: {e}") from e
+
+_TUNING_FILE = os.getenv("TUNING_FILE", "tuning.json")
+_TUNING = _load_tuning(_TUNING_FILE)
+_TUNED = {name: str(value) for name, value in _TUNING.get("settings", {}).items()}
+
+def _tuned(name: str, default: str) -> str:
+    """An environment variable, else the tuned value, else ``default``."""
+    return os.getenv(name, _TUNED.get(name, default))
+
 class Settings:
     """Application configuration settings with environment variable support."""
     
@@ -16,27 +35,166 @@ class Settings:
     SECRET_KEY: str = os.getenv("SECRET_KEY", "JahidHasanskjhgdkdjhskhgkgjhskf")
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    # Verified-token cache (0 disables); entries also expire with the token's exp
+    AUTH_CACHE_SIZE: int = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+    AUTH_CACHE_TTL: float = float(os.getenv("AUTH_CACHE_TTL", "300"))
+    AUTH_REVOCATION_BACKEND: str = os.getenv("AUTH_REVOCATION_BACKEND", "memory")  # memory | redis
+    AUTH_REVOCATION_SYNC_INTERVAL: float = float(os.getenv("AUTH_REVOCATION_SYNC_INTERVAL", "5"))
+    # Long-lived client keys as comma-separated USER:SHA256HEX_OF_KEY
+    API_KEYS: str = os.getenv("API_KEYS", "")
     
     # File Upload Limits
     MAX_FILE_SIZE: int = 50 * 1024 * 1024  # 50MB
-    ALLOWED_EXTENSIONS: set = {".jpg", ".jpeg", ".png", ".webp", ".bmp"}
+    ALLOWED_EXTENSIONS: set = {".jpg", ".jpeg", ".png", ".webp", ".bmp", ".gif"}
+    MAX_IMAGE_PIXELS: int = int(os.getenv("MAX_IMAGE_PIXELS", str(100_000_000)))
+    MAX_REQUEST_MEMORY_MB: int = int(os.getenv("MAX_REQUEST_MEMORY_MB", "1024"))  # estimated per image
     
     # Model Configuration
     MODEL_NAME: str = "briaai/RMBG-2.0"
+    MODEL_REVISION: str = os.getenv("MODEL_REVISION", "main")  # branch, tag or commit of MODEL_NAME
+    MODEL_INPUT_SIZE: int = 1024  # RMBG-2.0 runs at 1024x1024
     DEVICE: str = "cuda" if os.getenv("CUDA_AVAILABLE", "false").lower() == "true" else "cpu"
+    INFERENCE_BACKEND: str = os.getenv("INFERENCE_BACKEND", "eager")  # eager | traced | compiled | onnx | int8
+    INFERENCE_ARTIFACT_DIR: str = os.getenv("INFERENCE_ARTIFACT_DIR", "model_artifacts")  # traced/ONNX exports
+    ONNX_OPSET: int = int(os.getenv("ONNX_OPSET", "17"))
+    
+    # Preprocessing: resize and normalise straight into a reusable batch tensor
+    # instead of calling the model's processor (only used when its output matches)
+    PREPROCESS_NATIVE: bool = os.getenv("PREPROCESS_NATIVE", "true").lower() == "true"
+    PREPROCESS_CHANNELS_LAST: bool = os.getenv("PREPROCESS_CHANNELS_LAST", "false").lower() == "true"
+    
+    # Cold Start
+    MODEL_LOCAL_DIR: str = os.getenv("MODEL_LOCAL_DIR", "")  # pre-staged save_pretrained directory
+    MODEL_STATE_DICT: str = os.getenv("MODEL_STATE_DICT", "")  # .safetensors or .pt, memory-mapped
+    MODEL_OFFLINE: bool = os.getenv("MODEL_OFFLINE", "false").lower() == "true"  # never hit the network
+    WARMUP_BATCHES: int = int(os.getenv("WARMUP_BATCHES", "1"))
+    WARMUP_BATCH_SIZE: int = int(os.getenv("WARMUP_BATCH_SIZE", "1"))
+    STARTUP_RETRY_AFTER: int = int(os.getenv("STARTUP_RETRY_AFTER", "5"))
+    
+    # Model Registry
+    # Extra models requests can pick with ?model=NAME, as comma-separated
+    # NAME=REPO[@REVISION] entries; REPO may also be a save_pretrained directory.
+    # MODEL_NAME is always available as "default". Names pointing at the same
+    # revision share one loaded copy.
+    MODELS: str = os.getenv("MODELS", "")
+    MODEL_MEMORY_BUDGET_MB: int = int(os.getenv("MODEL_MEMORY_BUDGET_MB", "0"))  # 0 = no limit
+    MODEL_ADMIN_TOKEN: str = os.getenv("MODEL_ADMIN_TOKEN", "")  # bearer token for revision swaps, off when empty
+    
+    # Inference Batching
+    BATCH_MAX_SIZE: int = int(_tuned("BATCH_MAX_SIZE", "8"))
+    BATCH_MAX_WAIT_MS: float = float(os.getenv("BATCH_MAX_WAIT_MS", "15"))
+    
+    # Batch Endpoint
+    BATCH_MAX_ITEMS: int = int(os.getenv("BATCH_MAX_ITEMS", "256"))
+    BATCH_REQUEST_CONCURRENCY: int = int(os.getenv("BATCH_REQUEST_CONCURRENCY", "8"))
+    
+    # Mask Refinement (guided filter used by the "refined" mask mode)
+    GUIDED_FILTER_RADIUS: int = int(os.getenv("GUIDED_FILTER_RADIUS", "8"))  # pixels at mask resolution
+    GUIDED_FILTER_EPS: float = float(os.getenv("GUIDED_FILTER_EPS", "1e-4"))
+    REFINE_TILE_SIZE: int = int(os.getenv("REFINE_TILE_SIZE", "256"))  # full-resolution pixels
+    REFINE_WORKERS: int = int(os.getenv("REFINE_WORKERS", str(os.cpu_count() or 1)))
+    
+    # Output Encoding
+    ENCODE_PRESET: str = os.getenv("ENCODE_PRESET", "balanced")  # fast | balanced | small | archival
+    
+    # Animated Inputs (GIF, WEBP, APNG)
+    ANIMATION_MAX_FRAMES: int = int(os.getenv("ANIMATION_MAX_FRAMES", "300"))
+    # Frames whose mean grey-level difference from the last inferred frame is at
+    # most this (0-255, on a small thumbnail) reuse its mask, shifted if the
+    # frame only moved; 0 re-infers every frame that changed at all
+    ANIMATION_REUSE_THRESHOLD: float = float(os.getenv("ANIMATION_REUSE_THRESHOLD", "2.0"))
+    ANIMATION_WARP: bool = os.getenv("ANIMATION_WARP", "true").lower() == "true"
+    
+    # Inference Mode: "local" runs the model in this process, "workers" runs
+    # it in a fixed pool of inference processes fed through shared memory
+    INFERENCE_MODE: str = os.getenv("INFERENCE_MODE", "local")
+    INFERENCE_PROCESSES: int = int(os.getenv("INFERENCE_PROCESSES", "2"))
+    WORKER_HEALTH_INTERVAL: float = float(os.getenv("WORKER_HEALTH_INTERVAL", "5"))
+    # A worker that keeps exiting is restarted after a doubling delay, and
+    # given up on after WORKER_MAX_RESTARTS exits in a row without becoming ready (0 = never)
+    WORKER_RESTART_BACKOFF: float = float(os.getenv("WORKER_RESTART_BACKOFF", "5"))
+    WORKER_RESTART_BACKOFF_MAX: float = float(os.getenv("WORKER_RESTART_BACKOFF_MAX", "300"))
+    WORKER_MAX_RESTARTS: int = int(os.getenv("WORKER_MAX_RESTARTS", "5"))
+    
+    # Inference Executor
+    INFERENCE_EXECUTOR: str = os.getenv("INFERENCE_EXECUTOR", "thread")  # thread | process
+    INFERENCE_WORKERS: int = int(_tuned("INFERENCE_WORKERS", str(os.cpu_count() or 1)))
+    INFERENCE_MAX_IN_FLIGHT: int = int(os.getenv("INFERENCE_MAX_IN_FLIGHT", "32"))
+    INFERENCE_RETRY_AFTER: int = int(os.getenv("INFERENCE_RETRY_AFTER", "1"))
+    
+    # CPU Thread Topology
+    # Torch intra-op and inter-op threads (0 = torch's default, one per core).
+    # ``python -m benchmarks.tune`` measures these, INFERENCE_WORKERS and BATCH_MAX_SIZE
+    # together and writes the best to TUNING_FILE, which is read at startup;
+    # environment variables still take precedence over it.
+    TORCH_NUM_THREADS: int = int(_tuned("TORCH_NUM_THREADS", "0"))
+    TORCH_INTEROP_THREADS: int = int(_tuned("TORCH_INTEROP_THREADS", "0"))
+    TUNING_FILE: str = _TUNING_FILE
+    TUNED_SETTINGS: List[str] = sorted(name for name in _TUNED if name not in os.environ)
+    TUNED_FOR_CPUS: int = int(_TUNING.get("cpus", 0))
+    
+    # Remote URLs (images fetched by the server instead of uploaded)
+    URL_FETCH_ENABLED: bool = os.getenv("URL_FETCH_ENABLED", "true").lower() == "true"
+    URL_FETCH_TIMEOUT: float = float(os.getenv("URL_FETCH_TIMEOUT", "30"))  # seconds per download, in total
+    URL_FETCH_CONNECT_TIMEOUT: float = float(os.getenv("URL_FETCH_CONNECT_TIMEOUT", "5"))
+    URL_FETCH_MAX_CONNECTIONS: int = int(os.getenv("URL_FETCH_MAX_CONNECTIONS", "64"))
+    URL_FETCH_PER_HOST: int = int(os.getenv("URL_FETCH_PER_HOST", "8"))  # concurrent downloads per host
+    URL_FETCH_MAX_REDIRECTS: int = int(os.getenv("URL_FETCH_MAX_REDIRECTS", "3"))
+    URL_FETCH_ALLOWED_HOSTS: str = os.getenv("URL_FETCH_ALLOWED_HOSTS", "")  # comma-separated, empty = any
+    URL_FETCH_ALLOW_PRIVATE: bool = os.getenv("URL_FETCH_ALLOW_PRIVATE", "false").lower() == "true"
+    URL_PREFETCH: int = int(os.getenv("URL_PREFETCH", "4"))  # batch downloads ahead of processing
     
     # Redis Configuration
     REDIS_URL: str = os.getenv("REDIS_URL", "redis://localhost:6379")
     
+    # Mask Cache
+    MASK_CACHE_ENABLED: bool = os.getenv("MASK_CACHE_ENABLED", "true").lower() == "true"
+    MASK_CACHE_MAX_BYTES: int = int(os.getenv("MASK_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+    MASK_CACHE_REDIS: bool = os.getenv("MASK_CACHE_REDIS", "false").lower() == "true"
+    MASK_CACHE_TTL: int = int(os.getenv("MASK_CACHE_TTL", "86400"))  # seconds
+    
+    # Asynchronous Jobs
+    JOB_QUEUE_BACKEND: str = os.getenv("JOB_QUEUE_BACKEND", "auto")  # auto | redis | sqlite
+    JOB_WORKERS: int = int(os.getenv("JOB_WORKERS", "2"))
+    JOB_MAX_QUEUED: int = int(os.getenv("JOB_MAX_QUEUED", "1000"))
+    JOB_RESULT_TTL: int = int(os.getenv("JOB_RESULT_TTL", "3600"))  # seconds
+    JOB_CLEANUP_INTERVAL: float = float(os.getenv("JOB_CLEANUP_INTERVAL", "60"))
+    JOB_POLL_INTERVAL: float = float(os.getenv("JOB_POLL_INTERVAL", "1"))
+    # Redis: a claimed job returns to the queue when its worker stops renewing it for this long
+    JOB_LEASE_TIMEOUT: float = float(os.getenv("JOB_LEASE_TIMEOUT", "300"))
+    JOB_SQLITE_PATH: str = os.getenv("JOB_SQLITE_PATH", "jobs/jobs.db")
+    JOB_STORAGE_DIR: str = os.getenv("JOB_STORAGE_DIR", "jobs/files")
+    
     # Rate Limiting
-    RATE_LIMIT_REQUESTS: int = 100
-    RATE_LIMIT_WINDOW: int = 3600  # 1 hour
+    RATE_LIMIT_REQUESTS: int = int(os.getenv("RATE_LIMIT_REQUESTS", "100"))
+    RATE_LIMIT_WINDOW: int = int(os.getenv("RATE_LIMIT_WINDOW", "3600"))  # 1 hour
+    RATE_LIMIT_BACKEND: str = os.getenv("RATE_LIMIT_BACKEND", "memory")  # memory | redis
+    RATE_LIMIT_ALGORITHM: str = os.getenv("RATE_LIMIT_ALGORITHM", "sliding_window")  # sliding_window | token_bucket
     
     # CORS Settings
     ALLOWED_ORIGINS: List[str] = ["http://localhost:3000", "https://yourdomain.com"]
     
-    # Logging
-    LOG_LEVEL: str = "INFO"
+    # Metrics
+    METRICS_TOKEN: str = os.getenv("METRICS_TOKEN", "")  # bearer token for /metrics/prometheus, open when empty
+    
+    # Tracing
+    TRACE_EXPORTER: str = os.getenv("TRACE_EXPORTER", "none")  # none | otlp | file
+    TRACE_OTLP_ENDPOINT: str = os.getenv("TRACE_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+    TRACE_FILE: str = os.getenv("TRACE_FILE", "traces.jsonl")
+    TRACE_SERVICE_NAME: str = os.getenv("TRACE_SERVICE_NAME", "background-removal-api")
+    PROFILE_SAMPLE_RATE: int = int(os.getenv("PROFILE_SAMPLE_RATE", "0"))  # profile 1 in N requests, 0 = off
+    PROFILE_DIR: str = os.getenv("PROFILE_DIR", "profiles")
+    
+    # Logging (records are queued; a background thread formats and writes them)
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
+    LOG_FORMAT: str = os.getenv("LOG_FORMAT", "text")  # text | json
+    LOG_FILE: str = os.getenv("LOG_FILE", "app.log")  # empty = stdout only
+    LOG_ROTATION: str = os.getenv("LOG_ROTATION", "size")  # size | time | none
+    LOG_MAX_BYTES: int = int(os.getenv("LOG_MAX_BYTES", str(50 * 1024 * 1024)))
+    LOG_ROTATE_WHEN: str = os.getenv("LOG_ROTATE_WHEN", "midnight")  # TimedRotatingFileHandler "when"
+    LOG_BACKUP_COUNT: int = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+    LOG_QUEUE_SIZE: int = int(os.getenv("LOG_QUEUE_SIZE", "10000"))  # records beyond this are dropped
+    LOG_SUCCESS_SAMPLE_RATE: int = int(os.getenv("LOG_SUCCESS_SAMPLE_RATE", "1"))  # log 1 in N successful requests, 0 = none
     
     # Hugging Face
     HF_TOKEN: str = os.getenv("HF_TOKEN", "")
@@ -1,6 +1,12 @@
+import asyncio
+import hashlib
 import jwt
+import logging
+import secrets
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Dict, Optional, Tuple
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jwt.exceptions import ExpiredSignatureError, InvalidTokenError
@@ -8,26 +14,198 @@ from jwt.exceptions import ExpiredSignatureError, InvalidTokenError
 from app.config.settings import settings
 from app.models.exceptions import AuthenticationException
 
+logger = logging.getLogger(__name__)
+
+def token_digest(token: str) -> bytes:
+    """SHA-256 of a bearer credential; caches and indexes hold this, never the credential."""
+    return hashlib.sha256(token.encode()).digest()
+
+def parse_api_keys(spec: str) -> Dict[bytes, dict]:
+    """Index ``USER:SHA256HEX`` entries by digest, mapped to the claims a request gets."""
+    index = {}
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        user, _, key_hash = entry.rpartition(":")
+        try:
+            digest = bytes.fromhex(key_hash)
+        except ValueError:
+            digest = b""
+        if not user or len(digest) != hashlib.sha256().digest_size:
+            raise ValueError(f"Invalid API_KEYS entry {entry!r}; expected USER:SHA256HEX")
+        index[digest] = {"sub": user, "auth": "api_key"}
+    return index
+
+class VerifiedTokenCache:
+    """Claims of tokens that passed verification, by digest, with TTL and LRU eviction.
+
+    An entry lives until the token's ``exp`` or ``ttl`` seconds after it was
+    verified, whichever is first, so a cached token never outlives the
+    token itself. Expired entries are dropped when they are looked up.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[bytes, Tuple[dict, float]]" = OrderedDict()
+        self.evictions = 0
+
+    def get(self, digest: bytes, now: float) -> Optional[dict]:
+        entry = self._entries.get(digest)
+        if entry is None:
+            return None
+        claims, expires_at = entry
+        if now >= expires_at:
+            del self._entries[digest]
+            return None
+        self._entries.move_to_end(digest)
+        return claims
+
+    def put(self, digest: bytes, claims: dict, now: float):
+        if self.max_entries <= 0:
+            return
+        expires_at = now + self.ttl
+        if isinstance(claims.get("exp"), (int, float)):
+            expires_at = min(expires_at, claims["exp"])
+        self._entries[digest] = (claims, expires_at)
+        self._entries.move_to_end(digest)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def discard(self, digest: bytes):
+        self._entries.pop(digest, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+class RevocationList:
+    """Revoked token digests, checked with one dict lookup per request.
+
+    Each entry is kept until the token would have expired anyway; API keys
+    and other credentials with no expiry are scored ``inf`` and never
+    dropped. With the Redis backend, revocations are written to a sorted
+    set scored by expiry and every process mirrors it into its in-process
+    dict every ``AUTH_REVOCATION_SYNC_INTERVAL`` seconds, so the request
+    path never waits on Redis; a revocation made elsewhere applies within
+    one interval.
+    """
+
+    REDIS_KEY = "auth:revoked"
+
+    def __init__(self):
+        self.backend = settings.AUTH_REVOCATION_BACKEND.lower()
+        if self.backend not in ("memory", "redis"):
+            raise ValueError(f"Unknown revocation backend: {self.backend}")
+        self._revoked: Dict[bytes, float] = {}
+        self._redis = None
+        self._sync_task: Optional[asyncio.Task] = None
+        self.redis_errors = 0
+
+    def _get_redis(self):
+        if self._redis is None:
+            import redis.asyncio as redis
+            self._redis = redis.from_url(settings.REDIS_URL)
+        return self._redis
+
+    def is_revoked(self, digest: bytes) -> bool:
+        return digest in self._revoked
+
+    async def revoke(self, digest: bytes, expires_at: float):
+        self._revoked[digest] = expires_at
+        if self.backend == "redis":
+            try:
+                await self._get_redis().zadd(self.REDIS_KEY, {digest.hex(): expires_at})
+            except Exception as e:
+                self.redis_errors += 1
+                logger.warning("Could not share revocation through Redis, revoked in this process only: %s", e)
+
+    async def sync(self, now: Optional[float] = None):
+        """Drop expired entries and, with Redis, add the revocations made by other processes."""
+        now = time.time() if now is None else now
+        revoked = {digest: expires_at for digest, expires_at in self._revoked.items() if expires_at > now}
+        if self.backend == "redis":
+            try:
+                redis = self._get_redis()
+                await redis.zremrangebyscore(self.REDIS_KEY, "-inf", now)
+                shared = await redis.zrangebyscore(self.REDIS_KEY, now, "+inf", withscores=True)
+                # Merged, not replaced: a revocation Redis missed still holds here
+                revoked.update((bytes.fromhex(member.decode()), score) for member, score in shared)
+            except Exception as e:
+                self.redis_errors += 1
+                logger.warning(f"Revocation sync with Redis failed, keeping the local list: {e}")
+        self._revoked = revoked
+
+    async def _sync_loop(self):
+        while True:
+            await asyncio.sleep(settings.AUTH_REVOCATION_SYNC_INTERVAL)
+            await self.sync()
+
+    async def start(self):
+        if self._sync_task is None:
+            await self.sync()
+            self._sync_task = asyncio.create_task(self._sync_loop())
+
+    async def close(self):
+        if self._sync_task is not None:
+            self._sync_task.cancel()
+            self._sync_task = None
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
+
+    def __len__(self) -> int:
+        return len(self._revoked)
+
 class AuthManager:
     """Handles JWT-based authentication."""
-    
+
     def __init__(self):
         self.secret_key = settings.SECRET_KEY
         self.algorithm = settings.ALGORITHM
-        
+        self.cache = VerifiedTokenCache(settings.AUTH_CACHE_SIZE, settings.AUTH_CACHE_TTL)
+        self.revocations = RevocationList()
+        self.api_keys = parse_api_keys(settings.API_KEYS)
+        # user -> (token, digest, exp) of the last token issued, handed out again while fresh
+        self._issued: "OrderedDict[str, Tuple[str, bytes, float]]" = OrderedDict()
+        self.api_key_hits = 0
+        self.cache_hits = 0
+        self.verified = 0
+        self.rejected = 0
+
     def create_access_token(self, data: dict, expires_delta: Optional[timedelta] = None) -> str:
         """Create JWT access token."""
         to_encode = data.copy()
-        
+
         if expires_delta:
             expire = datetime.utcnow() + expires_delta
         else:
             expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-        
+
         to_encode.update({"exp": expire})
         encoded_jwt = jwt.encode(to_encode, self.secret_key, algorithm=self.algorithm)
         return encoded_jwt
-    
+
+    def issue_token(self, user_id: str) -> str:
+        """A token for ``user_id``: the last one issued while it has over half its lifetime left.
+
+        Clients that ask for a token per request then present the same token,
+        which the verified-token cache already holds.
+        """
+        now = time.time()
+        lifetime = settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+        issued = self._issued.get(user_id)
+        if issued is not None:
+            token, digest, expires_at = issued
+            if expires_at - now > lifetime / 2 and not self.revocations.is_revoked(digest):
+                self._issued.move_to_end(user_id)
+                return token
+        # A unique jti: otherwise tokens minted in the same second are identical, revoked or not
+        token = self.create_access_token({"sub": user_id, "jti": secrets.token_hex(8)})
+        self._issued[user_id] = (token, token_digest(token), now + lifetime)
+        self._issued.move_to_end(user_id)
+        while len(self._issued) > max(1, settings.AUTH_CACHE_SIZE):
+            self._issued.popitem(last=False)
+        return token
+
     def verify_token(self, token: str) -> dict:
         """Verify and decode JWT token."""
         try:
@@ -38,13 +216,69 @@ class AuthManager:
         except InvalidTokenError:
             raise AuthenticationException("Invalid token")
 
+    def authenticate(self, credential: str) -> dict:
+        """Claims for a bearer credential: an API key, a cached token or a freshly verified one."""
+        digest = token_digest(credential)
+        if self.revocations.is_revoked(digest):
+            self.rejected += 1
+            raise AuthenticationException("Token has been revoked")
+        claims = self.api_keys.get(digest)
+        if claims is not None:
+            self.api_key_hits += 1
+            return dict(claims)
+        now = time.time()
+        claims = self.cache.get(digest, now)
+        if claims is not None:
+            self.cache_hits += 1
+            return dict(claims)
+        try:
+            claims = self.verify_token(credential)
+        except AuthenticationException:
+            self.rejected += 1
+            raise
+        self.verified += 1
+        self.cache.put(digest, claims, now)
+        return dict(claims)
+
+    async def revoke(self, credential: str, claims: dict):
+        """Reject ``credential`` from now until it expires; API keys and tokens without ``exp`` for good."""
+        digest = token_digest(credential)
+        expires_at = claims.get("exp")
+        if not isinstance(expires_at, (int, float)):
+            # Valid for as long as it is configured, so the revocation must outlive any pruning
+            expires_at = float("inf")
+        self.cache.discard(digest)
+        await self.revocations.revoke(digest, expires_at)
+
+    async def start(self):
+        """Load shared revocations and keep them in sync."""
+        await self.revocations.start()
+
+    async def close(self):
+        await self.revocations.close()
+
+    def get_stats(self) -> Dict:
+        return {
+            "cache_entries": len(self.cache),
+            "cache_max_entries": self.cache.max_entries,
+            "cache_evictions": self.cache.evictions,
+            "cache_hits": self.cache_hits,
+            "verified": self.verified,
+            "api_keys": len(self.api_keys),
+            "api_key_hits": self.api_key_hits,
+            "rejected": self.rejected,
+            "revoked": len(self.revocations),
+            "revocation_backend": self.revocations.backend,
+            "redis_errors": self.revocations.redis_errors
+        }
+
 auth_manager = AuthManager()
 security = HTTPBearer()
 
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     """Dependency to get current authenticated user."""
     try:
-        payload = auth_manager.verify_token(credentials.credentials)
+        payload = auth_manager.authenticate(credentials.credentials)
         return payload
     except AuthenticationException:
         raise HTTPException(
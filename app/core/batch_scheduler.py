@@ -0,0 +1,154 @@
+import asyncio
+import logging
+import time
+from typing import List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from app.config.settings import settings
+from app.core import tracing
+from app.core.inference_pool import inference_pool
+from app.core.metrics import Histogram
+from app.core.model_manager import ModelManager
+from app.models.exceptions import ProcessingException
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+QUEUE_WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.015, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+class BatchScheduler:
+    """Groups concurrent inference requests into batched forward passes."""
+
+    def __init__(self, manager: ModelManager, batch_size_histogram: Optional[Histogram] = None,
+                 queue_wait_histogram: Optional[Histogram] = None):
+        self.model_manager = manager
+        self.max_batch_size = max(1, settings.BATCH_MAX_SIZE)
+        self.max_wait = settings.BATCH_MAX_WAIT_MS / 1000.0
+        self.queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        # Schedulers of different models can share histograms for aggregate metrics
+        self.batch_size_histogram = batch_size_histogram or Histogram(BATCH_SIZE_BUCKETS)
+        self.queue_wait_histogram = queue_wait_histogram or Histogram(QUEUE_WAIT_BUCKETS)
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        """Start the background batching loop."""
+        if self.is_running:
+            return
+        self.queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+        logger.info(
+            f"Batch scheduler for {self.model_manager.model_id} started (max_batch_size={self.max_batch_size}, "
+            f"max_wait_ms={self.max_wait * 1000:.1f})"
+        )
+
+    async def stop(self):
+        """Stop the batching loop and fail any requests still waiting."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        pending = []
+        while self.queue is not None and not self.queue.empty():
+            pending.append(self.queue.get_nowait())
+        self._fail(pending, ProcessingException("Batch scheduler stopped"))
+        logger.info("Batch scheduler stopped")
+
+    async def submit(self, image: Image.Image) -> np.ndarray:
+        """Queue an image for the next batch and wait for its mask."""
+        if not self.is_running:
+            await self.start()
+
+        future = asyncio.get_running_loop().create_future()
+        # The caller's trace context comes along so batch spans can be attached to it
+        await self.queue.put((image, future, time.perf_counter_ns(), tracing.current()))
+        return await future
+
+    async def _collect_batch(self) -> List[Tuple[Image.Image, asyncio.Future, int, Optional[tuple]]]:
+        """Wait for the first request, then fill the batch until size or deadline."""
+        loop = asyncio.get_running_loop()
+        batch = [await self.queue.get()]
+        deadline = loop.time() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+        # Requests whose callers went away should not cost a forward pass
+        return [item for item in batch if not item[1].done()]
+
+    async def _run(self):
+        while True:
+            batch = await self._collect_batch()
+            if not batch:
+                continue
+
+            dispatched_at = time.perf_counter_ns()
+            # The frames of an animation share a trace: the forward pass and the
+            # wait are recorded in it once, with how many of its images were batched
+            requests = {}
+            for _, _, enqueued_at, context in batch:
+                self.queue_wait_histogram.observe((dispatched_at - enqueued_at) / 1e9)
+                if context is not None:
+                    first = requests.setdefault(id(context[0]), [context, enqueued_at, 0])
+                    first[1] = min(first[1], enqueued_at)
+                    first[2] += 1
+            for context, enqueued_at, images in requests.values():
+                tracing.record_span(context, "batch_wait", enqueued_at, dispatched_at, images=images)
+            self.batch_size_histogram.observe(len(batch))
+
+            contexts = [item[3] for item in batch]
+            try:
+                masks, collected = await inference_pool.run_model(
+                    self._predict, [item[0] for item in batch], contexts
+                )
+            except asyncio.CancelledError:
+                self._fail(batch, ProcessingException("Batch scheduler stopped"))
+                raise
+            except Exception as e:
+                logger.error("Batch of %d failed: %s", len(batch), e)
+                self._fail(batch, e if isinstance(e, ProcessingException) else ProcessingException(str(e)))
+                continue
+
+            for context, _, images in requests.values():
+                tracing.adopt(context, collected, batch_size=len(batch), images=images)
+            for (_, future, _, _), mask in zip(batch, masks):
+                if not future.done():
+                    future.set_result(mask)
+
+    def _predict(self, images: List[Image.Image], contexts: List[Optional[tuple]]):
+        """Forward pass on the model thread, with its spans collected for every request in the batch."""
+        traces = [context[0] for context in contexts if context is not None]
+        with tracing.collect() as collected, tracing.torch_profiled(traces):
+            masks = self.model_manager.predict_masks(images)
+        return masks, collected
+
+    @staticmethod
+    def _fail(batch, error: Exception):
+        for _, future, _, _ in batch:
+            if not future.done():
+                future.set_exception(error)
+
+    def get_stats(self):
+        """Get batching statistics for tuning."""
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "queue_depth": self.queue.qsize() if self.queue is not None else 0,
+            "batch_size": self.batch_size_histogram.snapshot(),
+            "queue_wait_seconds": self.queue_wait_histogram.snapshot()
+        }
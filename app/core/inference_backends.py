@@ -0,0 +1,173 @@
+import logging
+import os
+import re
+from typing import Optional
+
+import numpy as np
+import torch
+
+from app.config.settings import settings
+from app.models.exceptions import ProcessingException
+
+logger = logging.getLogger(__name__)
+
+def extract_logits(outputs) -> torch.Tensor:
+    """Pull the mask logits tensor out of whatever the segmentation model returns."""
+    if hasattr(outputs, 'logits'):
+        logits = outputs.logits
+    elif isinstance(outputs, (list, tuple)):
+        logits = outputs[0]
+    else:
+        logits = outputs
+
+    if logits is None:
+        raise ProcessingException("Could not extract logits from model output")
+    return logits
+
+class LogitsModule(torch.nn.Module):
+    """Wraps a segmentation model so it returns a single logits tensor.
+
+    Tracing and ONNX export need a plain tensor output rather than the
+    model's own output container.
+    """
+
+    def __init__(self, model: torch.nn.Module):
+        super().__init__()
+        self.model = model
+
+    def forward(self, pixel_values: torch.Tensor) -> torch.Tensor:
+        return extract_logits(self.model(pixel_values))
+
+def _artifact_path(model_id: str, suffix: str) -> str:
+    """Location of a derived model artifact, unique per model revision and input size."""
+    model_slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", model_id)
+    size = settings.MODEL_INPUT_SIZE
+    return os.path.join(settings.INFERENCE_ARTIFACT_DIR, f"{model_slug}-{size}.{suffix}")
+
+def _example_input(device: str) -> torch.Tensor:
+    size = settings.MODEL_INPUT_SIZE
+    return torch.zeros(1, 3, size, size, dtype=torch.float32, device=device)
+
+class InferenceBackend:
+    """Eager PyTorch: runs the model as loaded."""
+
+    name = "eager"
+    # Whether the original torch model can be released once prepared
+    replaces_model = False
+
+    def __init__(self, device: str, model_id: Optional[str] = None):
+        self.device = device
+        self.model_id = model_id or f"{settings.MODEL_NAME}@{settings.MODEL_REVISION}"
+        self.module: Optional[torch.nn.Module] = None
+
+    def prepare(self, model: torch.nn.Module):
+        self.module = LogitsModule(model).eval()
+
+    def forward(self, pixel_values: torch.Tensor) -> torch.Tensor:
+        with torch.inference_mode():
+            return self.module(pixel_values.to(self.device))
+
+    def close(self):
+        self.module = None
+
+class TracedBackend(InferenceBackend):
+    """TorchScript: traced, frozen and optimised for inference, cached on disk."""
+
+    name = "traced"
+    replaces_model = True
+
+    def prepare(self, model: torch.nn.Module):
+        path = _artifact_path(self.model_id, f"{self.device}.torchscript.pt")
+        if os.path.exists(path):
+            logger.info(f"Loading traced model from {path}")
+            self.module = torch.jit.load(path, map_location=self.device)
+            return
+
+        logger.info("Tracing model (first start with this backend, this can take a while)")
+        with torch.inference_mode():
+            traced = torch.jit.trace(LogitsModule(model).eval(), _example_input(self.device))
+            traced = torch.jit.optimize_for_inference(torch.jit.freeze(traced))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        torch.jit.save(traced, path)
+        self.module = traced
+
+class CompiledBackend(InferenceBackend):
+    """torch.compile: graph capture and kernel fusion on the first forward pass."""
+
+    name = "compiled"
+
+    def prepare(self, model: torch.nn.Module):
+        self.module = torch.compile(LogitsModule(model).eval(), dynamic=False)
+
+class Int8Backend(InferenceBackend):
+    """Dynamic int8 quantization of the Linear layers (weights int8, activations fp32)."""
+
+    name = "int8"
+    replaces_model = True
+
+    def prepare(self, model: torch.nn.Module):
+        if self.device != "cpu":
+            raise ProcessingException("The int8 backend only runs on CPU")
+        self.module = torch.ao.quantization.quantize_dynamic(
+            LogitsModule(model).eval(), {torch.nn.Linear}, dtype=torch.qint8
+        )
+
+class OnnxRuntimeBackend(InferenceBackend):
+    """ONNX Runtime on the CPU execution provider, exported once and cached on disk."""
+
+    name = "onnx"
+    replaces_model = True
+
+    def __init__(self, device: str, model_id: Optional[str] = None):
+        super().__init__(device, model_id)
+        self.session = None
+        self.input_name = None
+
+    def prepare(self, model: torch.nn.Module):
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            raise ProcessingException("The onnx backend requires the onnxruntime package")
+
+        path = _artifact_path(self.model_id, "onnx")
+        if not os.path.exists(path):
+            logger.info("Exporting model to ONNX (first start with this backend, this can take a while)")
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Export to a temporary name so an interrupted export is not reused
+            partial = f"{path}.partial"
+            with torch.inference_mode():
+                torch.onnx.export(
+                    LogitsModule(model).eval().cpu(), _example_input("cpu"), partial,
+                    input_names=["pixel_values"], output_names=["logits"],
+                    dynamic_axes={"pixel_values": {0: "batch"}, "logits": {0: "batch"}},
+                    opset_version=settings.ONNX_OPSET,
+                    # Keep weights inside the file so the rename below moves everything
+                    external_data=False
+                )
+            os.replace(partial, path)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+        logger.info(f"ONNX Runtime session ready ({path})")
+
+    def forward(self, pixel_values: torch.Tensor) -> torch.Tensor:
+        pixels = np.ascontiguousarray(pixel_values.detach().cpu().numpy(), dtype=np.float32)
+        logits = self.session.run(None, {self.input_name: pixels})[0]
+        return torch.from_numpy(logits)
+
+    def close(self):
+        self.session = None
+
+BACKENDS = {
+    backend.name: backend
+    for backend in (InferenceBackend, TracedBackend, CompiledBackend, Int8Backend, OnnxRuntimeBackend)
+}
+
+def create_backend(name: str, device: str, model_id: Optional[str] = None) -> InferenceBackend:
+    """Instantiate the backend configured by ``INFERENCE_BACKEND``."""
+    try:
+        return BACKENDS[name.lower()](device, model_id)
+    except KeyError:
+        raise ValueError(f"Unknown inference backend: {name}. Available: {', '.join(BACKENDS)}")
@@ -0,0 +1,130 @@
+import asyncio
+import contextvars
+import functools
+import logging
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Optional
+
+from app.config.settings import settings
+from app.core import tracing
+from app.models.exceptions import ServiceOverloadedException
+
+logger = logging.getLogger(__name__)
+
+class InferencePool:
+    """Runs blocking image work off the event loop with bounded admission."""
+
+    def __init__(self):
+        self.executor_type = settings.INFERENCE_EXECUTOR.lower()
+        self.max_workers = max(1, settings.INFERENCE_WORKERS)
+        self.max_in_flight = max(1, settings.INFERENCE_MAX_IN_FLIGHT)
+        self.retry_after = settings.INFERENCE_RETRY_AFTER
+        self.in_flight = 0
+        self.rejected = 0
+        self.waiting = 0
+        self._released = asyncio.Condition()
+        self._executor: Optional[Executor] = None
+        self._model_executor: Optional[ThreadPoolExecutor] = None
+
+    def start(self):
+        """Create the executors."""
+        if self._executor is not None:
+            return
+
+        if self.executor_type == "process":
+            # spawn avoids forking a parent that already holds torch threads
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        elif self.executor_type == "thread":
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix="image-worker"
+            )
+        else:
+            raise ValueError(f"Unknown inference executor: {self.executor_type}")
+
+        # Forward passes are already serialised by the batch scheduler, so a
+        # single dedicated thread keeps them from competing for pool slots.
+        self._model_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="model")
+        logger.info(
+            f"Inference pool started ({self.executor_type}, workers={self.max_workers}, "
+            f"max_in_flight={self.max_in_flight})"
+        )
+
+    def shutdown(self):
+        """Shut down the executors."""
+        for executor in (self._executor, self._model_executor):
+            if executor is not None:
+                executor.shutdown(wait=True, cancel_futures=True)
+        self._executor = None
+        self._model_executor = None
+        logger.info("Inference pool shut down")
+
+    @asynccontextmanager
+    async def reserve(self, wait: bool = False):
+        """Admit a request or fail fast with 503 when the queue is full.
+        
+        With ``wait``, queue for a free slot instead; background jobs use
+        this, since no client is there to retry a 503.
+        """
+        if self.in_flight >= self.max_in_flight:
+            if not wait:
+                self.rejected += 1
+                raise ServiceOverloadedException(
+                    "Server is busy. Please retry shortly.",
+                    retry_after=self.retry_after
+                )
+            self.waiting += 1
+            try:
+                async with self._released:
+                    await self._released.wait_for(lambda: self.in_flight < self.max_in_flight)
+            finally:
+                self.waiting -= 1
+
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            if self.waiting:
+                async with self._released:
+                    self._released.notify_all()
+
+    async def run(self, func: Callable, *args: Any) -> Any:
+        """Run CPU-bound work on the configured executor."""
+        if self._executor is None:
+            self.start()
+        return await self._submit(self._executor, func, *args)
+
+    async def run_model(self, func: Callable, *args: Any) -> Any:
+        """Run a model forward pass on the dedicated model thread."""
+        if self._model_executor is None:
+            self.start()
+        return await self._submit(self._model_executor, func, *args)
+
+    async def _submit(self, executor: Executor, func: Callable, *args: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        if isinstance(executor, ThreadPoolExecutor):
+            # Carry context variables into the worker thread like asyncio.to_thread
+            context = contextvars.copy_context()
+            return await loop.run_in_executor(
+                executor, functools.partial(context.run, tracing.profiled(func), *args)
+            )
+        return await loop.run_in_executor(executor, func, *args)
+
+    def get_stats(self):
+        """Get executor and backpressure statistics."""
+        return {
+            "executor": self.executor_type,
+            "workers": self.max_workers,
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "waiting": self.waiting,
+            "rejected": self.rejected
+        }
+
+inference_pool = InferencePool()
@@ -0,0 +1,630 @@
+import asyncio
+import io
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from typing import BinaryIO, Dict, List, Optional, Tuple
+
+from app.config.settings import settings
+from app.core import tracing
+from app.core.inference_pool import inference_pool
+from app.core.model_registry import DEFAULT_MODEL
+from app.models.exceptions import APIException, ServiceOverloadedException
+from app.models.schemas import EncodePreset, ImageFormat, JobStatus, MaskMode, OutputMode
+from app.services.image_encoder import resolve_preset
+from app.services.pipeline import process_source
+
+logger = logging.getLogger(__name__)
+
+MAX_PRIORITY = 9
+COPY_CHUNK_SIZE = 1024 * 1024
+
+def _queue_score(priority: int, created_at: float) -> float:
+    """Sort key for the Redis queue: higher priority first, then FIFO."""
+    return (MAX_PRIORITY - priority) * 1e13 + created_at * 1000
+
+class SQLiteJobStore:
+    """Job records in a local SQLite database, payloads as files next to it.
+
+    Several processes may share the database. A worker claims a job by
+    recording itself as the owner with a lease deadline, and renews the
+    lease while the job runs; only jobs whose lease ran out (their process
+    died) go back to the queue, on start and on every cleanup.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str, storage_dir: str):
+        self.path = path
+        self.storage_dir = storage_dir
+        self.lease = settings.JOB_LEASE_TIMEOUT
+        # Identifies this store's claims among the processes sharing the database
+        self.owner = uuid.uuid4().hex
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._wakeup = asyncio.Event()
+
+    def _connect(self):
+        os.makedirs(self.storage_dir, exist_ok=True)
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, status TEXT NOT NULL, priority INTEGER NOT NULL, "
+            "created_at REAL NOT NULL, expires_at REAL, data TEXT NOT NULL, "
+            "owner TEXT, lease_expires_at REAL)"
+        )
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+        for column, kind in (("owner", "TEXT"), ("lease_expires_at", "REAL")):
+            if column not in columns:
+                # Databases created before leases; their processing jobs have none and count as expired
+                conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, priority DESC, created_at)"
+        )
+        self._conn = conn
+        requeued = self._requeue_expired(time.time())
+        if requeued:
+            logger.warning(f"Requeued {requeued} interrupted jobs")
+
+    def _input_path(self, job_id: str) -> str:
+        return os.path.join(self.storage_dir, f"{job_id}.input")
+
+    def _result_path(self, job_id: str) -> str:
+        return os.path.join(self.storage_dir, f"{job_id}.result")
+
+    async def connect(self):
+        await asyncio.to_thread(self._connect)
+
+    async def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _execute(self, sql: str, params: tuple = ()) -> List[sqlite3.Row]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def _enqueue(self, job: Dict, source: BinaryIO):
+        source.seek(0)
+        with open(self._input_path(job["id"]), "wb") as target:
+            shutil.copyfileobj(source, target, COPY_CHUNK_SIZE)
+        self._execute(
+            "INSERT INTO jobs (id, status, priority, created_at, data) VALUES (?, ?, ?, ?, ?)",
+            (job["id"], job["status"], job["priority"], job["created_at"], json.dumps(job))
+        )
+
+    async def enqueue(self, job: Dict, source: BinaryIO):
+        await asyncio.to_thread(self._enqueue, job, source)
+        self._wakeup.set()
+
+    def _claim(self) -> Optional[Dict]:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT data FROM jobs WHERE status = ? "
+                    "ORDER BY priority DESC, created_at LIMIT 1",
+                    (JobStatus.QUEUED.value,)
+                ).fetchone()
+                if row is None:
+                    self._conn.execute("COMMIT")
+                    return None
+                job = json.loads(row["data"])
+                job.update(status=JobStatus.PROCESSING.value, started_at=time.time())
+                self._conn.execute(
+                    "UPDATE jobs SET status = ?, data = ?, owner = ?, lease_expires_at = ? WHERE id = ?",
+                    (job["status"], json.dumps(job), self.owner, job["started_at"] + self.lease, job["id"])
+                )
+                self._conn.execute("COMMIT")
+                return job
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    async def dequeue(self, timeout: float) -> Optional[Dict]:
+        job = await asyncio.to_thread(self._claim)
+        if job is None:
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return job
+
+    async def open_input(self, job_id: str) -> BinaryIO:
+        return await asyncio.to_thread(open, self._input_path(job_id), "rb")
+
+    def _renew(self, job_id: str):
+        self._execute(
+            "UPDATE jobs SET lease_expires_at = ? WHERE id = ? AND owner = ? AND status = ?",
+            (time.time() + self.lease, job_id, self.owner, JobStatus.PROCESSING.value)
+        )
+
+    async def renew(self, job_id: str):
+        """Extend the lease of a job that is still being processed."""
+        await asyncio.to_thread(self._renew, job_id)
+
+    def _requeue_expired(self, now: float) -> int:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute(
+                    "SELECT id, data FROM jobs WHERE status = ? "
+                    "AND (lease_expires_at IS NULL OR lease_expires_at < ?)",
+                    (JobStatus.PROCESSING.value, now)
+                ).fetchall()
+                for row in rows:
+                    job = json.loads(row["data"])
+                    job["status"] = JobStatus.QUEUED.value
+                    job.pop("started_at", None)
+                    self._conn.execute(
+                        "UPDATE jobs SET status = ?, data = ?, owner = NULL, lease_expires_at = NULL WHERE id = ?",
+                        (job["status"], json.dumps(job), row["id"])
+                    )
+                self._conn.execute("COMMIT")
+                return len(rows)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    async def requeue_expired(self) -> int:
+        """Put jobs whose lease ran out back on the queue; returns how many."""
+        return await asyncio.to_thread(self._requeue_expired, time.time())
+
+    def _finish(self, job: Dict, result: Optional[io.BytesIO]):
+        if result is not None:
+            with open(self._result_path(job["id"]), "wb") as target:
+                target.write(result.getbuffer())
+        self._execute(
+            "UPDATE jobs SET status = ?, expires_at = ?, data = ?, owner = NULL, lease_expires_at = NULL "
+            "WHERE id = ?",
+            (job["status"], job["expires_at"], json.dumps(job), job["id"])
+        )
+        self._remove(self._input_path(job["id"]))
+
+    async def finish(self, job: Dict, result: Optional[io.BytesIO] = None):
+        await asyncio.to_thread(self._finish, job, result)
+
+    def _get(self, job_id: str) -> Optional[Dict]:
+        rows = self._execute("SELECT data FROM jobs WHERE id = ?", (job_id,))
+        return json.loads(rows[0]["data"]) if rows else None
+
+    async def get(self, job_id: str) -> Optional[Dict]:
+        return await asyncio.to_thread(self._get, job_id)
+
+    def _read_result(self, job_id: str) -> Optional[bytes]:
+        try:
+            with open(self._result_path(job_id), "rb") as result:
+                return result.read()
+        except FileNotFoundError:
+            return None
+
+    async def read_result(self, job_id: str) -> Optional[bytes]:
+        return await asyncio.to_thread(self._read_result, job_id)
+
+    def _depth(self) -> int:
+        rows = self._execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (JobStatus.QUEUED.value,))
+        return rows[0][0]
+
+    async def depth(self) -> int:
+        return await asyncio.to_thread(self._depth)
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _cleanup(self, now: float) -> int:
+        expired = self._execute("SELECT id FROM jobs WHERE expires_at IS NOT NULL AND expires_at < ?", (now,))
+        for row in expired:
+            self._remove(self._result_path(row["id"]))
+            self._remove(self._input_path(row["id"]))
+            self._execute("DELETE FROM jobs WHERE id = ?", (row["id"],))
+        return len(expired)
+
+    async def cleanup(self) -> int:
+        requeued = await self.requeue_expired()
+        if requeued:
+            logger.warning(f"Requeued {requeued} jobs whose worker stopped renewing the lease")
+            self._wakeup.set()
+        return await asyncio.to_thread(self._cleanup, time.time())
+
+# Move the next job from the queue to the processing set, leased until
+# ARGV[1]; wake another worker when more jobs are waiting
+CLAIM_SCRIPT = """
+local popped = redis.call('ZPOPMIN', KEYS[1])
+if #popped == 0 then
+    return false
+end
+redis.call('ZADD', KEYS[2], ARGV[1], popped[1])
+if redis.call('ZCARD', KEYS[1]) > 0 then
+    redis.call('LPUSH', KEYS[3], 1)
+    redis.call('LTRIM', KEYS[3], 0, 0)
+end
+return popped[1]
+"""
+
+# Put a job whose lease expired before ARGV[2] back on the queue, unless it
+# was finished or renewed since it was listed
+REQUEUE_SCRIPT = """
+local deadline = redis.call('ZSCORE', KEYS[1], ARGV[1])
+if not deadline or tonumber(deadline) > tonumber(ARGV[2]) then
+    return 0
+end
+redis.call('ZREM', KEYS[1], ARGV[1])
+redis.call('ZADD', KEYS[2], ARGV[3], ARGV[1])
+redis.call('SET', KEYS[3], ARGV[4])
+redis.call('PERSIST', KEYS[4])
+redis.call('LPUSH', KEYS[5], 1)
+redis.call('LTRIM', KEYS[5], 0, 0)
+return 1
+"""
+
+class RedisJobStore:
+    """Job records and payloads in Redis, queued in a sorted set by priority.
+
+    A worker claims a job by moving it into a processing set scored by its
+    lease deadline, and renews the lease while the job runs. Jobs whose
+    lease ran out (their worker died) go back to the queue on start and on
+    every cleanup; until then their record and input expire after the
+    lease plus the result TTL, so nothing is kept forever.
+    """
+
+    name = "redis"
+    QUEUE_KEY = "jobs:queue"
+    PROCESSING_KEY = "jobs:processing"
+    # Holds at most one token; pushed on enqueue so idle workers need not poll
+    WAKEUP_KEY = "jobs:wakeup"
+
+    def __init__(self, url: str):
+        self.url = url
+        self.lease = settings.JOB_LEASE_TIMEOUT
+        self._redis = None
+        self._claim = None
+        self._requeue = None
+
+    async def connect(self):
+        import redis.asyncio as redis
+        self._redis = redis.from_url(self.url)
+        await self._redis.ping()
+        self._claim = self._redis.register_script(CLAIM_SCRIPT)
+        self._requeue = self._redis.register_script(REQUEUE_SCRIPT)
+        requeued = await self.requeue_expired()
+        if requeued:
+            logger.warning(f"Requeued {requeued} interrupted jobs")
+
+    async def close(self):
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
+
+    async def enqueue(self, job: Dict, source: BinaryIO):
+        source.seek(0)
+        payload = await asyncio.to_thread(source.read)
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.set(f"job:{job['id']}:input", payload)
+            pipe.set(f"job:{job['id']}", json.dumps(job))
+            pipe.zadd(self.QUEUE_KEY, {job["id"]: _queue_score(job["priority"], job["created_at"])})
+            pipe.lpush(self.WAKEUP_KEY, 1)
+            pipe.ltrim(self.WAKEUP_KEY, 0, 0)
+            await pipe.execute()
+
+    def _processing_ttl(self) -> int:
+        return int(self.lease + settings.JOB_RESULT_TTL)
+
+    async def dequeue(self, timeout: float) -> Optional[Dict]:
+        keys = [self.QUEUE_KEY, self.PROCESSING_KEY, self.WAKEUP_KEY]
+        deadline = time.monotonic() + timeout
+        while True:
+            job_id = await self._claim(keys=keys, args=[time.time() + self.lease])
+            if job_id is not None:
+                break
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            # A token left from an earlier enqueue can wake this early; then it waits again
+            await self._redis.blpop([self.WAKEUP_KEY], timeout=remaining)
+        job_id = job_id.decode()
+        job = await self.get(job_id)
+        if job is None:
+            await self._redis.zrem(self.PROCESSING_KEY, job_id)
+            return None
+        job.update(status=JobStatus.PROCESSING.value, started_at=time.time())
+        ttl = self._processing_ttl()
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.set(f"job:{job_id}", json.dumps(job), ex=ttl)
+            pipe.expire(f"job:{job_id}:input", ttl)
+            await pipe.execute()
+        return job
+
+    async def renew(self, job_id: str):
+        """Extend the lease of a job that is still being processed."""
+        ttl = self._processing_ttl()
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.zadd(self.PROCESSING_KEY, {job_id: time.time() + self.lease}, xx=True)
+            pipe.expire(f"job:{job_id}", ttl)
+            pipe.expire(f"job:{job_id}:input", ttl)
+            await pipe.execute()
+
+    async def requeue_expired(self) -> int:
+        """Put jobs whose lease ran out back on the queue; returns how many."""
+        now = time.time()
+        requeued = 0
+        for member in await self._redis.zrangebyscore(self.PROCESSING_KEY, "-inf", now):
+            job_id = member.decode()
+            job = await self.get(job_id)
+            if job is None or job["status"] != JobStatus.PROCESSING.value:
+                # Record expired, or finished between the listing and now
+                await self._redis.zrem(self.PROCESSING_KEY, job_id)
+                continue
+            job["status"] = JobStatus.QUEUED.value
+            job.pop("started_at", None)
+            requeued += await self._requeue(
+                keys=[self.PROCESSING_KEY, self.QUEUE_KEY, f"job:{job_id}", f"job:{job_id}:input", self.WAKEUP_KEY],
+                args=[job_id, now, _queue_score(job["priority"], job["created_at"]), json.dumps(job)]
+            )
+        return requeued
+
+    async def open_input(self, job_id: str) -> BinaryIO:
+        payload = await self._redis.get(f"job:{job_id}:input")
+        if payload is None:
+            raise FileNotFoundError(f"Input for job {job_id} is missing")
+        return io.BytesIO(payload)
+
+    async def finish(self, job: Dict, result: Optional[io.BytesIO] = None):
+        ttl = max(1, int(job["expires_at"] - time.time()))
+        async with self._redis.pipeline(transaction=True) as pipe:
+            if result is not None:
+                pipe.set(f"job:{job['id']}:result", result.getvalue(), ex=ttl)
+            pipe.set(f"job:{job['id']}", json.dumps(job), ex=ttl)
+            pipe.delete(f"job:{job['id']}:input")
+            pipe.zrem(self.PROCESSING_KEY, job["id"])
+            await pipe.execute()
+
+    async def get(self, job_id: str) -> Optional[Dict]:
+        data = await self._redis.get(f"job:{job_id}")
+        return json.loads(data) if data is not None else None
+
+    async def read_result(self, job_id: str) -> Optional[bytes]:
+        return await self._redis.get(f"job:{job_id}:result")
+
+    async def depth(self) -> int:
+        return await self._redis.zcard(self.QUEUE_KEY)
+
+    async def cleanup(self) -> int:
+        # Finished jobs expire through key TTLs; abandoned ones are requeued
+        requeued = await self.requeue_expired()
+        if requeued:
+            logger.warning(f"Requeued {requeued} jobs whose worker stopped renewing the lease")
+        return 0
+
+class JobQueue:
+    """Priority job queue for asynchronous background removal."""
+
+    def __init__(self):
+        self.backend = settings.JOB_QUEUE_BACKEND.lower()
+        self.concurrency = max(1, settings.JOB_WORKERS)
+        self.max_queued = settings.JOB_MAX_QUEUED
+        self.result_ttl = settings.JOB_RESULT_TTL
+        self.cleanup_interval = settings.JOB_CLEANUP_INTERVAL
+        self.poll_interval = settings.JOB_POLL_INTERVAL
+        self.store = None
+        self._tasks: List[asyncio.Task] = []
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.expired = 0
+
+    @property
+    def is_running(self) -> bool:
+        return bool(self._tasks)
+
+    async def start(self):
+        """Connect the store and start the worker and cleanup loops."""
+        if self.is_running:
+            return
+
+        self.store = None
+        if self.backend in ("auto", "redis"):
+            store = RedisJobStore(settings.REDIS_URL)
+            try:
+                await store.connect()
+                self.store = store
+            except Exception as e:
+                await store.close()
+                if self.backend == "redis":
+                    raise
+                logger.warning(f"Redis job queue unavailable, falling back to SQLite: {str(e)}")
+        elif self.backend != "sqlite":
+            raise ValueError(f"Unknown job queue backend: {self.backend}")
+
+        if self.store is None:
+            self.store = SQLiteJobStore(settings.JOB_SQLITE_PATH, settings.JOB_STORAGE_DIR)
+            await self.store.connect()
+
+        self._tasks = [asyncio.create_task(self._worker(index)) for index in range(self.concurrency)]
+        self._tasks.append(asyncio.create_task(self._cleanup_loop()))
+        logger.info(f"Job queue started ({self.store.name}, workers={self.concurrency})")
+
+    async def stop(self):
+        """Stop the loops; jobs still queued are kept for the next start."""
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        if self.store is not None:
+            await self.store.close()
+        logger.info("Job queue stopped")
+
+    async def submit(self, source: BinaryIO, user_id: str, output_format: ImageFormat,
+                     mask_mode: MaskMode, threshold: float, priority: int,
+                     filename: Optional[str] = None, preset: Optional[EncodePreset] = None,
+                     output: OutputMode = OutputMode.CUTOUT, model: Optional[str] = None) -> Dict:
+        """Persist an upload and queue it for processing."""
+        if not self.is_running:
+            await self.start()
+
+        if await self.store.depth() >= self.max_queued:
+            raise ServiceOverloadedException(
+                "Job queue is full. Please retry later.",
+                retry_after=settings.INFERENCE_RETRY_AFTER
+            )
+
+        job = {
+            "id": uuid.uuid4().hex,
+            "user_id": user_id,
+            "status": JobStatus.QUEUED.value,
+            "priority": priority,
+            "filename": filename,
+            "output_format": output_format.value,
+            "mask_mode": mask_mode.value,
+            "threshold": threshold,
+            "preset": resolve_preset(preset).value,
+            "output": output.value,
+            "model": model or DEFAULT_MODEL,
+            "created_at": time.time()
+        }
+        await self.store.enqueue(job, source)
+        self.submitted += 1
+        return job
+
+    async def get(self, job_id: str, user_id: str) -> Dict:
+        """Fetch a job owned by ``user_id``."""
+        job = await self.store.get(job_id) if self.store is not None else None
+        if job is None or job["user_id"] != user_id:
+            raise APIException(message="Job not found", error_code="JOB_NOT_FOUND", status_code=404)
+        return job
+
+    async def get_result(self, job_id: str, user_id: str) -> Tuple[Dict, bytes]:
+        """Return the job and its encoded output once it has completed."""
+        job = await self.get(job_id, user_id)
+        if job["status"] == JobStatus.FAILED.value:
+            raise APIException(
+                message=f"Job failed: {job.get('error')}",
+                error_code="JOB_FAILED",
+                status_code=409
+            )
+        if job["status"] != JobStatus.COMPLETED.value:
+            raise APIException(
+                message="Job has not completed yet",
+                error_code="JOB_NOT_READY",
+                status_code=409,
+                headers={"Retry-After": str(max(1, int(self.poll_interval)))}
+            )
+
+        result = await self.store.read_result(job_id)
+        if result is None:
+            raise APIException(message="Job result has expired", error_code="JOB_NOT_FOUND", status_code=404)
+        return job, result
+
+    async def _worker(self, index: int):
+        while True:
+            try:
+                job = await self.store.dequeue(self.poll_interval)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Job worker {index} failed to dequeue: {str(e)}")
+                await asyncio.sleep(self.poll_interval)
+                continue
+            if job is None:
+                continue
+
+            trace = tracing.start_trace("job", job_id=job["id"], priority=job["priority"], user=job["user_id"])
+            started = time.perf_counter()
+            result = None
+            source = None
+            heartbeat = asyncio.create_task(self._renew_lease(job["id"]))
+            try:
+                source = await self.store.open_input(job["id"])
+                # Jobs count against the in-flight cap like requests, but wait for a slot instead of failing
+                async with inference_pool.reserve(wait=True):
+                    result, original_size, cache_status, frames = await process_source(
+                        source, ImageFormat(job["output_format"]),
+                        MaskMode(job["mask_mode"]), job["threshold"],
+                        EncodePreset(job["preset"]) if job.get("preset") else None,
+                        OutputMode(job.get("output", OutputMode.CUTOUT.value)),
+                        job.get("model")
+                    )
+                job.update(
+                    status=JobStatus.COMPLETED.value,
+                    original_size={"width": original_size[0], "height": original_size[1]},
+                    file_size=result.getbuffer().nbytes,
+                    cache=cache_status,
+                    frames=frames
+                )
+                self.completed += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if isinstance(e, APIException):
+                    job.update(error=e.message, error_code=e.error_code)
+                else:
+                    logger.error(f"Job {job['id']} failed: {str(e)}", exc_info=True)
+                    job.update(error="Internal server error", error_code="INTERNAL_ERROR")
+                job["status"] = JobStatus.FAILED.value
+                self.failed += 1
+            finally:
+                heartbeat.cancel()
+                if source is not None:
+                    source.close()
+
+            job.update(
+                finished_at=time.time(),
+                processing_time=time.perf_counter() - started,
+                expires_at=time.time() + self.result_ttl
+            )
+            try:
+                await self.store.finish(job, result)
+            except Exception as e:
+                logger.error(f"Failed to store result of job {job['id']}: {str(e)}")
+            trace.finish(status=job["status"])
+
+    async def _renew_lease(self, job_id: str):
+        """Keep a claimed job's lease alive while it is processed."""
+        while True:
+            await asyncio.sleep(settings.JOB_LEASE_TIMEOUT / 3)
+            try:
+                await self.store.renew(job_id)
+            except Exception as e:
+                logger.warning("Could not renew the lease of job %s: %s", job_id, e)
+
+    async def _cleanup_loop(self):
+        while True:
+            await asyncio.sleep(self.cleanup_interval)
+            try:
+                removed = await self.store.cleanup()
+                self.expired += removed
+                if removed:
+                    logger.info(f"Removed {removed} expired jobs")
+            except Exception as e:
+                logger.error(f"Job cleanup failed: {str(e)}")
+
+    def get_stats(self):
+        """Get queue backend and job counters."""
+        return {
+            "backend": self.store.name if self.store is not None else None,
+            "workers": self.concurrency,
+            "running": self.is_running,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "expired": self.expired
+        }
+
+job_queue = JobQueue()
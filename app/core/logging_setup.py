@@ -0,0 +1,160 @@
+import atexit
+import itertools
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from app.config.settings import settings
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# Pass as ``extra`` on success records: they are kept 1 in LOG_SUCCESS_SAMPLE_RATE
+SAMPLED = {"sampled": True}
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message and the record's ``fields``."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry.update(fields)
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, separators=(",", ":"))
+
+class TextFormatter(logging.Formatter):
+    """The plain text format, with a record's ``fields`` appended as ``key=value``."""
+
+    def __init__(self):
+        super().__init__(TEXT_FORMAT)
+
+    def formatMessage(self, record: logging.LogRecord) -> str:
+        message = super().formatMessage(record)
+        fields = getattr(record, "fields", None)
+        if not fields:
+            return message
+        return message + " " + " ".join(f"{key}={value}" for key, value in fields.items())
+
+class SuccessSampler(logging.Filter):
+    """Keep one in ``rate`` records marked ``sampled``; 0 drops them all, 1 keeps them all."""
+
+    def __init__(self, rate: int):
+        super().__init__()
+        self.rate = rate
+        self.skipped = 0
+        self._counter = itertools.count(1)
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not getattr(record, "sampled", False) or self.rate == 1:
+            return True
+        if self.rate > 0 and next(self._counter) % self.rate == 0:
+            return True
+        self.skipped += 1
+        return False
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """Hands records to the listener thread untouched.
+
+    The stock ``prepare`` formats the message (and any traceback) on the
+    calling thread, which is the work this handler exists to move off the
+    event loop. A full queue drops the record and counts it rather than
+    blocking the caller.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class LogPipeline:
+    """Root logging through a bounded queue; a listener thread formats, writes and rotates.
+
+    Callers on the request path only pay for building the record and a
+    ``put_nowait``. Formatting (text or JSON), stdout and the log file,
+    including rotation by size or time, happen on the listener thread.
+    """
+
+    def __init__(self):
+        self.queue: queue.Queue = queue.Queue(max(1, settings.LOG_QUEUE_SIZE))
+        self.handler: Optional[NonBlockingQueueHandler] = None
+        self.sampler = SuccessSampler(settings.LOG_SUCCESS_SAMPLE_RATE)
+        self.listener: Optional[logging.handlers.QueueListener] = None
+        self.outputs: List[logging.Handler] = []
+
+    def _file_handler(self) -> logging.Handler:
+        rotation = settings.LOG_ROTATION.lower()
+        if rotation == "size":
+            return logging.handlers.RotatingFileHandler(
+                settings.LOG_FILE, maxBytes=settings.LOG_MAX_BYTES, backupCount=settings.LOG_BACKUP_COUNT,
+                encoding="utf-8"
+            )
+        if rotation == "time":
+            return logging.handlers.TimedRotatingFileHandler(
+                settings.LOG_FILE, when=settings.LOG_ROTATE_WHEN, backupCount=settings.LOG_BACKUP_COUNT,
+                encoding="utf-8"
+            )
+        if rotation == "none":
+            return logging.FileHandler(settings.LOG_FILE, encoding="utf-8")
+        raise ValueError(f"Unknown LOG_ROTATION: {settings.LOG_ROTATION}. Available: size, time, none")
+
+    def start(self):
+        """Route the root logger through the queue and start the listener thread."""
+        if self.listener is not None:
+            return
+        formatter = JsonFormatter() if settings.LOG_FORMAT.lower() == "json" else TextFormatter()
+        self.outputs = [logging.StreamHandler(sys.stdout)]
+        if settings.LOG_FILE:
+            self.outputs.append(self._file_handler())
+        for output in self.outputs:
+            output.setFormatter(formatter)
+
+        self.handler = NonBlockingQueueHandler(self.queue)
+        # Sampling runs before the record is queued, so skipped records cost nothing more
+        self.handler.addFilter(self.sampler)
+        root = logging.getLogger()
+        for existing in list(root.handlers):
+            root.removeHandler(existing)
+        root.addHandler(self.handler)
+        root.setLevel(getattr(logging, settings.LOG_LEVEL.upper()))
+
+        self.listener = logging.handlers.QueueListener(self.queue, *self.outputs, respect_handler_level=True)
+        self.listener.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        """Write out everything still queued and close the outputs."""
+        if self.listener is None:
+            return
+        self.listener.stop()
+        self.listener = None
+        for output in self.outputs:
+            output.close()
+
+    def get_stats(self) -> Dict:
+        return {
+            "format": settings.LOG_FORMAT.lower(),
+            "queued": self.queue.qsize(),
+            "dropped": self.handler.dropped if self.handler is not None else 0,
+            "success_sample_rate": self.sampler.rate,
+            "sampled_out": self.sampler.skipped
+        }
+
+log_pipeline = LogPipeline()
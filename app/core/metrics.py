@@ -0,0 +1,245 @@
+import os
+import resource
+import sys
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Recording is a bisect plus a few integer increments, without a lock: the
+# GIL keeps each increment consistent, and the rare lost update when two
+# executor threads observe at the same instant is acceptable for metrics.
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+MEGAPIXEL_BUCKETS = (0.1, 0.5, 1, 2, 4, 8, 12, 16, 24, 50, 100)
+BYTES_BUCKETS = (10_000, 50_000, 100_000, 500_000, 1_000_000, 5_000_000, 10_000_000, 50_000_000)
+
+class Histogram:
+    """Fixed-bucket histogram for latency and size distributions."""
+
+    def __init__(self, buckets: Iterable[float]):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        """Record a single observation."""
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def snapshot(self) -> Dict:
+        """Return cumulative bucket counts keyed by upper bound."""
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        buckets["+Inf"] = self.count
+
+        return {
+            "buckets": buckets,
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else 0.0
+        }
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+class Counter(_Metric):
+    """Monotonic counter, optionally split by label values.
+
+    A ``callback`` exposes a count kept elsewhere; it returns a number, or a
+    dict of label-value tuples to numbers, and is read at scrape time.
+    """
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 callback: Optional[Callable] = None):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, *labelvalues, amount: float = 1) -> None:
+        self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def value(self, *labelvalues) -> float:
+        return self._values.get(labelvalues, 0)
+
+    def render(self) -> List[str]:
+        return self.header() + _render_values(self.name, self.labelnames, self._values, self.callback)
+
+def _render_values(name: str, labelnames: Tuple[str, ...], values: Dict[Tuple, float],
+                   callback: Optional[Callable]) -> List[str]:
+    values = dict(values)
+    if callback is not None:
+        result = callback()
+        values.update(result if isinstance(result, dict) else {(): result})
+    return [
+        f"{name}{_format_labels(labelnames, labelvalues)} {_format_value(float(value))}"
+        for labelvalues, value in values.items()
+    ]
+
+class Gauge(_Metric):
+    """Point-in-time value, either set directly or read from a ``callback`` at scrape time."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 callback: Optional[Callable] = None):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+        self._values: Dict[Tuple, float] = {}
+
+    def set(self, value: float, *labelvalues) -> None:
+        self._values[labelvalues] = value
+
+    def inc(self, *labelvalues, amount: float = 1) -> None:
+        self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def dec(self, *labelvalues, amount: float = 1) -> None:
+        self.inc(*labelvalues, amount=-amount)
+
+    def render(self) -> List[str]:
+        return self.header() + _render_values(self.name, self.labelnames, self._values, self.callback)
+
+class HistogramFamily(_Metric):
+    """Histograms sharing a name and buckets, one per label value combination."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, buckets: Iterable[float], labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._children: Dict[Tuple, Histogram] = {}
+
+    def labels(self, *labelvalues) -> Histogram:
+        """The histogram for one label combination; bind it once and reuse it on hot paths."""
+        child = self._children.get(labelvalues)
+        if child is None:
+            child = self._children.setdefault(labelvalues, Histogram(self.buckets))
+        return child
+
+    def adopt(self, histogram: Histogram, *labelvalues) -> None:
+        """Expose an existing ``Histogram`` under this family."""
+        self._children[labelvalues] = histogram
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        for labelvalues, histogram in list(self._children.items()):
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, labelvalues, f'le="{_format_value(float(bound))}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, labelvalues, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{labels} {histogram.count}")
+            labels = _format_labels(self.labelnames, labelvalues)
+            lines.append(f"{self.name}_sum{labels} {_format_value(histogram.sum)}")
+            lines.append(f"{self.name}_count{labels} {histogram.count}")
+        return lines
+
+class MetricsRegistry:
+    """Named metrics rendered together in the Prometheus text exposition format."""
+
+    content_type = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                callback: Optional[Callable] = None) -> Counter:
+        return self.register(Counter(name, documentation, labelnames, callback))
+
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+              callback: Optional[Callable] = None) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames, callback))
+
+    def histogram(self, name: str, documentation: str, buckets: Iterable[float],
+                  labelnames: Iterable[str] = ()) -> HistogramFamily:
+        return self.register(HistogramFamily(name, documentation, buckets, labelnames))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+def process_rss_bytes() -> int:
+    """Current resident set size of this process (peak RSS where /proc is unavailable)."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is bytes on macOS and kilobytes on Linux
+        return peak if sys.platform == "darwin" else peak * 1024
+
+registry = MetricsRegistry()
+
+http_requests = registry.counter(
+    "rmbg_http_requests_total", "HTTP requests by method, route name and status code.", ("method", "route", "status")
+)
+http_request_seconds = registry.histogram(
+    "rmbg_http_request_duration_seconds", "Time to the start of the HTTP response, by route name.",
+    LATENCY_BUCKETS, ("route",)
+)
+http_in_flight = registry.gauge("rmbg_http_requests_in_flight", "HTTP requests currently being served.")
+errors = registry.counter("rmbg_errors_total", "Errors returned to clients by error code.", ("error_code",))
+rate_limit_rejections = registry.counter("rmbg_rate_limit_rejections_total", "Requests rejected by the rate limiter.")
+stage_seconds = registry.histogram(
+    "rmbg_stage_duration_seconds",
+    "Time spent per processing stage (preprocess and inference are per forward pass).",
+    LATENCY_BUCKETS, ("stage",)
+)
+download_seconds = stage_seconds.labels("download")
+decode_seconds = stage_seconds.labels("decode")
+preprocess_seconds = stage_seconds.labels("preprocess")
+inference_seconds = stage_seconds.labels("inference")
+postprocess_seconds = stage_seconds.labels("postprocess")
+encode_seconds = stage_seconds.labels("encode")
+input_megapixels = registry.histogram(
+    "rmbg_input_megapixels", "Input image size in megapixels.", MEGAPIXEL_BUCKETS
+).labels()
+output_bytes = registry.histogram(
+    "rmbg_output_bytes", "Encoded output size in bytes.", BYTES_BUCKETS
+).labels()
+registry.gauge("rmbg_process_resident_memory_bytes", "Resident set size of the API process.",
+               callback=process_rss_bytes)
@@ -0,0 +1,309 @@
+import torch
+import asyncio
+import logging
+import os
+import sys
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+from transformers.models.auto.configuration_auto import AutoConfig
+from transformers.models.auto.modeling_auto import AutoModelForImageSegmentation
+from transformers.models.auto.processing_auto import AutoProcessor
+from PIL import Image
+import numpy as np
+from huggingface_hub import login, snapshot_download, try_to_load_from_cache
+
+from app.config.settings import settings
+from app.core.inference_backends import InferenceBackend, create_backend
+from app.core.preprocessing import PARITY_TOLERANCE, Preprocessor, parity_error
+from app.core import tracing
+from app.core.metrics import inference_seconds, preprocess_seconds, process_rss_bytes
+from app.models.exceptions import ProcessingException
+from app.models.schemas import MaskMode
+from app.services.postprocessing import mask_to_alpha
+
+logger = logging.getLogger(__name__)
+
+def module_bytes(module: Optional[torch.nn.Module]) -> int:
+    """Bytes held by a module's parameters and buffers."""
+    if not isinstance(module, torch.nn.Module):
+        return 0
+    tensors = list(module.parameters()) + list(module.buffers())
+    return sum(tensor.numel() * tensor.element_size() for tensor in tensors)
+
+class ModelManager:
+    """Manages the lifecycle of one model revision (RMBG-2.0 by default)."""
+
+    def __init__(self, backend: Optional[str] = None, model_name: Optional[str] = None,
+                 revision: Optional[str] = None):
+        self.model_name = model_name or settings.MODEL_NAME
+        self.revision = revision or settings.MODEL_REVISION
+        # MODEL_LOCAL_DIR and MODEL_STATE_DICT stage the configured model only
+        self.is_default = (self.model_name, self.revision) == (settings.MODEL_NAME, settings.MODEL_REVISION)
+        self.model = None
+        self.processor = None
+        self.preprocessor: Optional[Preprocessor] = None
+        self.device = settings.DEVICE
+        self.backend_name = (backend or settings.INFERENCE_BACKEND).lower()
+        self.backend: Optional[InferenceBackend] = None
+        self.is_loaded = False
+        self.is_warm = False
+        self.is_authenticated = False
+        self.load_timings: Dict[str, float] = {}
+        self.memory_bytes = 0
+
+    @property
+    def model_id(self) -> str:
+        return f"{self.model_name}@{self.revision}"
+
+    @contextmanager
+    def _timed(self, phase: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self.load_timings[phase] = round(elapsed, 3)
+            logger.info(f"Model {phase} took {elapsed:.2f}s")
+
+    def _resolve_source(self) -> Tuple[str, bool]:
+        """Where to load the weights from and whether the network can be skipped."""
+        if self.is_default and settings.MODEL_LOCAL_DIR:
+            return settings.MODEL_LOCAL_DIR, True
+        if settings.MODEL_OFFLINE or os.path.isdir(self.model_name):
+            return self.model_name, True
+        # Weights already in the Hugging Face cache need no login or download
+        cached = try_to_load_from_cache(self.model_name, "config.json", revision=self.revision)
+        return self.model_name, isinstance(cached, str)
+
+    async def authenticate_huggingface(self):
+        """Authenticate with Hugging Face using token."""
+        try:
+            hf_token = settings.HF_TOKEN
+
+            if not hf_token:
+                raise ProcessingException("No Hugging Face token found")
+
+            logger.info("Authenticating with Hugging Face...")
+            login(token=hf_token)
+            self.is_authenticated = True
+            logger.info("Successfully authenticated with Hugging Face")
+
+        except Exception as e:
+            logger.error(f"Hugging Face authentication failed: {str(e)}")
+            raise ProcessingException(f"Authentication failed: {str(e)}")
+
+    async def load_model(self):
+        """Load the model, from local files when they are available."""
+        try:
+            self.load_timings = {}
+            source, local_only = self._resolve_source()
+            logger.info(f"Loading {self.model_id} on {self.device} from {source} (local_only={local_only})")
+            rss_before = process_rss_bytes()
+
+            try:
+                if not local_only and not self.is_authenticated:
+                    with self._timed("authenticate"):
+                        await self.authenticate_huggingface()
+                await asyncio.to_thread(self._load_weights, source, local_only)
+            except Exception as e:
+                # An incomplete cache falls back to a download; a pre-staged
+                # directory or offline mode has nothing to fall back to
+                if not local_only or source != self.model_name or os.path.isdir(source) or settings.MODEL_OFFLINE:
+                    raise
+                logger.warning(f"Loading from the local cache failed, downloading instead: {str(e)}")
+                if not self.is_authenticated:
+                    with self._timed("authenticate"):
+                        await self.authenticate_huggingface()
+                await asyncio.to_thread(self._load_weights, source, False)
+
+            with self._timed("prepare_preprocessor"):
+                self.preprocessor = await asyncio.to_thread(self._native_preprocessor)
+
+            # Backends that replace the model (ONNX Runtime) hold weights torch cannot see
+            self.memory_bytes = (module_bytes(self.model) or module_bytes(self.backend.module)
+                                 or max(0, process_rss_bytes() - rss_before))
+            self.is_loaded = True
+            logger.info(
+                f"Model {self.model_id} loaded successfully (backend={self.backend.name}, "
+                f"memory={self.memory_bytes / 1e6:.0f}MB, timings={self.load_timings})"
+            )
+
+        except Exception as e:
+            self.is_authenticated = False
+            logger.error(f"Failed to load model: {str(e)}")
+            raise ProcessingException(f"Model loading failed: {str(e)}")
+
+    def _load_weights(self, source: str, local_only: bool):
+        with self._timed("load_weights"):
+            if self.is_default and settings.MODEL_STATE_DICT:
+                self.model = self._load_state_dict(source, local_only)
+            else:
+                self.model = AutoModelForImageSegmentation.from_pretrained(
+                    source,
+                    revision=self.revision,
+                    torch_dtype=torch.float32,
+                    trust_remote_code=True,
+                    local_files_only=local_only
+                )
+
+        with self._timed("load_processor"):
+            self.processor = AutoProcessor.from_pretrained(
+                source,
+                revision=self.revision,
+                trust_remote_code=True,
+                local_files_only=local_only
+            )
+
+        self.model.to(self.device)
+        self.model.eval()
+        if settings.PREPROCESS_CHANNELS_LAST:
+            self.model.to(memory_format=torch.channels_last)
+
+        with self._timed("prepare_backend"):
+            self.backend = create_backend(self.backend_name, self.device, self.model_id)
+            self.backend.prepare(self.model)
+            if self.backend.replaces_model:
+                # The backend holds its own copy of the weights
+                self.model = None
+
+    def _native_preprocessor(self) -> Optional[Preprocessor]:
+        """The vectorised preprocessor, if it reproduces the model's processor."""
+        if not settings.PREPROCESS_NATIVE:
+            return None
+        preprocessor = Preprocessor.from_processor(self.processor, self.device, settings.PREPROCESS_CHANNELS_LAST)
+        if preprocessor is None:
+            logger.info(f"{type(self.processor).__name__} does not expose its settings, keeping it for preprocessing")
+            return None
+        try:
+            error = parity_error(preprocessor, self.processor)
+        except Exception as e:
+            logger.warning(f"Could not compare native preprocessing with the processor, keeping it: {str(e)}")
+            return None
+        if error > PARITY_TOLERANCE:
+            logger.warning(f"Native preprocessing differs from {type(self.processor).__name__} by {error:.2e}, "
+                           f"keeping the processor")
+            return None
+        logger.info(f"Native preprocessing enabled (max difference from the processor {error:.1e})")
+        return preprocessor
+
+    def _load_state_dict(self, source: str, local_only: bool) -> torch.nn.Module:
+        """Build the model on the meta device and adopt memory-mapped weights without copying."""
+        config = AutoConfig.from_pretrained(source, revision=self.revision, trust_remote_code=True,
+                                            local_files_only=local_only)
+        with torch.device("meta"):
+            model = AutoModelForImageSegmentation.from_config(
+                config, trust_remote_code=True, torch_dtype=torch.float32
+            )
+
+        path = settings.MODEL_STATE_DICT
+        if path.endswith(".safetensors"):
+            from safetensors.torch import load_file
+            state_dict = load_file(path, device=self.device)
+        else:
+            state_dict = torch.load(path, map_location=self.device, mmap=True, weights_only=True)
+        model.load_state_dict(state_dict, assign=True)
+
+        missing = [
+            name for name, tensor in list(model.named_parameters()) + list(model.named_buffers())
+            if tensor.is_meta
+        ]
+        if missing:
+            raise ProcessingException(f"State dict {path} is missing {len(missing)} tensors, e.g. {missing[0]}")
+        return model
+
+    def warm_up(self):
+        """Run synthetic batches so the first request does not pay for lazy initialisation."""
+        if settings.WARMUP_BATCHES <= 0:
+            self.is_warm = True
+            return
+
+        with self._timed("warm_up"):
+            size = settings.MODEL_INPUT_SIZE
+            image = Image.new("RGB", (size, size), (127, 127, 127))
+            batch = [image] * max(1, settings.WARMUP_BATCH_SIZE)
+            for _ in range(settings.WARMUP_BATCHES):
+                masks = self.predict_masks(batch)
+            # Touch the post-processing paths too (OpenCV kernels, tile executor)
+            for mode in MaskMode:
+                mask_to_alpha(masks[0], image.size, mode, guide=image)
+        self.is_warm = True
+
+    def predict_masks(self, images: List[Image.Image]) -> List[np.ndarray]:
+        """Run one batched forward pass and return a [0, 1] mask per image."""
+        if not self.is_loaded or self.processor is None or self.backend is None:
+            raise ProcessingException("Model or processor not loaded")
+
+        try:
+            # The processor resizes every image to the model input shape, so
+            # RGB-normalised inputs can be stacked into a single batch tensor.
+            with tracing.span("preprocess", preprocess_seconds, native=self.preprocessor is not None):
+                if self.preprocessor is not None:
+                    pixel_values = self.preprocessor(images)
+                else:
+                    images = [img if img.mode == "RGB" else img.convert("RGB") for img in images]
+                    inputs = self.processor(images, return_tensors="pt")
+                    if 'images' in inputs:
+                        pixel_values = inputs['images']
+                    elif 'pixel_values' in inputs:
+                        pixel_values = inputs['pixel_values']
+                    else:
+                        raise ValueError("Expected 'images' or 'pixel_values' in inputs")
+
+            with tracing.span("inference", inference_seconds, backend=self.backend.name):
+                logits = self.backend.forward(pixel_values)
+                masks = logits.sigmoid().float().cpu().numpy()
+
+            masks = masks.reshape(len(images), *masks.shape[-2:])
+            return [masks[i] for i in range(len(images))]
+
+        except ProcessingException:
+            raise
+        except Exception as e:
+            logger.error(f"Batched inference failed: {str(e)}")
+            raise ProcessingException(f"Image processing failed: {str(e)}")
+
+    def unload_model(self):
+        """Unload the model and free resources."""
+        if self.is_loaded:
+            if self.backend is not None:
+                self.backend.close()
+            self.backend = None
+            self.model = None
+            self.processor = None
+            self.preprocessor = None
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+            self.is_loaded = False
+            self.is_warm = False
+            self.memory_bytes = 0
+            logger.info(f"Model {self.model_id} unloaded successfully")
+
+    def get_status(self):
+        """Get model manager status."""
+        return {
+            "is_authenticated": self.is_authenticated,
+            "is_loaded": self.is_loaded,
+            "is_warm": self.is_warm,
+            "device": self.device,
+            "backend": self.backend_name,
+            "native_preprocessing": self.preprocessor is not None,
+            "model_name": self.model_name,
+            "revision": self.revision,
+            "memory_bytes": self.memory_bytes,
+            "load_timings": self.load_timings
+        }
+
+def stage_weights(target_dir: str) -> str:
+    """Download the model repository into ``target_dir`` for ``MODEL_LOCAL_DIR``."""
+    path = snapshot_download(settings.MODEL_NAME, revision=settings.MODEL_REVISION, local_dir=target_dir,
+                             token=settings.HF_TOKEN or None)
+    logger.info(f"Staged {settings.MODEL_NAME} in {path}")
+    return path
+
+if __name__ == "__main__":
+    # python -m app.core.model_manager stage <dir>
+    if len(sys.argv) != 3 or sys.argv[1] != "stage":
+        raise SystemExit("usage: python -m app.core.model_manager stage <dir>")
+    logging.basicConfig(level=logging.INFO)
+    print(stage_weights(sys.argv[2]))
@@ -0,0 +1,254 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional, Set, Tuple
+
+from app.config.settings import settings
+from app.core.batch_scheduler import BATCH_SIZE_BUCKETS, QUEUE_WAIT_BUCKETS, BatchScheduler
+from app.core.metrics import Histogram
+from app.core.model_manager import ModelManager
+from app.models.exceptions import ValidationException
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "default"
+
+def parse_models(spec: str) -> Dict[str, Tuple[str, str]]:
+    """Parse ``MODELS`` into ``{name: (repo, revision)}``, always including ``default``."""
+    models = {DEFAULT_MODEL: (settings.MODEL_NAME, settings.MODEL_REVISION)}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, separator, source = (value.strip() for value in item.partition("="))
+        if not separator or not name or not source:
+            raise ValueError(f"Invalid MODELS entry '{item}', expected NAME=REPO[@REVISION]")
+        repo, _, revision = source.partition("@")
+        models[name] = (repo, revision or "main")
+    return models
+
+class ModelEntry:
+    """One model revision: its manager, its batch scheduler and usage counters."""
+
+    def __init__(self, repo: str, revision: str, batch_size_histogram: Histogram,
+                 queue_wait_histogram: Histogram):
+        self.manager = ModelManager(model_name=repo, revision=revision)
+        self.scheduler = BatchScheduler(self.manager, batch_size_histogram, queue_wait_histogram)
+        self.lock = asyncio.Lock()
+        self.in_flight = 0
+        self.retired = False
+        self.memory_bytes = 0  # kept after eviction so a reload can make room up front
+        self.requests = 0
+        self.loads = 0
+        self.load_failures = 0
+        self.evictions = 0
+        self.load_seconds: Optional[float] = None
+        self.last_used: Optional[float] = None
+
+    @property
+    def model_id(self) -> str:
+        return self.manager.model_id
+
+    def get_stats(self) -> Dict:
+        return {
+            "loaded": self.manager.is_loaded,
+            "backend": self.manager.backend_name,
+            "in_flight": self.in_flight,
+            "memory_bytes": self.memory_bytes,
+            "requests": self.requests,
+            "loads": self.loads,
+            "load_failures": self.load_failures,
+            "evictions": self.evictions,
+            "load_seconds": self.load_seconds,
+            "last_used": self.last_used,
+            "queue_depth": self.scheduler.queue.qsize() if self.scheduler.queue is not None else 0
+        }
+
+class ModelRegistry:
+    """Named models, loaded on first use and evicted least-recently-used under a memory budget.
+
+    Names map to model revisions (``repo@revision``). Names that point at the
+    same revision share one entry, so its weights are loaded once and every
+    request for it goes through the same batch scheduler. A request holds its
+    entry for as long as it runs: eviction skips entries in use, and a
+    swapped-out revision is unloaded only after its last request finished.
+    """
+
+    def __init__(self):
+        self.budget_bytes = settings.MODEL_MEMORY_BUDGET_MB * 1024 * 1024
+        # Shared by every model's scheduler, so batching metrics stay aggregate
+        self.batch_size_histogram = Histogram(BATCH_SIZE_BUCKETS)
+        self.queue_wait_histogram = Histogram(QUEUE_WAIT_BUCKETS)
+        self.aliases: Dict[str, str] = {}  # name -> model id
+        self.entries: Dict[str, ModelEntry] = {}  # model id -> entry
+        self.resident: "OrderedDict[str, ModelEntry]" = OrderedDict()  # least recently used first
+        self.swaps = 0
+        self._swap_lock = asyncio.Lock()
+        self._unloads: Set[asyncio.Task] = set()
+        for name, (repo, revision) in parse_models(settings.MODELS).items():
+            self.aliases[name] = self._entry(repo, revision).model_id
+
+    def _entry(self, repo: str, revision: str) -> ModelEntry:
+        model_id = f"{repo}@{revision}"
+        entry = self.entries.get(model_id)
+        if entry is None:
+            entry = self.entries[model_id] = ModelEntry(
+                repo, revision, self.batch_size_histogram, self.queue_wait_histogram
+            )
+        return entry
+
+    def resolve(self, name: Optional[str] = None) -> ModelEntry:
+        """The entry currently serving ``name``; ``None`` is the default model."""
+        model_id = self.aliases.get(name or DEFAULT_MODEL)
+        if model_id is None:
+            raise ValidationException(f"Unknown model '{name}'. Available: {', '.join(sorted(self.aliases))}")
+        return self.entries[model_id]
+
+    @property
+    def default(self) -> ModelEntry:
+        return self.resolve(DEFAULT_MODEL)
+
+    @property
+    def resident_bytes(self) -> int:
+        return sum(entry.memory_bytes for entry in self.resident.values())
+
+    @asynccontextmanager
+    async def use(self, name: Optional[str] = None) -> AsyncIterator[ModelEntry]:
+        """Hold a loaded model for the duration of one request."""
+        entry = self.resolve(name)
+        entry.in_flight += 1
+        try:
+            if self.resident.get(entry.model_id) is entry:
+                self.resident.move_to_end(entry.model_id)
+            else:
+                await self._load(entry)
+            entry.requests += 1
+            entry.last_used = time.time()
+            yield entry
+        finally:
+            self._release(entry)
+
+    async def preload(self, name: Optional[str] = None) -> ModelEntry:
+        """Load a model ahead of its first request (the default one at startup)."""
+        entry = self.resolve(name)
+        entry.in_flight += 1
+        try:
+            await self._load(entry)
+        finally:
+            self._release(entry)
+        return entry
+
+    async def _load(self, entry: ModelEntry):
+        async with entry.lock:
+            if not entry.manager.is_loaded:
+                await self._make_room(entry.memory_bytes, keep=entry)
+                started = time.perf_counter()
+                try:
+                    await entry.manager.load_model()
+                    await asyncio.to_thread(entry.manager.warm_up)
+                    await entry.scheduler.start()
+                except Exception:
+                    entry.load_failures += 1
+                    entry.manager.unload_model()
+                    raise
+                entry.loads += 1
+                entry.load_seconds = round(time.perf_counter() - started, 3)
+                entry.memory_bytes = entry.manager.memory_bytes
+            if not entry.retired:
+                self.resident[entry.model_id] = entry
+                self.resident.move_to_end(entry.model_id)
+        # The new model's size is only known now that it is loaded
+        await self._make_room(0, keep=entry)
+
+    async def _make_room(self, incoming: int, keep: ModelEntry):
+        """Evict idle models, least recently used first, until ``incoming`` bytes fit the budget."""
+        if self.budget_bytes <= 0:
+            return
+        for entry in list(self.resident.values()):
+            if self.resident_bytes + incoming <= self.budget_bytes:
+                return
+            if entry is keep or entry.in_flight or self.resident.get(entry.model_id) is not entry:
+                continue
+            # Dropping it from ``resident`` first sends new requests to _load,
+            # where they wait on the entry lock until the unload is done
+            del self.resident[entry.model_id]
+            entry.evictions += 1
+            logger.info(f"Evicting model {entry.model_id} ({entry.memory_bytes / 1e6:.0f}MB) for the memory budget")
+            await self._unload(entry)
+        if self.resident_bytes + incoming > self.budget_bytes:
+            logger.warning(
+                f"Models in use need {(self.resident_bytes + incoming) / 1e6:.0f}MB, "
+                f"over MODEL_MEMORY_BUDGET_MB={settings.MODEL_MEMORY_BUDGET_MB}"
+            )
+
+    async def _unload(self, entry: ModelEntry):
+        async with entry.lock:
+            if entry.manager.is_loaded:
+                await entry.scheduler.stop()
+                await asyncio.to_thread(entry.manager.unload_model)
+
+    def _release(self, entry: ModelEntry):
+        entry.in_flight -= 1
+        if entry.retired and entry.in_flight == 0:
+            self._unload_later(entry)
+
+    def _unload_later(self, entry: ModelEntry):
+        task = asyncio.create_task(self._unload(entry))
+        self._unloads.add(task)
+        task.add_done_callback(self._unloads.discard)
+
+    async def swap(self, name: str, revision: str) -> ModelEntry:
+        """Point ``name`` at another revision of its repository without dropping requests.
+
+        The new revision is loaded and warmed up while the old one keeps
+        serving. Requests already holding the old revision finish on it, and
+        it is unloaded once the last of them is done (unless another name
+        still points at it).
+        """
+        async with self._swap_lock:
+            old = self.resolve(name)
+            if revision == old.manager.revision:
+                return old
+            entry = self._entry(old.manager.model_name, revision)
+            entry.in_flight += 1
+            try:
+                await self._load(entry)
+            finally:
+                self._release(entry)
+
+            self.aliases[name] = entry.model_id
+            self.swaps += 1
+            logger.info(f"Model '{name}' swapped from {old.model_id} to {entry.model_id}")
+            if old.model_id not in self.aliases.values():
+                self._retire(old)
+            return entry
+
+    def _retire(self, entry: ModelEntry):
+        entry.retired = True
+        self.entries.pop(entry.model_id, None)
+        self.resident.pop(entry.model_id, None)
+        if entry.in_flight == 0:
+            self._unload_later(entry)
+
+    async def close(self):
+        """Unload every model, including swapped-out ones still draining."""
+        for entry in list(self.resident.values()):
+            await self._unload(entry)
+        self.resident.clear()
+        if self._unloads:
+            await asyncio.gather(*self._unloads, return_exceptions=True)
+
+    def get_stats(self) -> Dict:
+        names: Dict[str, List[str]] = {}
+        for name, model_id in self.aliases.items():
+            names.setdefault(model_id, []).append(name)
+        return {
+            "budget_bytes": self.budget_bytes,
+            "resident_bytes": self.resident_bytes,
+            "swaps": self.swaps,
+            "models": {
+                model_id: dict(entry.get_stats(), names=names.get(model_id, []))
+                for model_id, entry in self.entries.items()
+            }
+        }
+
+model_registry = ModelRegistry()
@@ -0,0 +1,120 @@
+import logging
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+import torch
+from PIL import Image
+
+from app.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# The largest absolute difference from the model's own processor that still counts as parity
+PARITY_TOLERANCE = 1e-4
+
+class Preprocessor:
+    """Resize and normalise PIL images straight into a reusable float32 batch tensor.
+
+    Rescaling and normalisation are folded into one 256-entry lookup table
+    per channel, so each channel plane is written with a single gather from
+    the resized uint8 pixels into the batch tensor, which also does the
+    HWC to CHW transpose. The tensor is allocated once, grown when a larger
+    batch arrives, pinned when the model runs on a GPU, and can be
+    channels-last. It is overwritten by the next call, so use the result
+    before preprocessing again (``predict_masks`` runs on one thread per model).
+    """
+
+    def __init__(self, size: Tuple[int, int], mean: Sequence[float], std: Sequence[float],
+                 rescale_factor: float = 1 / 255, resample: Image.Resampling = Image.Resampling.BILINEAR,
+                 device: str = "cpu", channels_last: bool = False):
+        self.width, self.height = size
+        self.resample = resample
+        self.device = device
+        self.channels_last = channels_last
+        values = np.arange(256, dtype=np.float64)
+        self.lut = np.stack([
+            (values * rescale_factor - channel_mean) / channel_std
+            for channel_mean, channel_std in zip(mean, std)
+        ]).astype(np.float32)
+        self.buffer: Optional[torch.Tensor] = None
+        self._planes: Optional[np.ndarray] = None
+
+    @classmethod
+    def from_processor(cls, processor, device: str = "cpu",
+                       channels_last: bool = False) -> Optional["Preprocessor"]:
+        """Build one from an image processor's settings; ``None`` if it does not expose them."""
+        image_processor = getattr(processor, "image_processor", processor)
+        mean = getattr(image_processor, "image_mean", None)
+        std = getattr(image_processor, "image_std", None)
+        size = _target_size(getattr(image_processor, "size", None))
+        if mean is None or std is None or size is None:
+            return None
+        if not getattr(image_processor, "do_normalize", True):
+            mean, std = (0.0, 0.0, 0.0), (1.0, 1.0, 1.0)
+        rescale_factor = getattr(image_processor, "rescale_factor", 1 / 255)
+        if not getattr(image_processor, "do_rescale", True):
+            rescale_factor = 1.0
+        resample = Image.Resampling(int(getattr(image_processor, "resample", Image.Resampling.BILINEAR)))
+        return cls(size, mean, std, rescale_factor, resample, device, channels_last)
+
+    def _ensure_buffer(self, batch_size: int):
+        if self.buffer is not None and self.buffer.shape[0] >= batch_size:
+            return
+        # Room for the configured batch size up front, so steady state never reallocates
+        capacity = max(batch_size, settings.BATCH_MAX_SIZE, 1)
+        shape = (capacity, 3, self.height, self.width)
+        pin = self.device.startswith("cuda") and torch.cuda.is_available()
+        if self.channels_last:
+            buffer = torch.empty((capacity, self.height, self.width, 3), dtype=torch.float32, pin_memory=pin)
+            self.buffer = buffer.permute(0, 3, 1, 2)
+            # Channel c of image i is a strided (H, W) view into the NHWC memory
+            self._planes = buffer.numpy().transpose(0, 3, 1, 2)
+        else:
+            self.buffer = torch.empty(shape, dtype=torch.float32, pin_memory=pin)
+            self._planes = self.buffer.numpy()
+
+    def _fill(self, index: int, image: Image.Image):
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        if image.size != (self.width, self.height):
+            image = image.resize((self.width, self.height), self.resample)
+        pixels = np.asarray(image)
+        for channel in range(3):
+            # uint8 indices are always in range; the default mode="raise" would buffer ``out``
+            np.take(self.lut[channel], pixels[:, :, channel], out=self._planes[index, channel], mode="clip")
+
+    def __call__(self, images: List[Image.Image]) -> torch.Tensor:
+        """Return the ``(N, 3, H, W)`` model input for ``images``, on the model's device."""
+        self._ensure_buffer(len(images))
+        for index, image in enumerate(images):
+            self._fill(index, image)
+        batch = self.buffer[:len(images)]
+        if self.device != "cpu":
+            batch = batch.to(self.device, non_blocking=True)
+        return batch
+
+def _target_size(size) -> Optional[Tuple[int, int]]:
+    """``(width, height)`` from a processor's ``size`` (an int, a dict or a SizeDict)."""
+    if size is None:
+        return None
+    if isinstance(size, int):
+        return size, size
+    get = size.get if isinstance(size, dict) else lambda key: getattr(size, key, None)
+    height, width = get("height"), get("width")
+    if height and width:
+        return int(width), int(height)
+    return None
+
+def parity_error(preprocessor: Preprocessor, processor, seed: int = 0) -> float:
+    """Largest absolute difference from ``processor`` on random images of two odd sizes."""
+    generator = np.random.default_rng(seed)
+    images = [
+        Image.fromarray(generator.integers(0, 256, (height, width, 3), dtype=np.uint8))
+        for width, height in ((641, 479), (1333, 1001))
+    ]
+    inputs = processor(images, return_tensors="pt")
+    expected = inputs["pixel_values"] if "pixel_values" in inputs else inputs["images"]
+    actual = preprocessor(images).cpu()
+    if tuple(expected.shape) != tuple(actual.shape):
+        return float("inf")
+    return float((expected.float() - actual).abs().max())
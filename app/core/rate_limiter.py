@@ -1,31 +1,260 @@
+import logging
 import time
-from typing import Dict, List
+from collections import OrderedDict
+from typing import List
 
 from app.config.settings import settings
+from app.core.metrics import rate_limit_rejections
+
+logger = logging.getLogger(__name__)
+
+# Idle keys evicted per check at most; each check adds at most one key, so
+# eviction keeps up while no single check pays for a whole window expiring.
+EVICT_BATCH = 16
+
+class SlidingWindowCounter:
+    """In-process sliding-window counter with constant state per key.
+
+    Each key keeps the current fixed window's index and count plus the previous
+    window's count; the previous count is weighted by how much of it still
+    overlaps the sliding window. Keys are kept in access order so idle ones are
+    evicted from the front as a side effect of normal checks.
+    """
+
+    def __init__(self, limit: int, window: float):
+        self.limit = limit
+        self.window = window
+        self._entries: "OrderedDict[str, List]" = OrderedDict()
+        self.evictions = 0
+
+    def allow(self, key: str, now: float) -> bool:
+        current_window, offset = divmod(now, self.window)
+        current_window = int(current_window)
+
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = [current_window, 0, 0]
+            self._entries[key] = entry
+        else:
+            self._entries.move_to_end(key)
+            if entry[0] != current_window:
+                entry[2] = entry[1] if entry[0] == current_window - 1 else 0
+                entry[1] = 0
+                entry[0] = current_window
+
+        self._evict(current_window)
+
+        estimate = entry[2] * (1 - offset / self.window) + entry[1]
+        if estimate >= self.limit:
+            return False
+        entry[1] += 1
+        return True
+
+    def _evict(self, current_window: int):
+        # Entries two or more windows old contribute nothing to the estimate
+        entries = self._entries
+        for _ in range(EVICT_BATCH):
+            if not entries:
+                break
+            key, entry = next(iter(entries.items()))
+            if entry[0] >= current_window - 1:
+                break
+            del entries[key]
+            self.evictions += 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+class TokenBucket:
+    """In-process token bucket: ``limit`` tokens refilled evenly over ``window``."""
+
+    def __init__(self, limit: int, window: float):
+        self.limit = limit
+        self.window = window
+        self.rate = limit / window
+        self._entries: "OrderedDict[str, List[float]]" = OrderedDict()
+        self.evictions = 0
+
+    def allow(self, key: str, now: float) -> bool:
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = [float(self.limit), now]
+            self._entries[key] = entry
+        else:
+            self._entries.move_to_end(key)
+            entry[0] = min(self.limit, entry[0] + (now - entry[1]) * self.rate)
+            entry[1] = now
+
+        self._evict(now)
+
+        if entry[0] < 1:
+            return False
+        entry[0] -= 1
+        return True
+
+    def _evict(self, now: float):
+        # A bucket idle for a whole window is full again, same as a new one
+        entries = self._entries
+        for _ in range(EVICT_BATCH):
+            if not entries:
+                break
+            key, entry = next(iter(entries.items()))
+            if now - entry[1] < self.window:
+                break
+            del entries[key]
+            self.evictions += 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+# Both scripts take the clock from the Redis server so every API node agrees on it.
+SLIDING_WINDOW_SCRIPT = """
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local current_window = math.floor(now / window)
+
+local state = redis.call('HMGET', KEYS[1], 'w', 'c', 'p')
+local w = tonumber(state[1])
+local current = tonumber(state[2]) or 0
+local previous = tonumber(state[3]) or 0
+if w ~= current_window then
+    if w == current_window - 1 then previous = current else previous = 0 end
+    current = 0
+end
+
+local estimate = previous * (1 - (now - current_window * window) / window) + current
+local allowed = 0
+if estimate < limit then
+    current = current + 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'w', current_window, 'c', current, 'p', previous)
+redis.call('EXPIRE', KEYS[1], math.ceil(window * 2))
+return allowed
+"""
+
+TOKEN_BUCKET_SCRIPT = """
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1])
+local ts = tonumber(state[2])
+if tokens == nil then
+    tokens = limit
+else
+    tokens = math.min(limit, tokens + (now - ts) * limit / window)
+end
+
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(window))
+return allowed
+"""
+
+class RedisRateLimit:
+    """Rate limit shared by every API process through an atomic Lua script."""
+
+    KEY_PREFIX = "ratelimit:"
+
+    def __init__(self, url: str, algorithm: str, limit: int, window: float):
+        self.url = url
+        self.limit = limit
+        self.window = window
+        self.script_source = TOKEN_BUCKET_SCRIPT if algorithm == "token_bucket" else SLIDING_WINDOW_SCRIPT
+        self._redis = None
+        self._script = None
+
+    def _get_script(self):
+        if self._script is None:
+            import redis.asyncio as redis
+            self._redis = redis.from_url(self.url)
+            # register_script runs EVALSHA and falls back to EVAL when the script is not cached
+            self._script = self._redis.register_script(self.script_source)
+        return self._script
+
+    async def allow(self, key: str) -> bool:
+        script = self._get_script()
+        return bool(await script(keys=[self.KEY_PREFIX + key], args=[self.limit, self.window]))
+
+    async def close(self):
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
+            self._script = None
 
 class RateLimiter:
     """Rate limiting implementation."""
-    
+
     def __init__(self):
-        self.requests: Dict[str, List[float]] = {}
-    
+        self.backend = settings.RATE_LIMIT_BACKEND.lower()
+        self.algorithm = settings.RATE_LIMIT_ALGORITHM.lower()
+        self.limit = settings.RATE_LIMIT_REQUESTS
+        self.window = settings.RATE_LIMIT_WINDOW
+
+        if self.algorithm == "token_bucket":
+            self.local = TokenBucket(self.limit, self.window)
+        elif self.algorithm == "sliding_window":
+            self.local = SlidingWindowCounter(self.limit, self.window)
+        else:
+            raise ValueError(f"Unknown rate limit algorithm: {self.algorithm}")
+
+        if self.backend == "redis":
+            self.remote = RedisRateLimit(settings.REDIS_URL, self.algorithm, self.limit, self.window)
+        elif self.backend == "memory":
+            self.remote = None
+        else:
+            raise ValueError(f"Unknown rate limit backend: {self.backend}")
+
+        self.allowed = 0
+        self.rejected = 0
+        self.redis_errors = 0
+
     async def check_rate_limit(self, identifier: str) -> bool:
         """Check if request is within rate limits."""
-        current_time = time.time()
-        window_start = current_time - settings.RATE_LIMIT_WINDOW
-        
-        if identifier in self.requests:
-            self.requests[identifier] = [
-                req_time for req_time in self.requests[identifier]
-                if req_time > window_start
-            ]
+        if self.remote is not None:
+            try:
+                allowed = await self.remote.allow(identifier)
+            except Exception as e:
+                # Keep limiting per process rather than failing requests
+                self.redis_errors += 1
+                logger.warning("Redis rate limit check failed, using in-process limiter: %s", e)
+                allowed = self.local.allow(identifier, time.monotonic())
         else:
-            self.requests[identifier] = []
-        
-        if len(self.requests[identifier]) >= settings.RATE_LIMIT_REQUESTS:
-            return False
-        
-        self.requests[identifier].append(current_time)
-        return True
+            allowed = self.local.allow(identifier, time.monotonic())
+
+        if allowed:
+            self.allowed += 1
+        else:
+            self.rejected += 1
+            rate_limit_rejections.inc()
+        return allowed
+
+    async def close(self):
+        """Close the Redis connection if one was opened."""
+        if self.remote is not None:
+            await self.remote.close()
+
+    def get_stats(self):
+        """Get rate limiter counters."""
+        return {
+            "backend": self.backend,
+            "algorithm": self.algorithm,
+            "limit": self.limit,
+            "window": self.window,
+            "tracked_keys": len(self.local),
+            "evictions": self.local.evictions,
+            "allowed": self.allowed,
+            "rejected": self.rejected,
+            "redis_errors": self.redis_errors
+        }
 
-rate_limiter = RateLimiter()
\ No newline at end of file
+rate_limiter = RateLimiter()
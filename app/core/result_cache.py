@@ -0,0 +1,136 @@
+import asyncio
+import hashlib
+import logging
+import struct
+import zlib
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+
+from app.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+_HEADER = struct.Struct("!II")
+
+def _pack_alpha(alpha: np.ndarray) -> bytes:
+    """Serialise an alpha mask as its shape followed by zlib-compressed pixels."""
+    height, width = alpha.shape
+    return _HEADER.pack(height, width) + zlib.compress(np.ascontiguousarray(alpha), 1)
+
+def _unpack_alpha(payload: bytes) -> np.ndarray:
+    height, width = _HEADER.unpack_from(payload)
+    alpha = np.frombuffer(zlib.decompress(payload[_HEADER.size:]), dtype=np.uint8)
+    return alpha.reshape(height, width)
+
+class MaskCache:
+    """Content-addressed alpha mask cache with an optional Redis tier."""
+
+    def __init__(self):
+        self.enabled = settings.MASK_CACHE_ENABLED
+        self.max_bytes = settings.MASK_CACHE_MAX_BYTES
+        self.use_redis = settings.MASK_CACHE_REDIS
+        self.redis_ttl = settings.MASK_CACHE_TTL
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self.current_bytes = 0
+        self.hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.redis_errors = 0
+        self._redis = None
+
+    @staticmethod
+    def make_key(content_digest: str, **params) -> str:
+        """Combine the upload's content digest with everything that shapes the mask."""
+        suffix = "|".join(f"{name}={params[name]}" for name in sorted(params))
+        return hashlib.sha256(f"{content_digest}|{suffix}".encode()).hexdigest()
+
+    def _get_redis(self):
+        if self._redis is None:
+            import redis.asyncio as redis
+            self._redis = redis.from_url(settings.REDIS_URL)
+        return self._redis
+
+    async def get(self, key: str) -> Optional[np.ndarray]:
+        """Look up a mask, promoting Redis hits into the in-process tier."""
+        if not self.enabled:
+            return None
+
+        alpha = self._entries.get(key)
+        if alpha is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return alpha
+
+        if self.use_redis:
+            try:
+                payload = await self._get_redis().get(f"mask:{key}")
+            except Exception as e:
+                self.redis_errors += 1
+                logger.warning("Mask cache Redis lookup failed: %s", e)
+                payload = None
+
+            if payload is not None:
+                alpha = await asyncio.to_thread(_unpack_alpha, payload)
+                self._store(key, alpha)
+                self.redis_hits += 1
+                return alpha
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, alpha: np.ndarray) -> None:
+        """Store a mask in the in-process tier and, if enabled, in Redis."""
+        if not self.enabled:
+            return
+
+        self._store(key, alpha)
+
+        if self.use_redis:
+            try:
+                payload = await asyncio.to_thread(_pack_alpha, alpha)
+                await self._get_redis().set(f"mask:{key}", payload, ex=self.redis_ttl)
+            except Exception as e:
+                self.redis_errors += 1
+                logger.warning("Mask cache Redis store failed: %s", e)
+
+    def _store(self, key: str, alpha: np.ndarray):
+        if alpha.nbytes > self.max_bytes:
+            return
+
+        if key in self._entries:
+            self.current_bytes -= self._entries.pop(key).nbytes
+
+        alpha.flags.writeable = False
+        self._entries[key] = alpha
+        self.current_bytes += alpha.nbytes
+
+        while self.current_bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.current_bytes -= evicted.nbytes
+            self.evictions += 1
+
+    async def close(self):
+        """Close the Redis connection if one was opened."""
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
+
+    def get_stats(self):
+        """Get cache hit/miss/eviction counters."""
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "bytes": self.current_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "redis_enabled": self.use_redis,
+            "redis_errors": self.redis_errors
+        }
+
+mask_cache = MaskCache()
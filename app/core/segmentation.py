@@ -0,0 +1,46 @@
+from typing import Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from app.config.settings import settings
+from app.core.inference_pool import inference_pool
+from app.core import tracing
+from app.core.metrics import postprocess_seconds
+from app.core.model_registry import model_registry
+from app.core.worker_pool import worker_pool
+from app.models.exceptions import ValidationException
+from app.models.schemas import MaskMode
+from app.services.postprocessing import MASK_THRESHOLD, mask_to_alpha
+
+async def predict_alpha(image: Image.Image, mode: MaskMode = MaskMode.BINARY,
+                        threshold: float = MASK_THRESHOLD,
+                        size: Optional[Tuple[int, int]] = None,
+                        guide: Optional[Image.Image] = None,
+                        model: Optional[str] = None) -> np.ndarray:
+    """Return a uint8 alpha mask of ``size`` (default: the image size).
+
+    ``image`` may be a reduced-resolution decode of the original. The refined
+    mode also needs ``guide``, the full-resolution image; it defaults to
+    ``image``. ``model`` is a registry name, ``None`` for the default model.
+    """
+    size = size or image.size
+    guide = guide or image
+    if settings.INFERENCE_MODE == "workers":
+        check_worker_model(model)
+        # Workers get one pixel buffer, used as both model input and guide
+        source = guide if mode == MaskMode.REFINED else image
+        with tracing.span("worker", mode=mode.value):
+            return await worker_pool.predict_alpha(source, mode, threshold, size)
+
+    async with model_registry.use(model) as entry:
+        mask = await entry.scheduler.submit(image)
+    # The model input doubles as a cheap preview of the guide for refinement
+    preview = image if guide is not image else None
+    with tracing.span("postprocess", postprocess_seconds, mode=mode.value):
+        return await inference_pool.run(mask_to_alpha, mask, size, mode, threshold, guide, None, preview)
+
+def check_worker_model(model: Optional[str]) -> None:
+    """Inference processes load the default model only."""
+    if model_registry.resolve(model) is not model_registry.default:
+        raise ValidationException("INFERENCE_MODE=workers serves only the default model")
@@ -0,0 +1,95 @@
+import asyncio
+import logging
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Dict, Optional
+
+from app.config.settings import settings
+from app.models.exceptions import ServiceNotReadyException
+
+logger = logging.getLogger(__name__)
+
+class StartupState:
+    """Tracks model loading and warm-up so the service only reports ready once both finished."""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.phases: Dict[str, float] = {}
+        self.ready = False
+        self.error: Optional[str] = None
+        self.ready_seconds: Optional[float] = None
+        self._began = time.perf_counter()
+        self._task: Optional[asyncio.Task] = None
+
+    @contextmanager
+    def phase(self, name: str):
+        """Time one startup phase and log how long it took."""
+        started = time.perf_counter()
+        logger.info(f"Startup phase '{name}' started")
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self.phases[name] = round(elapsed, 3)
+            logger.info(f"Startup phase '{name}' finished in {elapsed:.2f}s")
+
+    def record(self, phases: Dict[str, float]):
+        """Add phases timed elsewhere, e.g. inside the model manager."""
+        for name, elapsed in phases.items():
+            self.phases[name] = round(elapsed, 3)
+
+    def start(self, startup: Callable[[], Awaitable[None]]):
+        """Run the startup sequence in the background; liveness is served meanwhile."""
+        self._began = time.perf_counter()
+        self._task = asyncio.create_task(self._run(startup))
+
+    async def _run(self, startup: Callable[[], Awaitable[None]]):
+        try:
+            await startup()
+        except Exception as e:
+            self.error = str(e)
+            logger.error(f"Startup failed: {str(e)}")
+            return
+        self.ready_seconds = round(time.perf_counter() - self._began, 3)
+        self.ready = True
+        logger.info(f"Service ready in {self.ready_seconds:.2f}s ({self.phases})")
+
+    async def wait(self):
+        """Wait for the startup sequence; re-raises its failure."""
+        if self._task is not None:
+            await asyncio.shield(self._task)
+        if self.error is not None:
+            raise RuntimeError(self.error)
+
+    async def stop(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    def ensure_ready(self):
+        """Reject work until the model is loaded and warmed up."""
+        if self.ready:
+            return
+        if self.error is not None:
+            raise ServiceNotReadyException(f"Service failed to start: {self.error}")
+        raise ServiceNotReadyException(
+            "Service is starting up, the model is still loading", retry_after=settings.STARTUP_RETRY_AFTER
+        )
+
+    @property
+    def uptime_seconds(self) -> float:
+        return time.time() - self.started_at
+
+    def get_stats(self):
+        return {
+            "ready": self.ready,
+            "error": self.error,
+            "ready_seconds": self.ready_seconds,
+            "phases": dict(self.phases)
+        }
+
+startup_state = StartupState()
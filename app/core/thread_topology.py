@@ -0,0 +1,70 @@
+import logging
+import os
+from typing import Dict
+
+import torch
+
+from app.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+def available_cpus() -> int:
+    """CPUs this process may run on (its affinity mask where the OS has one)."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+class ThreadTopology:
+    """Applies the configured torch thread counts and reports who competes for the cores.
+
+    Torch defaults to one intra-op thread per core, and the image executor
+    defaults to one worker per core, so under load the two oversubscribe
+    the CPU. ``apply`` must run before the model does any parallel work:
+    torch only accepts the inter-op count once per process.
+    """
+
+    def __init__(self):
+        self.applied = False
+
+    def apply(self):
+        """Set torch's intra-op and inter-op thread counts for this process."""
+        if self.applied:
+            return
+        self.applied = True
+        if settings.TORCH_NUM_THREADS > 0:
+            torch.set_num_threads(settings.TORCH_NUM_THREADS)
+        if settings.TORCH_INTEROP_THREADS > 0:
+            try:
+                torch.set_num_interop_threads(settings.TORCH_INTEROP_THREADS)
+            except RuntimeError as e:
+                logger.warning(f"Could not set torch inter-op threads: {e}")
+        if settings.TUNED_SETTINGS:
+            logger.info(f"Using tuned {', '.join(settings.TUNED_SETTINGS)} from {settings.TUNING_FILE}")
+            if settings.TUNED_FOR_CPUS and settings.TUNED_FOR_CPUS != available_cpus():
+                logger.warning(
+                    f"{settings.TUNING_FILE} was tuned on {settings.TUNED_FOR_CPUS} CPUs, this host has "
+                    f"{available_cpus()}; re-run python -m benchmarks.tune"
+                )
+
+    def get_stats(self) -> Dict:
+        cpus = available_cpus()
+        torch_threads = torch.get_num_threads()
+        # Each inference process runs its own torch thread pool
+        model_processes = settings.INFERENCE_PROCESSES if settings.INFERENCE_MODE == "workers" else 1
+        compute_threads = model_processes * torch_threads + max(1, settings.INFERENCE_WORKERS)
+        return {
+            "cpus": cpus,
+            "torch_threads": torch_threads,
+            "torch_interop_threads": torch.get_num_interop_threads(),
+            "model_processes": model_processes,
+            "inference_executor": settings.INFERENCE_EXECUTOR.lower(),
+            "inference_workers": max(1, settings.INFERENCE_WORKERS),
+            "batch_max_size": settings.BATCH_MAX_SIZE,
+            "compute_threads": compute_threads,
+            "compute_threads_per_cpu": round(compute_threads / cpus, 2),
+            "tuning_file": settings.TUNING_FILE if settings.TUNED_SETTINGS else None,
+            "tuned": settings.TUNED_SETTINGS
+        }
+
+thread_topology = ThreadTopology()
@@ -0,0 +1,382 @@
+import argparse
+import contextvars
+import cProfile
+import functools
+import json
+import logging
+import os
+import pstats
+import queue
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.config.settings import settings
+from app.core.logging_setup import SAMPLED
+
+logger = logging.getLogger(__name__)
+access_logger = logging.getLogger("app.access")
+
+# OTLP span kinds
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+EXPORT_QUEUE_SIZE = 1024
+EXPORT_BATCH_SIZE = 64
+
+class Span:
+    """One timed operation; times are ``perf_counter_ns`` values."""
+
+    __slots__ = ("name", "span_id", "parent_id", "start_ns", "end_ns", "attributes")
+
+    def __init__(self, name: str, parent_id: Optional[str], start_ns: int,
+                 attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.start_ns = start_ns
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes or {}
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.perf_counter_ns()) - self.start_ns) / 1e6
+
+class Trace:
+    """Spans of one request, plus its profiler captures when it was sampled."""
+
+    def __init__(self, name: str, profile: bool = False, **attributes):
+        self.trace_id = os.urandom(16).hex()
+        self.profile = profile
+        # Maps perf_counter_ns onto wall-clock nanoseconds for export
+        self.epoch_offset_ns = time.time_ns() - time.perf_counter_ns()
+        self.root = Span(name, None, time.perf_counter_ns(), attributes)
+        self.spans: List[Span] = [self.root]
+        self.profiles: List[cProfile.Profile] = []
+        self.finished = False
+        self._lock = threading.Lock()
+
+    def add(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+
+    def stage_totals(self) -> Dict[str, float]:
+        """Milliseconds per finished stage: the time covered by its spans.
+        
+        Spans of one stage can overlap (the frames of an animation, the
+        images of a batch request), so overlapping stretches count once and
+        no stage reads longer than the request.
+        """
+        intervals: Dict[str, List[Tuple[int, int]]] = {}
+        for span in self.spans[1:]:
+            if span.end_ns is not None:
+                intervals.setdefault(span.name, []).append((span.start_ns, span.end_ns))
+        totals: Dict[str, float] = {}
+        for name, stage_intervals in intervals.items():
+            covered_ns = 0
+            covered_until = None
+            for start_ns, end_ns in sorted(stage_intervals):
+                if covered_until is None or start_ns >= covered_until:
+                    covered_ns += end_ns - start_ns
+                    covered_until = end_ns
+                elif end_ns > covered_until:
+                    covered_ns += end_ns - covered_until
+                    covered_until = end_ns
+            totals[name] = covered_ns / 1e6
+        return totals
+
+    def server_timing(self) -> str:
+        """``Server-Timing`` header value: per-stage durations (see ``stage_totals``), plus the total so far."""
+        totals = self.stage_totals()
+        totals["total"] = self.root.duration_ms
+        return ", ".join(f"{name};dur={duration:.2f}" for name, duration in totals.items())
+
+    def finish(self, **attributes):
+        """End the root span, write profiler captures and hand the trace to the exporter."""
+        if self.finished:
+            return
+        self.finished = True
+        self.root.end_ns = time.perf_counter_ns()
+        self.root.attributes.update(attributes)
+        if self.profiles:
+            _write_profiles(self)
+        exporter.export(self)
+        _log_request(self)
+
+def _log_request(trace: "Trace"):
+    """One structured access record per finished request; successes are sampled."""
+    attributes = trace.root.attributes
+    fields = {
+        "trace_id": trace.trace_id,
+        "request": trace.root.name,
+        "duration_ms": round(trace.root.duration_ms, 2),
+        **attributes,
+        "stages": {name: round(duration, 2) for name, duration in trace.stage_totals().items()}
+    }
+    if "error" in attributes or attributes.get("status") == "failed":
+        access_logger.warning("request failed", extra={"fields": fields})
+    else:
+        access_logger.info("request", extra={"fields": fields, **SAMPLED})
+
+_current: contextvars.ContextVar[Optional[Tuple[Trace, str]]] = contextvars.ContextVar(
+    "current_trace", default=None
+)
+_profile_counter = 0
+_profile_lock = threading.Lock()
+
+def _should_profile() -> bool:
+    """True for one in every ``PROFILE_SAMPLE_RATE`` traces."""
+    global _profile_counter
+    if settings.PROFILE_SAMPLE_RATE <= 0:
+        return False
+    with _profile_lock:
+        _profile_counter += 1
+        return _profile_counter % settings.PROFILE_SAMPLE_RATE == 0
+
+def start_trace(name: str, **attributes) -> Trace:
+    """Start a trace and make it current for this task and the threads it hands work to."""
+    trace = Trace(name, profile=_should_profile(), **attributes)
+    _current.set((trace, trace.root.span_id))
+    return trace
+
+def current() -> Optional[Tuple[Trace, str]]:
+    """The active trace and span id, to re-attach work done elsewhere (see ``adopt``)."""
+    return _current.get()
+
+@contextmanager
+def span(name: str, histogram=None, **attributes):
+    """Time a block as a child of the current span; ``histogram`` also gets the duration in seconds."""
+    parent = _current.get()
+    start_ns = time.perf_counter_ns()
+    if parent is None:
+        try:
+            yield None
+        finally:
+            if histogram is not None:
+                histogram.observe((time.perf_counter_ns() - start_ns) / 1e9)
+        return
+
+    trace, parent_id = parent
+    record = Span(name, parent_id, start_ns, attributes)
+    token = _current.set((trace, record.span_id))
+    try:
+        yield record
+    finally:
+        _current.reset(token)
+        record.end_ns = time.perf_counter_ns()
+        trace.add(record)
+        if histogram is not None:
+            histogram.observe((record.end_ns - start_ns) / 1e9)
+
+def record_span(context: Optional[Tuple[Trace, str]], name: str, start_ns: int, end_ns: int, **attributes):
+    """Add an already-measured span under ``context``."""
+    if context is None:
+        return
+    trace, parent_id = context
+    record = Span(name, parent_id, start_ns, attributes)
+    record.end_ns = end_ns
+    trace.add(record)
+
+@contextmanager
+def collect(profile: bool = False):
+    """Record spans into a detached trace, for work shared by several requests (a batch)."""
+    trace = Trace("collect", profile=profile)
+    token = _current.set((trace, trace.root.span_id))
+    try:
+        yield trace
+    finally:
+        _current.reset(token)
+
+def adopt(context: Optional[Tuple[Trace, str]], collected: Trace, **attributes):
+    """Copy spans recorded by ``collect`` into a request's trace, under its current span."""
+    if context is None:
+        return
+    trace, parent_id = context
+    # Fresh span ids: the same batch is adopted into the trace of every request it served
+    span_ids = {collected_span.span_id: os.urandom(8).hex() for collected_span in collected.spans[1:]}
+    span_ids[collected.root.span_id] = parent_id
+    for collected_span in collected.spans[1:]:
+        copy = Span(collected_span.name, span_ids[collected_span.parent_id],
+                    collected_span.start_ns, {**collected_span.attributes, **attributes})
+        copy.span_id = span_ids[collected_span.span_id]
+        copy.end_ns = collected_span.end_ns
+        trace.add(copy)
+
+def profiled(func: Callable) -> Callable:
+    """Wrap ``func`` to run under cProfile when the current trace was sampled for profiling.
+
+    Call it on the event loop before handing ``func`` to a thread: cProfile
+    only sees the thread it is enabled in, so each executor hop of a sampled
+    request gets its own profile, merged when the trace finishes.
+    """
+    context = _current.get()
+    if context is None or not context[0].profile:
+        return func
+    trace = context[0]
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profile.disable()
+            with trace._lock:
+                trace.profiles.append(profile)
+    return wrapper
+
+@contextmanager
+def torch_profiled(traces: List[Trace]):
+    """Capture a ``torch.profiler`` trace of the block when any of ``traces`` was sampled."""
+    sampled = [trace for trace in traces if trace.profile]
+    if not sampled:
+        yield
+        return
+
+    import torch.profiler
+    with torch.profiler.profile(activities=[torch.profiler.ProfilerActivity.CPU], record_shapes=True) as prof:
+        yield
+    os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+    path = os.path.join(settings.PROFILE_DIR, f"{sampled[0].trace_id}.torch.json")
+    prof.export_chrome_trace(path)
+    logger.info(f"Wrote torch profile {path} (traces: {', '.join(t.trace_id for t in sampled)})")
+
+def _write_profiles(trace: Trace):
+    try:
+        os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+        path = os.path.join(settings.PROFILE_DIR, f"{trace.trace_id}.pstats")
+        pstats.Stats(*trace.profiles).dump_stats(path)
+        logger.info(f"Wrote cProfile capture {path}")
+    except Exception as e:
+        logger.warning(f"Could not write profile for trace {trace.trace_id}: {str(e)}")
+
+def _attribute(key: str, value: Any) -> Dict:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+def to_otlp(traces: List[Trace]) -> Dict:
+    """Encode traces as an OTLP/JSON ``ExportTraceServiceRequest``."""
+    spans = []
+    for trace in traces:
+        for item in trace.spans:
+            encoded = {
+                "traceId": trace.trace_id,
+                "spanId": item.span_id,
+                "name": item.name,
+                "kind": SPAN_KIND_SERVER if item is trace.root else SPAN_KIND_INTERNAL,
+                "startTimeUnixNano": str(item.start_ns + trace.epoch_offset_ns),
+                "endTimeUnixNano": str((item.end_ns or item.start_ns) + trace.epoch_offset_ns),
+                "attributes": [_attribute(key, value) for key, value in item.attributes.items()]
+            }
+            if item.parent_id is not None:
+                encoded["parentSpanId"] = item.parent_id
+            spans.append(encoded)
+
+    return {"resourceSpans": [{
+        "resource": {"attributes": [_attribute("service.name", settings.TRACE_SERVICE_NAME)]},
+        "scopeSpans": [{"scope": {"name": __name__}, "spans": spans}]
+    }]}
+
+class TraceExporter:
+    """Ships finished traces from a background thread; drops them when the queue is full."""
+
+    def __init__(self, kind: str):
+        self.kind = kind.lower()
+        self.exported = 0
+        self.dropped = 0
+        self.failed = 0
+        self._queue: Optional[queue.Queue] = None
+        self._thread: Optional[threading.Thread] = None
+        if self.kind not in ("none", "otlp", "file"):
+            raise ValueError(f"Unknown trace exporter: {kind}")
+
+    def export(self, trace: Trace):
+        if self.kind == "none":
+            return
+        if self._thread is None:
+            self._queue = queue.Queue(maxsize=EXPORT_QUEUE_SIZE)
+            self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+            self._thread.start()
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < EXPORT_BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get(timeout=0.5))
+                except queue.Empty:
+                    break
+            try:
+                self._send(to_otlp(batch))
+                self.exported += len(batch)
+            except Exception as e:
+                self.failed += len(batch)
+                logger.warning(f"Trace export failed: {str(e)}")
+
+    def _send(self, payload: Dict):
+        body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+        if self.kind == "file":
+            with open(settings.TRACE_FILE, "ab") as output:
+                output.write(body + b"\n")
+            return
+        request = urllib.request.Request(
+            settings.TRACE_OTLP_ENDPOINT, data=body, headers={"Content-Type": "application/json"}
+        )
+        with urllib.request.urlopen(request, timeout=5) as response:
+            response.read()
+
+    def get_stats(self):
+        return {
+            "exporter": self.kind,
+            "exported": self.exported,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "profile_sample_rate": settings.PROFILE_SAMPLE_RATE
+        }
+
+exporter = TraceExporter(settings.TRACE_EXPORTER)
+
+class _CollectorHandler(BaseHTTPRequestHandler):
+    output_path = "traces.jsonl"
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        payload = json.loads(body)
+        with open(self.output_path, "a") as output:
+            output.write(json.dumps(payload) + "\n")
+        spans = sum(len(scope["spans"]) for resource in payload["resourceSpans"] for scope in resource["scopeSpans"])
+        print(f"received {spans} spans")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        self.wfile.write(b"{}")
+
+    def log_message(self, format, *args):
+        pass
+
+def run_collector(port: int, output_path: str):
+    """Minimal local OTLP/HTTP JSON receiver that appends each export request to a file."""
+    _CollectorHandler.output_path = output_path
+    server = HTTPServer(("127.0.0.1", port), _CollectorHandler)
+    print(f"Collecting OTLP/JSON traces on http://127.0.0.1:{port}/v1/traces into {output_path}")
+    server.serve_forever()
+
+if __name__ == "__main__":
+    # python -m app.core.tracing --port 4318 --output traces.jsonl
+    parser = argparse.ArgumentParser(description="Local OTLP trace collector stub")
+    parser.add_argument("--port", type=int, default=4318)
+    parser.add_argument("--output", default="traces.jsonl")
+    args = parser.parse_args()
+    run_collector(args.port, args.output)
@@ -0,0 +1,313 @@
+import asyncio
+import contextvars
+import hashlib
+import ipaddress
+import logging
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from pathlib import PurePosixPath
+from typing import Dict, Optional, Tuple
+
+import httpx
+from PIL import Image
+
+from app.config.settings import settings
+from app.core import tracing
+from app.core.metrics import download_seconds
+from app.models.exceptions import ValidationException
+from app.services.file_validator import INVALID_IMAGE_MESSAGE, SPOOL_MAX_SIZE, FileValidator
+
+logger = logging.getLogger(__name__)
+
+REDIRECT_STATUSES = {301, 302, 303, 307, 308}
+
+class DownloadAborted(OSError):
+    """Raised to a reader of a ``RemoteFile`` whose download failed."""
+
+class RemoteFile:
+    """A download in progress as a seekable binary file.
+
+    The event loop appends chunks as they arrive; a reader on another
+    thread sees a regular file whose reads wait until the bytes they ask
+    for have arrived (or the download ended). That lets PIL decode while
+    the rest of the body is still on the wire. Once ``finish`` has been
+    called it behaves like any spooled temporary file.
+    """
+
+    def __init__(self):
+        self._buffer = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+        self._condition = threading.Condition()
+        self._size = 0
+        self._position = 0
+        self._complete = False
+        self._failed = False
+        self.closed = False
+
+    def append(self, data: bytes):
+        with self._condition:
+            self._buffer.seek(self._size)
+            self._buffer.write(data)
+            self._size += len(data)
+            self._condition.notify_all()
+
+    def finish(self, failed: bool = False):
+        with self._condition:
+            self._complete = True
+            self._failed = failed
+            self._condition.notify_all()
+
+    def _wait_for(self, end: Optional[int]):
+        # Called with the condition held; ``end=None`` waits for the whole body
+        while not self._complete and (end is None or self._size < end):
+            self._condition.wait()
+        if self._failed:
+            raise DownloadAborted("download did not complete")
+
+    def read(self, size: int = -1) -> bytes:
+        with self._condition:
+            self._wait_for(None if size is None or size < 0 else self._position + size)
+            self._buffer.seek(self._position)
+            available = max(0, self._size - self._position)
+            data = self._buffer.read(available if size is None or size < 0 else min(size, available))
+            self._position += len(data)
+            return data
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        with self._condition:
+            if whence == os.SEEK_END:
+                self._wait_for(None)
+                offset += self._size
+            elif whence == os.SEEK_CUR:
+                offset += self._position
+            if offset < 0:
+                raise ValueError("negative seek position")
+            self._position = offset
+            return offset
+
+    def tell(self) -> int:
+        return self._position
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def close(self):
+        self.finish(failed=not self._complete)
+        self._buffer.close()
+        self.closed = True
+
+@dataclass
+class RemoteImage:
+    """A downloaded image: its bytes as a seekable file and what was computed while it arrived."""
+    source: RemoteFile
+    filename: str
+    size: int
+    digest: str
+    # Decoded at reduced scale for the model while downloading; None for animations
+    model_input: Optional[Image.Image]
+
+def url_filename(url: str) -> str:
+    """The last path segment of an image URL, to name its outputs by."""
+    try:
+        return PurePosixPath(httpx.URL(url).path).name or "image"
+    except (httpx.InvalidURL, TypeError):
+        return "image"
+
+class UrlFetcher:
+    """Downloads images for the API over one pooled HTTP client.
+
+    Connections are pooled and kept alive across requests, with a global
+    cap and a per-host cap on concurrent downloads. The upload limits apply
+    while streaming: a declared or received size over ``MAX_FILE_SIZE``, or
+    a header over the resolution and memory limits, ends the download
+    early. The body is hashed as it arrives and the model input is decoded
+    on a thread at the same time, so little is left to do once the last
+    byte is in. Only http(s) URLs are fetched, and by default only from
+    public addresses.
+    """
+
+    def __init__(self):
+        self.per_host = max(1, settings.URL_FETCH_PER_HOST)
+        self.allowed_hosts = [host.strip().lower() for host in settings.URL_FETCH_ALLOWED_HOSTS.split(",")
+                              if host.strip()]
+        self.client: Optional[httpx.AsyncClient] = None
+        self._decoder: Optional[ThreadPoolExecutor] = None
+        # host -> [semaphore, users]; dropped when the last user leaves
+        self._hosts: Dict[str, list] = {}
+        self.fetched = 0
+        self.failed = 0
+        self.bytes = 0
+        self.active = 0
+
+    def start(self):
+        """Create the pooled client."""
+        if self.client is not None:
+            return
+        connections = max(1, settings.URL_FETCH_MAX_CONNECTIONS)
+        self.client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=connections, max_keepalive_connections=connections),
+            timeout=httpx.Timeout(settings.URL_FETCH_TIMEOUT, connect=settings.URL_FETCH_CONNECT_TIMEOUT),
+            follow_redirects=False,
+            headers={"User-Agent": f"{settings.API_TITLE}/{settings.API_VERSION}"}
+        )
+        # Decoders wait on the network, so they get their own threads rather than the default pool's
+        self._decoder = ThreadPoolExecutor(max_workers=connections, thread_name_prefix="url-decode")
+
+    async def close(self):
+        """Close pooled connections."""
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+        if self._decoder is not None:
+            self._decoder.shutdown(wait=False, cancel_futures=True)
+            self._decoder = None
+
+    async def _check_url(self, url: httpx.URL):
+        """Reject URLs that are not http(s), not allowed, or that resolve to a non-public address."""
+        if url.scheme not in ("http", "https") or not url.host:
+            raise ValidationException("Only http and https image URLs are supported")
+        host = url.host.lower()
+        if self.allowed_hosts and not any(host == allowed or host.endswith("." + allowed)
+                                          for allowed in self.allowed_hosts):
+            raise ValidationException(f"Fetching from {host} is not allowed")
+        if settings.URL_FETCH_ALLOW_PRIVATE:
+            return
+        # Checked before connecting; the client resolves again, so use
+        # URL_FETCH_ALLOWED_HOSTS as well where DNS is not trusted
+        try:
+            addresses = await asyncio.get_running_loop().getaddrinfo(host, None)
+        except OSError:
+            raise ValidationException(f"Could not resolve {host}")
+        for *_, sockaddr in addresses:
+            if not ipaddress.ip_address(sockaddr[0].split("%")[0]).is_global:
+                raise ValidationException(f"Fetching from {host} is not allowed (private address)")
+
+    @asynccontextmanager
+    async def _host_slot(self, host: str):
+        slot = self._hosts.setdefault(host, [asyncio.Semaphore(self.per_host), 0])
+        slot[1] += 1
+        try:
+            async with slot[0]:
+                yield
+        finally:
+            slot[1] -= 1
+            if slot[1] == 0:
+                del self._hosts[host]
+
+    def _decode(self, source: RemoteFile, draft_size: Tuple[int, int]) -> Optional[Image.Image]:
+        """Validate the header as soon as it arrives, then decode the model input (blocking)."""
+        image = Image.open(source)
+        FileValidator.validate_header(image)
+        if FileValidator.is_animated(image):
+            return None
+        with tracing.span("decode", draft=True, streamed=True):
+            image.draft("RGB", draft_size)
+            image.load()
+        return image
+
+    async def fetch(self, url: str) -> RemoteImage:
+        """Download an image URL, decoding it at the model's input size as it arrives."""
+        if not settings.URL_FETCH_ENABLED:
+            raise ValidationException("Image URLs are disabled on this server")
+        if self.client is None:
+            self.start()
+        try:
+            target = httpx.URL(url)
+        except (httpx.InvalidURL, TypeError) as e:
+            raise ValidationException(f"Invalid image URL: {e}")
+
+        draft_size = (settings.MODEL_INPUT_SIZE, settings.MODEL_INPUT_SIZE)
+        source = RemoteFile()
+        self.active += 1
+        try:
+            with tracing.span("download", download_seconds, host=target.host) as span:
+                size, digest, decode = await asyncio.wait_for(
+                    self._download(target, source, draft_size), settings.URL_FETCH_TIMEOUT
+                )
+                if span is not None:
+                    span.attributes["bytes"] = size
+            try:
+                model_input = await decode
+            except ValidationException:
+                raise
+            except Exception as e:
+                logger.warning("Could not decode image from %s: %s", target.host, e)
+                raise ValidationException(INVALID_IMAGE_MESSAGE)
+        except asyncio.TimeoutError:
+            source.close()
+            self.failed += 1
+            raise ValidationException(f"Timed out fetching image URL after {settings.URL_FETCH_TIMEOUT:.0f}s")
+        except BaseException:
+            source.close()
+            self.failed += 1
+            raise
+        finally:
+            self.active -= 1
+
+        self.fetched += 1
+        self.bytes += size
+        source.seek(0)
+        return RemoteImage(source, url_filename(url), size, digest, model_input)
+
+    async def _download(self, url: httpx.URL, source: RemoteFile, draft_size: Tuple[int, int]):
+        for _ in range(max(0, settings.URL_FETCH_MAX_REDIRECTS) + 1):
+            await self._check_url(url)
+            async with self._host_slot(url.host.lower()):
+                try:
+                    async with self.client.stream("GET", url) as response:
+                        if response.status_code in REDIRECT_STATUSES and "location" in response.headers:
+                            # Followed by hand so every hop is checked like the first
+                            url = url.join(response.headers["location"])
+                            continue
+                        return await self._receive(response, source, draft_size)
+                except httpx.HTTPError as e:
+                    raise ValidationException(f"Could not fetch image URL: {type(e).__name__}")
+        raise ValidationException(f"Too many redirects (maximum {settings.URL_FETCH_MAX_REDIRECTS})")
+
+    async def _receive(self, response: httpx.Response, source: RemoteFile, draft_size: Tuple[int, int]):
+        if response.status_code != 200:
+            raise ValidationException(f"Could not fetch image URL: HTTP {response.status_code}")
+        declared = response.headers.get("content-length")
+        if declared is not None and declared.isdigit():
+            FileValidator.validate_size(int(declared))
+
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        decode = loop.run_in_executor(self._decoder, context.run, self._decode, source, draft_size)
+        digest = hashlib.sha256()
+        received = 0
+        try:
+            async for chunk in response.aiter_bytes():
+                received += len(chunk)
+                # The declared size is not trusted: stop reading at the limit
+                FileValidator.validate_size(received)
+                digest.update(chunk)
+                source.append(chunk)
+                if decode.done() and decode.exception() is not None:
+                    # A rejected header (format, resolution) makes the rest of the body moot
+                    break
+            source.finish()
+        except BaseException:
+            source.finish(failed=True)
+            await asyncio.gather(decode, return_exceptions=True)
+            raise
+        return received, digest.hexdigest(), decode
+
+    def get_stats(self) -> Dict:
+        return {
+            "enabled": settings.URL_FETCH_ENABLED,
+            "fetched": self.fetched,
+            "failed": self.failed,
+            "bytes": self.bytes,
+            "active": self.active,
+            "hosts": len(self._hosts),
+            "per_host_limit": self.per_host
+        }
+
+url_fetcher = UrlFetcher()
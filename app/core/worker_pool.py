@@ -0,0 +1,340 @@
+import asyncio
+import logging
+import multiprocessing
+import threading
+import time
+import uuid
+from multiprocessing import shared_memory
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from app.config.settings import settings
+from app.models.exceptions import ProcessingException
+from app.models.schemas import MaskMode
+from app.services.postprocessing import MASK_THRESHOLD
+
+logger = logging.getLogger(__name__)
+
+def _worker_main(worker_id: int, generation: int, tasks, results):
+    """Inference process entry point: load one model and serve shared-memory tasks."""
+    from app.core.model_manager import ModelManager
+    from app.core.thread_topology import thread_topology
+    from app.services.postprocessing import mask_to_alpha
+
+    thread_topology.apply()
+    manager = ModelManager()
+    try:
+        asyncio.run(manager.load_model())
+        manager.warm_up()
+    except Exception as e:
+        results.put(("failed", worker_id, generation, str(e)))
+        return
+    results.put(("ready", worker_id, generation, multiprocessing.current_process().pid, manager.load_timings))
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+
+        task_id, input_name, shape, size, mode, threshold = task
+        started = time.perf_counter()
+        error = None
+        shm = None
+        try:
+            # Opened inside the try: the parent unlinks the block when a
+            # request is cancelled, possibly before this task is picked up
+            shm = shared_memory.SharedMemory(name=input_name)
+            width, height = size
+            pixels = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+            # The alpha plane lives right after the pixels in the same block
+            alpha_out = np.ndarray((height, width), dtype=np.uint8,
+                                   buffer=shm.buf, offset=pixels.nbytes)
+            image = Image.fromarray(pixels)
+            mask = manager.predict_masks([image])[0]
+            mask_to_alpha(mask, (width, height), mode, threshold, guide=image, out=alpha_out)
+            del image
+            del pixels, alpha_out
+        except Exception as e:
+            error = str(e)
+        finally:
+            if shm is not None:
+                shm.close()
+
+        results.put(("done", worker_id, generation, task_id, error, time.perf_counter() - started))
+
+def _write_pixels(shm: shared_memory.SharedMemory, image: Image.Image, shape):
+    """Copy decoded RGB pixels into a shared memory block."""
+    rgb = image if image.mode == "RGB" else image.convert("RGB")
+    pixels = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+    pixels[...] = np.asarray(rgb)
+    del pixels
+
+class _Worker:
+    """Parent-side handle for one inference process."""
+
+    def __init__(self, worker_id: int, generation: int, process, tasks, failures: int = 0):
+        self.worker_id = worker_id
+        self.generation = generation
+        self.process = process
+        self.tasks = tasks
+        self.ready = False
+        # Exits in a row without becoming ready, and when to restart after the last one
+        self.failures = failures
+        self.restart_at: Optional[float] = None
+        self.load_timings: Dict[str, float] = {}
+        self.started_at = time.time()
+        self.current_task: Optional[str] = None
+        self.completed = 0
+        self.failed = 0
+        self.busy_seconds = 0.0
+
+    def get_stats(self):
+        uptime = max(time.time() - self.started_at, 1e-9)
+        return {
+            "pid": self.process.pid,
+            "alive": self.process.is_alive(),
+            "ready": self.ready,
+            "busy": self.current_task is not None,
+            "completed": self.completed,
+            "failed": self.failed,
+            "restarts": self.generation,
+            "failures": self.failures,
+            "abandoned": self.restart_at == float("inf"),
+            "utilization": min(self.busy_seconds / uptime, 1.0),
+            "load_timings": self.load_timings
+        }
+
+class WorkerPool:
+    """Fixed pool of inference processes fed through shared memory."""
+
+    def __init__(self):
+        self.num_workers = max(1, settings.INFERENCE_PROCESSES)
+        self.health_interval = settings.WORKER_HEALTH_INTERVAL
+        self.workers: Dict[int, _Worker] = {}
+        self._context = multiprocessing.get_context("spawn")
+        self._results = None
+        self._idle: Optional[asyncio.Queue] = None
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._reader: Optional[threading.Thread] = None
+        self._monitor: Optional[asyncio.Task] = None
+        self._started: Optional[asyncio.Event] = None
+        self._startup_error: Optional[str] = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._monitor is not None and not self._monitor.done()
+
+    async def start(self):
+        """Spawn the inference processes and start health monitoring."""
+        if self.is_running:
+            return
+
+        self._loop = asyncio.get_running_loop()
+        self._results = self._context.Queue()
+        self._idle = asyncio.Queue()
+        self._started = asyncio.Event()
+        self._startup_error = None
+        for worker_id in range(self.num_workers):
+            self._spawn(worker_id)
+
+        self._reader = threading.Thread(target=self._read_results, name="worker-results", daemon=True)
+        self._reader.start()
+        self._monitor = asyncio.create_task(self._monitor_workers())
+        logger.info(f"Started {self.num_workers} inference worker processes")
+
+    async def stop(self):
+        """Stop all inference processes and release shared memory."""
+        if self._monitor is not None:
+            self._monitor.cancel()
+            try:
+                await self._monitor
+            except asyncio.CancelledError:
+                pass
+            self._monitor = None
+
+        for worker in self.workers.values():
+            worker.tasks.put(None)
+        for worker in self.workers.values():
+            worker.process.join(timeout=10)
+            if worker.process.is_alive():
+                worker.process.terminate()
+        self.workers.clear()
+
+        for task_id in list(self._pending):
+            self._finish(task_id, ProcessingException("Inference workers stopped"))
+
+        if self._results is not None:
+            self._results.put(None)
+            self._reader.join(timeout=5)
+            self._results = None
+        logger.info("Inference worker processes stopped")
+
+    async def wait_ready(self):
+        """Wait until every worker has loaded and warmed up its model."""
+        await self._started.wait()
+        if self._startup_error is not None:
+            raise ProcessingException(f"Inference worker failed to start: {self._startup_error}")
+
+    def _spawn(self, worker_id: int, generation: int = 0, failures: int = 0):
+        tasks = self._context.Queue()
+        process = self._context.Process(
+            target=_worker_main,
+            args=(worker_id, generation, tasks, self._results),
+            name=f"inference-worker-{worker_id}",
+            daemon=True
+        )
+        process.start()
+        self.workers[worker_id] = _Worker(worker_id, generation, process, tasks, failures)
+
+    def _read_results(self):
+        # multiprocessing queues block, so results are drained on a thread
+        # and handed back to the event loop.
+        while True:
+            message = self._results.get()
+            if message is None:
+                break
+            self._loop.call_soon_threadsafe(self._handle_message, message)
+
+    def _handle_message(self, message):
+        kind, worker_id, generation = message[:3]
+        worker = self.workers.get(worker_id)
+        # Messages from a process that has since been replaced are dropped
+        if worker is None or worker.generation != generation:
+            return
+
+        if kind == "ready":
+            worker.ready = True
+            worker.failures = 0
+            worker.load_timings = message[4]
+            self._idle.put_nowait(worker)
+            logger.info(f"Inference worker {worker_id} ready (pid={message[3]}, timings={message[4]})")
+            if all(w.ready for w in self.workers.values()):
+                self._started.set()
+        elif kind == "failed":
+            logger.error(f"Inference worker {worker_id} failed to load model: {message[3]}")
+            if not self._started.is_set():
+                self._startup_error = message[3]
+                self._started.set()
+        elif kind == "done":
+            task_id, error, busy_seconds = message[3:]
+            worker.current_task = None
+            worker.busy_seconds += busy_seconds
+            if error is None:
+                worker.completed += 1
+                self._finish(task_id)
+            else:
+                worker.failed += 1
+                self._finish(task_id, ProcessingException(f"Image processing failed: {error}"))
+            self._idle.put_nowait(worker)
+
+    def _finish(self, task_id: str, error: Optional[Exception] = None):
+        future = self._pending.pop(task_id, None)
+        if future is not None and not future.done():
+            if error is None:
+                future.set_result(None)
+            else:
+                future.set_exception(error)
+
+    def _restart_delay(self, failures: int) -> float:
+        """Seconds before restarting a worker that has exited ``failures`` times in a row."""
+        return min(settings.WORKER_RESTART_BACKOFF * 2 ** max(0, failures - 1), settings.WORKER_RESTART_BACKOFF_MAX)
+
+    async def _monitor_workers(self):
+        while True:
+            await asyncio.sleep(self.health_interval)
+            now = time.monotonic()
+            for worker_id, worker in list(self.workers.items()):
+                if worker.process.is_alive():
+                    continue
+
+                if worker.restart_at is None:
+                    if worker.current_task is not None:
+                        self._finish(worker.current_task, ProcessingException("Inference worker crashed"))
+                        worker.current_task = None
+                    # A worker that never got ready (e.g. the model fails to load) counts towards the limit
+                    worker.failures = 0 if worker.ready else worker.failures + 1
+                    if 0 < settings.WORKER_MAX_RESTARTS <= worker.failures:
+                        logger.error(
+                            f"Inference worker {worker_id} exited with code {worker.process.exitcode} "
+                            f"{worker.failures} times in a row without becoming ready, not restarting it"
+                        )
+                        worker.restart_at = float("inf")
+                        self._wake_if_unavailable()
+                        continue
+                    delay = self._restart_delay(worker.failures)
+                    logger.error(
+                        f"Inference worker {worker_id} exited with code {worker.process.exitcode}, "
+                        f"restarting in {delay:g}s"
+                    )
+                    worker.restart_at = now + delay
+
+                if now >= worker.restart_at:
+                    self._spawn(worker_id, generation=worker.generation + 1, failures=worker.failures)
+
+    def _available(self) -> bool:
+        """Whether any worker is running or will be restarted."""
+        return any(worker.restart_at != float("inf") for worker in self.workers.values())
+
+    def _wake_if_unavailable(self):
+        # Requests waiting for an idle worker would otherwise wait forever
+        if not self._available():
+            self._idle.put_nowait(None)
+
+    async def predict_alpha(self, image: Image.Image, mode: MaskMode = MaskMode.BINARY,
+                            threshold: float = MASK_THRESHOLD,
+                            size: Optional[Tuple[int, int]] = None) -> np.ndarray:
+        """Compute an alpha mask of ``size`` on an inference process."""
+        if not self.is_running:
+            await self.start()
+
+        shape = (image.size[1], image.size[0], 3)
+        pixel_bytes = shape[0] * shape[1] * 3
+        width, height = size or image.size
+
+        shm = shared_memory.SharedMemory(create=True, size=pixel_bytes + height * width)
+        try:
+            await asyncio.to_thread(_write_pixels, shm, image, shape)
+
+            while True:
+                if not self._available():
+                    raise ProcessingException("No inference workers available")
+                worker = await self._idle.get()
+                if worker is None:
+                    # Passed on so every waiting request wakes up
+                    self._idle.put_nowait(None)
+                    continue
+                # Workers replaced since they were queued as idle are skipped
+                if self.workers.get(worker.worker_id) is worker and worker.process.is_alive():
+                    break
+
+            task_id = uuid.uuid4().hex
+            future = self._loop.create_future()
+            self._pending[task_id] = future
+            worker.current_task = task_id
+            worker.tasks.put((task_id, shm.name, shape, (width, height), mode, threshold))
+            await future
+
+            alpha = np.ndarray((height, width), dtype=np.uint8, buffer=shm.buf, offset=pixel_bytes)
+            result = alpha.copy()
+            del alpha
+            return result
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def get_stats(self):
+        """Get per-worker health and utilization."""
+        return {
+            "workers": self.num_workers,
+            "idle": self._idle.qsize() if self._idle is not None else 0,
+            "pending": len(self._pending),
+            "restarts": sum(worker.generation for worker in self.workers.values()),
+            "per_worker": {
+                str(worker_id): worker.get_stats() for worker_id, worker in self.workers.items()
+            }
+        }
+
+worker_pool = WorkerPool()
@@ -3,37 +3,69 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from contextlib import asynccontextmanager
 import logging
-import sys
 
 from app.config.settings import settings
-from app.core.model_manager import model_manager
-from app.api.endpoints import auth, health, background, metrics
+from app.core.model_registry import model_registry
+from app.core.inference_pool import inference_pool
+from app.core.worker_pool import worker_pool
+from app.core.result_cache import mask_cache
+from app.core.job_queue import job_queue
+from app.core.rate_limiter import rate_limiter
+from app.core.startup import startup_state
+from app.core.logging_setup import log_pipeline
+from app.core.thread_topology import thread_topology
+from app.core.url_fetcher import url_fetcher
+from app.core.auth import auth_manager
+from app.api.endpoints import auth, health, background, jobs, metrics, models
 from app.models.exceptions import APIException
 from app.utils.responses import SafeJSONResponse
-from app.api.middleware import setup_exception_handlers
+from app.api.middleware import setup_exception_handlers, MetricsMiddleware
 
-# Logging configuration
-logging.basicConfig(
-    level=getattr(logging, settings.LOG_LEVEL),
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.StreamHandler(sys.stdout),
-        logging.FileHandler("app.log")
-    ]
-)
+# Logging configuration: handlers run on a listener thread, off the event loop
+log_pipeline.start()
 logger = logging.getLogger(__name__)
+# Torch thread counts have to be set before the model does any work
+thread_topology.apply()
+
+async def start_inference():
+    """Load and warm up the model, then start consuming queued jobs."""
+    if settings.INFERENCE_MODE == "workers":
+        with startup_state.phase("start_workers"):
+            await worker_pool.start()
+            await worker_pool.wait_ready()
+    else:
+        # Other registered models load on their first request
+        default = await model_registry.preload()
+        startup_state.record(default.manager.load_timings)
+    with startup_state.phase("start_job_queue"):
+        await job_queue.start()
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan manager for startup and shutdown events."""
     logger.info("Starting application...")
-    await model_manager.load_model()
-    logger.info("Application started successfully")
+    inference_pool.start()
+    url_fetcher.start()
+    await auth_manager.start()
+    # The model loads in the background: /health/live answers right away,
+    # /health/ and the processing endpoints return 503 until warm-up is done
+    startup_state.start(start_inference)
+    logger.info("Application started, loading model")
     
     yield
     
     logger.info("Shutting down application...")
-    model_manager.unload_model()
+    await startup_state.stop()
+    await job_queue.stop()
+    if settings.INFERENCE_MODE == "workers":
+        await worker_pool.stop()
+    else:
+        await model_registry.close()
+    inference_pool.shutdown()
+    await url_fetcher.close()
+    await auth_manager.close()
+    await mask_cache.close()
+    await rate_limiter.close()
     logger.info("Application shut down successfully")
 
 # FastAPI application
@@ -58,6 +90,8 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(MetricsMiddleware)
+
 # Setup exception handlers
 setup_exception_handlers(app)
 
@@ -65,6 +99,8 @@ setup_exception_handlers(app)
 app.include_router(auth.router, prefix="/auth", tags=["Authentication"])
 app.include_router(health.router, prefix="/health", tags=["Health"])
 app.include_router(background.router, prefix="/api", tags=["Background Removal"])
+app.include_router(jobs.router, prefix="/api", tags=["Jobs"])
+app.include_router(models.router, prefix="/api", tags=["Models"])
 app.include_router(metrics.router, prefix="/metrics", tags=["Metrics"])
 
 if __name__ == "__main__":
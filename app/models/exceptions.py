@@ -1,9 +1,10 @@
 class APIException(Exception):
     """Base API exception class."""
-    def __init__(self, message: str, error_code: str, status_code: int = 400):
+    def __init__(self, message: str, error_code: str, status_code: int = 400, headers: dict = None):
         self.message = message
         self.error_code = error_code
         self.status_code = status_code
+        self.headers = headers
         super().__init__(self.message)
 
 class ValidationException(APIException):
@@ -19,4 +20,14 @@ class ProcessingException(APIException):
 class AuthenticationException(APIException):
     """Exception for authentication errors."""
     def __init__(self, message: str):
-        super().__init__(message, "AUTHENTICATION_ERROR", 401)
\ No newline at end of file
+        super().__init__(message, "AUTHENTICATION_ERROR", 401)
+
+class ServiceOverloadedException(APIException):
+    """Exception raised when the inference queue is full."""
+    def __init__(self, message: str, retry_after: int = 1):
+        super().__init__(message, "SERVICE_OVERLOADED", 503, headers={"Retry-After": str(retry_after)})
+
+class ServiceNotReadyException(APIException):
+    """Exception raised while the model is still loading or warming up."""
+    def __init__(self, message: str, retry_after: int = 5):
+        super().__init__(message, "SERVICE_NOT_READY", 503, headers={"Retry-After": str(retry_after)})
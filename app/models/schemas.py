@@ -9,6 +9,33 @@ class ImageFormat(str, Enum):
     WEBP = "webp"
     JPEG = "jpeg"
 
+class MaskMode(str, Enum):
+    """Alpha mask postprocessing modes."""
+    BINARY = "binary"
+    SOFT = "soft"
+    REFINED = "refined"
+
+class OutputMode(str, Enum):
+    """What the processing endpoints return."""
+    CUTOUT = "cutout"
+    MASK = "mask"
+    RLE = "rle"
+    BBOX = "bbox"
+
+class EncodePreset(str, Enum):
+    """Output encoder speed/size trade-offs."""
+    FAST = "fast"
+    BALANCED = "balanced"
+    SMALL = "small"
+    ARCHIVAL = "archival"
+
+class JobStatus(str, Enum):
+    """Asynchronous job states."""
+    QUEUED = "queued"
+    PROCESSING = "processing"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
 class ProcessingResponse(BaseModel):
     """Response model for successful image processing."""
     success: bool = True
@@ -30,6 +57,59 @@ class ProcessingResponse(BaseModel):
             message=message or "Background removed successfully"
         )
 
+class JobResponse(BaseModel):
+    """Status of an asynchronous background removal job."""
+    job_id: str
+    status: JobStatus
+    priority: int
+    output_format: ImageFormat
+    mask_mode: MaskMode
+    preset: Optional[EncodePreset] = None
+    output: OutputMode = OutputMode.CUTOUT
+    model: Optional[str] = None
+    created_at: str
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+    expires_at: Optional[str] = None
+    processing_time: Optional[float] = None
+    original_size: Optional[Dict[str, int]] = None
+    file_size: Optional[int] = None
+    frames: Optional[Dict[str, int]] = None
+    error: Optional[str] = None
+    error_code: Optional[str] = None
+    status_url: str
+    result_url: str
+    
+    @classmethod
+    def from_job(cls, job: Dict[str, Any], base_path: str = "/api/jobs"):
+        """Factory method to build a response from a stored job record."""
+        def timestamp(name: str) -> Optional[str]:
+            value = job.get(name)
+            return datetime.fromtimestamp(value).isoformat() if value is not None else None
+        
+        return cls(
+            job_id=job["id"],
+            status=job["status"],
+            priority=job["priority"],
+            output_format=job["output_format"],
+            mask_mode=job["mask_mode"],
+            preset=job.get("preset"),
+            output=job.get("output", OutputMode.CUTOUT.value),
+            model=job.get("model"),
+            created_at=timestamp("created_at"),
+            started_at=timestamp("started_at"),
+            finished_at=timestamp("finished_at"),
+            expires_at=timestamp("expires_at"),
+            processing_time=job.get("processing_time"),
+            original_size=job.get("original_size"),
+            file_size=job.get("file_size"),
+            frames=job.get("frames"),
+            error=job.get("error"),
+            error_code=job.get("error_code"),
+            status_url=f"{base_path}/{job['id']}",
+            result_url=f"{base_path}/{job['id']}/result"
+        )
+
 class ErrorResponse(BaseModel):
     """Standard error response model."""
     success: bool = False
@@ -54,20 +134,38 @@ class HealthResponse(BaseModel):
     version: str = "2.0.0"
     model_loaded: bool = True
     uptime: Optional[str] = Field(default=None, description="Application uptime")
+    ready: bool = True
+    startup: Optional[Dict[str, Any]] = Field(default=None, description="Startup phase timings in seconds")
     
     @classmethod
-    def create_healthy_response(cls, model_loaded: bool = True, uptime: Optional[str] = None):
+    def create_healthy_response(cls, model_loaded: bool = True, uptime: Optional[str] = None,
+                                startup: Optional[Dict[str, Any]] = None):
         """Factory method to create healthy responses."""
         return cls(
             model_loaded=model_loaded,
-            uptime=uptime
+            uptime=uptime,
+            startup=startup
+        )
+    
+    @classmethod
+    def create_starting_response(cls, uptime: Optional[str] = None, startup: Optional[Dict[str, Any]] = None):
+        """Factory method to create responses while the model loads and warms up."""
+        return cls(
+            status="starting",
+            model_loaded=False,
+            uptime=uptime,
+            ready=False,
+            startup=startup
         )
     
     @classmethod
-    def create_unhealthy_response(cls, reason: str = "Service unavailable"):
+    def create_unhealthy_response(cls, reason: str = "Service unavailable",
+                                  startup: Optional[Dict[str, Any]] = None):
         """Factory method to create unhealthy responses."""
         return cls(
             status="unhealthy",
             model_loaded=False,
-            uptime=None
+            uptime=None,
+            ready=False,
+            startup=startup
         )
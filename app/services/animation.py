@@ -0,0 +1,172 @@
+import asyncio
+import io
+import json
+import logging
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from app.config.settings import settings
+from app.core.inference_pool import inference_pool
+from app.core import tracing
+from app.core.metrics import decode_seconds, encode_seconds
+from app.core.segmentation import predict_alpha
+from app.models.exceptions import ValidationException
+from app.models.schemas import EncodePreset, ImageFormat, MaskMode, OutputMode
+from app.services.file_validator import FileValidator
+from app.services.image_encoder import encode_animation
+from app.services.mask_output import mask_bbox, mask_rle
+from app.services.postprocessing import compose_cutout
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_SIZE = 128  # long side of the greyscale thumbnails compared between frames
+MIN_SHIFT_RESPONSE = 0.2  # phase correlation peaks below this are not trusted as a shift
+
+INFER, REUSE, WARP = "infer", "reuse", "warp"
+
+def frame_thumbnail(frame: Image.Image) -> np.ndarray:
+    """Small float32 greyscale copy of a frame for cheap frame-to-frame comparison."""
+    grey = frame.convert("L")
+    scale = THUMBNAIL_SIZE / max(grey.size)
+    if scale < 1:
+        grey = grey.resize((max(1, round(grey.width * scale)), max(1, round(grey.height * scale))),
+                           Image.Resampling.BILINEAR)
+    return np.asarray(grey, dtype=np.float32)
+
+def shift_alpha(alpha: np.ndarray, shift: Tuple[float, float]) -> np.ndarray:
+    """Translate an alpha by ``(dx, dy)`` pixels; uncovered areas become transparent."""
+    height, width = alpha.shape
+    matrix = np.float32([[1, 0, shift[0]], [0, 1, shift[1]]])
+    return cv2.warpAffine(alpha, matrix, (width, height), flags=cv2.INTER_LINEAR,
+                          borderMode=cv2.BORDER_CONSTANT, borderValue=0)
+
+class FrameTracker:
+    """Decides per frame whether the model has to run or an earlier mask still fits.
+
+    Frames are compared as thumbnails against the last frame that went
+    through the model, not against the previous frame, so small changes
+    cannot accumulate unnoticed. A frame within ``threshold`` mean grey
+    levels reuses that mask; one that only matches after a translation
+    (a pan, or a subject sliding across a still background) reuses it
+    shifted; anything else is inferred and becomes the new reference.
+    """
+
+    def __init__(self, threshold: float, warp: bool = True):
+        self.threshold = threshold
+        self.warp = warp
+        self.reference: Optional[np.ndarray] = None
+
+    def plan(self, thumbnail: np.ndarray) -> Tuple[str, Optional[Tuple[float, float]]]:
+        """Return the action for a frame and, for ``warp``, its shift in thumbnail pixels."""
+        if self.reference is not None:
+            if float(np.mean(cv2.absdiff(thumbnail, self.reference))) <= self.threshold:
+                return REUSE, None
+            if self.warp:
+                shift = self._match_shift(thumbnail)
+                if shift is not None:
+                    return WARP, shift
+        self.reference = thumbnail
+        return INFER, None
+
+    def _match_shift(self, thumbnail: np.ndarray) -> Optional[Tuple[float, float]]:
+        (dx, dy), response = cv2.phaseCorrelate(self.reference, thumbnail)
+        if response < MIN_SHIFT_RESPONSE or (abs(dx) < 0.5 and abs(dy) < 0.5):
+            return None
+        height, width = thumbnail.shape
+        matrix = np.float32([[1, 0, dx], [0, 1, dy]])
+        shifted = cv2.warpAffine(self.reference, matrix, (width, height), borderMode=cv2.BORDER_REPLICATE)
+        if float(np.mean(cv2.absdiff(shifted, thumbnail))) > self.threshold:
+            return None
+        return dx, dy
+
+def _next_frame(frames: Iterator[Tuple[Image.Image, int]], tracker: FrameTracker):
+    item = next(frames, None)
+    if item is None:
+        return None
+    frame, duration = item
+    action, shift = tracker.plan(frame_thumbnail(frame))
+    return frame, duration, action, shift
+
+def _render_frame(frame: Image.Image, alpha: np.ndarray, output: OutputMode,
+                  preset: Optional[EncodePreset]):
+    if output == OutputMode.CUTOUT:
+        return compose_cutout(frame, alpha)
+    if output == OutputMode.MASK:
+        return Image.fromarray(alpha)
+    return mask_rle(alpha) if output == OutputMode.RLE else mask_bbox(alpha, preset)
+
+def _encode_frames(rendered: List, durations: List[int], loop: int, output: OutputMode,
+                   output_format: ImageFormat, preset: Optional[EncodePreset]) -> io.BytesIO:
+    if output in (OutputMode.CUTOUT, OutputMode.MASK):
+        return encode_animation(rendered, durations, loop, output_format, preset,
+                                lossless=output == OutputMode.MASK)
+    body = {
+        "loop": loop,
+        "frames": [dict(frame, duration=duration) for frame, duration in zip(rendered, durations)]
+    }
+    return io.BytesIO(json.dumps(body, separators=(",", ":")).encode("utf-8"))
+
+async def process_animation(source: BinaryIO, header: Image.Image, output_format: ImageFormat,
+                            mask_mode: MaskMode, threshold: float,
+                            preset: Optional[EncodePreset] = None,
+                            output: OutputMode = OutputMode.CUTOUT,
+                            model: Optional[str] = None) -> Tuple[io.BytesIO, Dict]:
+    """Remove the background from every frame of an animated GIF, WEBP or PNG.
+
+    Frames are decoded one window at a time. Within a window the frames that
+    need the model are submitted together, so the batch scheduler runs them
+    as one forward pass; the rest reuse (or shift) the last inferred mask.
+    Returns the re-encoded animation (APNG or WEBP, or JSON for ``rle`` and
+    ``bbox``) and per-frame counts.
+    """
+    if output in (OutputMode.CUTOUT, OutputMode.MASK) and output_format == ImageFormat.JPEG:
+        raise ValidationException("Animated images can be returned as png (APNG) or webp")
+    frame_count = FileValidator.validate_animation(header)
+    loop = int(header.info.get("loop", 0))
+    scale = max(header.size) / THUMBNAIL_SIZE if max(header.size) > THUMBNAIL_SIZE else 1.0
+
+    tracker = FrameTracker(settings.ANIMATION_REUSE_THRESHOLD, settings.ANIMATION_WARP)
+    frames = FileValidator.iter_frames(source)
+    window = max(1, settings.BATCH_MAX_SIZE)
+    stats = {"total": frame_count, "inferred": 0, "reused": 0, "warped": 0}
+    rendered: List = []
+    durations: List[int] = []
+    key_alpha = None
+
+    while True:
+        batch = []
+        with tracing.span("decode", decode_seconds, animated=True):
+            for _ in range(window):
+                item = await asyncio.to_thread(_next_frame, frames, tracker)
+                if item is None:
+                    break
+                batch.append(item)
+        if not batch:
+            break
+
+        keyframes = [frame for frame, _, action, _ in batch if action == INFER]
+        alphas = iter(await asyncio.gather(*(predict_alpha(frame, mask_mode, threshold, model=model)
+                                                for frame in keyframes)))
+        for frame, duration, action, shift in batch:
+            if action == INFER:
+                key_alpha = alpha = next(alphas)
+                stats["inferred"] += 1
+            elif action == WARP:
+                alpha = shift_alpha(key_alpha, (shift[0] * scale, shift[1] * scale))
+                stats["warped"] += 1
+            else:
+                alpha = key_alpha
+                stats["reused"] += 1
+            rendered.append(await inference_pool.run(_render_frame, frame, alpha, output, preset))
+            durations.append(duration)
+        del batch, keyframes
+
+    logger.info("Animation processed: %s", stats)
+    with tracing.span("encode", encode_seconds, output=output.value, frames=len(rendered)):
+        output_buffer = await inference_pool.run(
+            _encode_frames, rendered, durations, loop, output, output_format, preset
+        )
+    return output_buffer, stats
@@ -1,11 +1,38 @@
 import io
+import asyncio
+import hashlib
+import logging
+import tempfile
+import zipfile
 from pathlib import Path
+from typing import BinaryIO, Iterator, List, Optional, Tuple
 from fastapi import UploadFile
 from PIL import Image
 
 from app.config.settings import settings
+from app.core import tracing
+from app.core.metrics import decode_seconds
 from app.models.exceptions import ValidationException
 
+logger = logging.getLogger(__name__)
+
+# MPO is how Pillow opens most phone and camera JPEGs (extra frames hold
+# previews or depth data); the first frame is the photo, decoded as a JPEG
+ALLOWED_IMAGE_FORMATS = {"JPEG", "MPO", "PNG", "WEBP", "BMP", "GIF"}
+ALLOWED_MIME_TYPES = {
+    "image/jpeg", "image/jpg", "image/png",
+    "image/webp", "image/bmp", "image/gif"
+}
+# PIL's messages carry object reprs and file names; clients get this instead
+INVALID_IMAGE_MESSAGE = "Invalid or unsupported image"
+ARCHIVE_MIME_TYPES = {"application/zip", "application/x-zip-compressed"}
+READ_CHUNK_SIZE = 1024 * 1024
+SPOOL_MAX_SIZE = 1024 * 1024
+# RGB decode (3) + alpha (1) + RGBA cutout (4) + encoded output (up to ~4)
+FULL_RESOLUTION_BYTES_PER_PIXEL = 12
+# Animated outputs hold every frame's RGBA cutout (4) and alpha (1) until encoded
+ANIMATION_BYTES_PER_PIXEL = 5
+
 class FileValidator:
     """Handles file validation with security checks."""
     
@@ -14,35 +41,213 @@ class FileValidator:
         """Comprehensive image file validation."""
         if file.size is None:
             raise ValidationException("file is empty")
-        if file.size > settings.MAX_FILE_SIZE:
+        FileValidator.validate_size(file.size)
+        
+        if file.filename:
+            FileValidator.validate_filename(file.filename)
+        
+        if file.content_type not in ALLOWED_MIME_TYPES:
+            raise ValidationException(f"Invalid MIME type: {file.content_type}")
+    
+    @staticmethod
+    def validate_size(size: int) -> None:
+        """Reject files larger than the upload limit."""
+        if size > settings.MAX_FILE_SIZE:
             raise ValidationException(
                 f"File too large. Maximum size: {settings.MAX_FILE_SIZE / (1024*1024):.1f}MB"
             )
+    
+    @staticmethod
+    def validate_filename(filename: str) -> None:
+        """Reject file names without an allowed image extension."""
+        file_ext = Path(filename).suffix.lower()
+        if file_ext not in settings.ALLOWED_EXTENSIONS:
+            raise ValidationException(
+                f"Invalid file type. Allowed types: {', '.join(settings.ALLOWED_EXTENSIONS)}"
+            )
+    
+    @staticmethod
+    def is_archive(file: UploadFile) -> bool:
+        """Whether an upload is a zip archive of images."""
+        return (
+            file.content_type in ARCHIVE_MIME_TYPES
+            or Path(file.filename or "").suffix.lower() == ".zip"
+        )
+    
+    @staticmethod
+    def open_archive(source: BinaryIO) -> Tuple[zipfile.ZipFile, List[zipfile.ZipInfo]]:
+        """Open a zip upload and return its image entries (blocking)."""
+        try:
+            source.seek(0)
+            archive = zipfile.ZipFile(source)
+        except zipfile.BadZipFile as e:
+            raise ValidationException(f"Invalid zip archive: {str(e)}")
+        
+        entries = [
+            info for info in archive.infolist()
+            if not info.is_dir() and not info.filename.startswith("__MACOSX/")
+        ]
+        if not entries:
+            raise ValidationException("Zip archive contains no files")
+        if len(entries) > settings.BATCH_MAX_ITEMS:
+            raise ValidationException(
+                f"Too many images. Maximum per batch: {settings.BATCH_MAX_ITEMS}"
+            )
+        return archive, entries
+    
+    @staticmethod
+    def extract_archive_entry(archive: zipfile.ZipFile, info: zipfile.ZipInfo) -> BinaryIO:
+        """Validate one zip entry and spool it to a seekable temp file (blocking)."""
+        FileValidator.validate_filename(info.filename)
+        FileValidator.validate_size(info.file_size)
         
-        if file.filename:
-            file_ext = Path(file.filename).suffix.lower()
-            if file_ext not in settings.ALLOWED_EXTENSIONS:
-                raise ValidationException(
-                    f"Invalid file type. Allowed types: {', '.join(settings.ALLOWED_EXTENSIONS)}"
-                )
-        
-        allowed_mime_types = {
-            "image/jpeg", "image/jpg", "image/png", 
-            "image/webp", "image/bmp"
-        }
-        if file.content_type not in allowed_mime_types:
-            raise ValidationException(f"Invalid MIME type: {file.content_type}")
+        spooled = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+        with archive.open(info) as entry:
+            # The declared size is not trusted: stop copying at the limit
+            copied = 0
+            for chunk in iter(lambda: entry.read(READ_CHUNK_SIZE), b""):
+                copied += len(chunk)
+                if copied > settings.MAX_FILE_SIZE:
+                    spooled.close()
+                    FileValidator.validate_size(copied)
+                spooled.write(chunk)
+        spooled.seek(0)
+        return spooled
     
     @staticmethod
     async def validate_image_content(image_data: bytes) -> Image.Image:
         """Validate image content and return PIL Image."""
+        source = io.BytesIO(image_data)
+        await FileValidator.open_image(source)
+        return await FileValidator.load_image(source)
+    
+    @staticmethod
+    async def open_image(source: BinaryIO) -> Image.Image:
+        """Header-only validation of a seekable image stream.
+        
+        Only the header is parsed, so format and dimensions are checked without
+        decoding pixels; corrupt pixel data is reported by ``load_image``.
+        """
+        try:
+            with tracing.span("header"):
+                image = await asyncio.to_thread(tracing.profiled(FileValidator._open), source)
+        except Exception as e:
+            logger.warning("Could not open image header: %s", e)
+            raise ValidationException(INVALID_IMAGE_MESSAGE)
+        FileValidator.validate_header(image)
+        return image
+    
+    @staticmethod
+    def validate_header(image: Image.Image) -> None:
+        """Check an opened image's format, resolution and working memory before any decode."""
+        if image.format not in ALLOWED_IMAGE_FORMATS:
+            raise ValidationException(f"Unsupported image format: {image.format}")
+        
+        width, height = image.size
+        if width * height > settings.MAX_IMAGE_PIXELS:
+            raise ValidationException(
+                f"Image too large. Maximum resolution: {settings.MAX_IMAGE_PIXELS / 1e6:.0f} megapixels"
+            )
+        
+        required_mb = FileValidator.estimate_memory_mb(image.size)
+        if required_mb > settings.MAX_REQUEST_MEMORY_MB:
+            raise ValidationException(
+                f"Image too large to process: needs about {required_mb:.0f}MB, "
+                f"limit is {settings.MAX_REQUEST_MEMORY_MB}MB per request"
+            )
+    
+    @staticmethod
+    def is_animated(image: Image.Image) -> bool:
+        """Whether a GIF, WEBP or APNG header describes more than one frame.
+        
+        MPO files report several frames too, but they are a still photo with
+        attachments and are processed as a JPEG.
+        """
+        if image.format == "MPO":
+            return False
+        return getattr(image, "is_animated", False) and image.n_frames > 1
+    
+    @staticmethod
+    def validate_animation(image: Image.Image) -> int:
+        """Check the frame count and total working set of an animation; returns the frame count."""
+        frames = image.n_frames
+        if frames > settings.ANIMATION_MAX_FRAMES:
+            raise ValidationException(
+                f"Too many frames. Maximum per animation: {settings.ANIMATION_MAX_FRAMES}"
+            )
+        
+        width, height = image.size
+        required_mb = (
+            FileValidator.estimate_memory_mb(image.size)
+            + width * height * frames * ANIMATION_BYTES_PER_PIXEL / (1024 * 1024)
+        )
+        if required_mb > settings.MAX_REQUEST_MEMORY_MB:
+            raise ValidationException(
+                f"Animation too large to process: needs about {required_mb:.0f}MB, "
+                f"limit is {settings.MAX_REQUEST_MEMORY_MB}MB per request"
+            )
+        return frames
+    
+    @staticmethod
+    def iter_frames(source: BinaryIO) -> Iterator[Tuple[Image.Image, int]]:
+        """Decode an animation one frame at a time (blocking), as RGBA frames with their duration in ms.
+        
+        Only the current frame is held; each yielded frame is an independent copy.
+        """
+        source.seek(0)
+        image = Image.open(source)
+        for index in range(image.n_frames):
+            image.seek(index)
+            yield image.convert("RGBA"), int(image.info.get("duration") or 100)
+    
+    @staticmethod
+    def estimate_memory_mb(size: Tuple[int, int]) -> float:
+        """Peak working memory for one image at full resolution.
+        
+        Decoded RGB, the alpha, the RGBA cutout and the encoder's output are
+        area-sized; refinement tiles and the model input are bounded separately.
+        """
+        width, height = size
+        return width * height * FULL_RESOLUTION_BYTES_PER_PIXEL / (1024 * 1024)
+    
+    @staticmethod
+    async def load_image(source: BinaryIO, draft_size: Optional[Tuple[int, int]] = None) -> Image.Image:
+        """Decode an image stream off the event loop.
+        
+        With ``draft_size``, JPEGs are decoded directly at the smallest DCT
+        scale that still covers that size instead of at full resolution.
+        """
         try:
-            image = Image.open(io.BytesIO(image_data))
-            image.verify()
-            image = Image.open(io.BytesIO(image_data))
-            return image
-            
+            with tracing.span("decode", decode_seconds, draft=draft_size is not None):
+                return await asyncio.to_thread(tracing.profiled(FileValidator._load), source, draft_size)
         except Exception as e:
-            if isinstance(e, ValidationException):
-                raise
-            raise ValidationException(f"Invalid image format: {str(e)}")
\ No newline at end of file
+            logger.warning("Could not decode image: %s", e)
+            raise ValidationException(INVALID_IMAGE_MESSAGE)
+    
+    @staticmethod
+    async def content_digest(source: BinaryIO) -> str:
+        """SHA-256 of a stream, read in chunks rather than into one buffer."""
+        with tracing.span("digest"):
+            return await asyncio.to_thread(tracing.profiled(FileValidator._digest), source)
+    
+    @staticmethod
+    def _open(source: BinaryIO) -> Image.Image:
+        source.seek(0)
+        return Image.open(source)
+    
+    @staticmethod
+    def _load(source: BinaryIO, draft_size: Optional[Tuple[int, int]]) -> Image.Image:
+        source.seek(0)
+        image = Image.open(source)
+        if draft_size is not None:
+            image.draft("RGB", draft_size)
+        image.load()
+        return image
+    
+    @staticmethod
+    def _digest(source: BinaryIO) -> str:
+        source.seek(0)
+        digest = hashlib.sha256()
+        for chunk in iter(lambda: source.read(READ_CHUNK_SIZE), b""):
+            digest.update(chunk)
+        return digest.hexdigest()
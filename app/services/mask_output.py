@@ -0,0 +1,91 @@
+import base64
+import io
+import json
+import logging
+from typing import Dict, Optional
+
+import numpy as np
+from PIL import Image
+
+from app.models.exceptions import ProcessingException, ValidationException
+from app.models.schemas import EncodePreset, ImageFormat, OutputMode
+from app.services.image_encoder import encoder_options
+
+logger = logging.getLogger(__name__)
+
+# Alpha values at or above this count as foreground in the RLE output
+RLE_THRESHOLD = 128
+
+# Everything here works on the uint8 alpha alone: the full-resolution image
+# is never decoded, composited or encoded for these outputs.
+
+def validate_output(output: OutputMode, output_format: ImageFormat) -> None:
+    """Reject combinations that cannot represent the requested output."""
+    if output == OutputMode.MASK and output_format == ImageFormat.JPEG:
+        raise ValidationException("Mask output supports png or webp, JPEG would blur the mask edges")
+
+def output_media_type(output: OutputMode, output_format: ImageFormat) -> str:
+    if output in (OutputMode.RLE, OutputMode.BBOX):
+        return "application/json"
+    return f"image/{output_format.value}"
+
+def output_extension(output: OutputMode, output_format: ImageFormat) -> str:
+    if output in (OutputMode.RLE, OutputMode.BBOX):
+        return "json"
+    return output_format.value
+
+def encode_mask(alpha: np.ndarray, output_format: ImageFormat,
+                preset: Optional[EncodePreset] = None) -> io.BytesIO:
+    """Encode the alpha as a single-channel 8-bit PNG or WEBP."""
+    # Lossy WEBP would be chroma-subsampled YUV; masks need exact values
+    options = encoder_options(output_format, preset, lossless=True)
+    output_buffer = io.BytesIO()
+    Image.fromarray(alpha).save(output_buffer, format=output_format.value.upper(), **options)
+    output_buffer.seek(0)
+    return output_buffer
+
+def mask_rle(alpha: np.ndarray) -> Dict:
+    """Uncompressed COCO run-length encoding of the thresholded alpha.
+
+    Runs are counted in column-major order and start with background, so
+    ``{"size": [height, width], "counts": [...]}`` can be fed to
+    ``pycocotools.mask.frPyObjects`` as is.
+    """
+    height, width = alpha.shape
+    # Transposing makes the column-major walk a contiguous one
+    flat = np.ascontiguousarray(alpha.T).reshape(-1) >= RLE_THRESHOLD
+    changes = np.flatnonzero(flat[1:] != flat[:-1]) + 1
+    boundaries = np.concatenate(([0], changes, [flat.size]))
+    counts = np.diff(boundaries)
+    if flat.size and flat[0]:
+        counts = np.concatenate(([0], counts))
+    return {"size": [height, width], "counts": counts.tolist()}
+
+def mask_bbox(alpha: np.ndarray, preset: Optional[EncodePreset] = None) -> Dict:
+    """Bounding box of the non-zero alpha plus the alpha cropped to it as a base64 PNG."""
+    height, width = alpha.shape
+    rows = np.flatnonzero(alpha.any(axis=1))
+    if rows.size == 0:
+        return {"size": {"width": width, "height": height}, "bbox": None, "alpha": None}
+
+    columns = np.flatnonzero(alpha.any(axis=0))
+    top, bottom = int(rows[0]), int(rows[-1]) + 1
+    left, right = int(columns[0]), int(columns[-1]) + 1
+    cropped = encode_mask(np.ascontiguousarray(alpha[top:bottom, left:right]), ImageFormat.PNG, preset)
+    return {
+        "size": {"width": width, "height": height},
+        "bbox": {"x": left, "y": top, "width": right - left, "height": bottom - top},
+        "alpha": base64.b64encode(cropped.getbuffer()).decode("ascii")
+    }
+
+def render_mask_output(alpha: np.ndarray, output: OutputMode, output_format: ImageFormat,
+                       preset: Optional[EncodePreset] = None) -> io.BytesIO:
+    """Build a mask-only response body in one executor hop."""
+    try:
+        if output == OutputMode.MASK:
+            return encode_mask(alpha, output_format, preset)
+        body = mask_rle(alpha) if output == OutputMode.RLE else mask_bbox(alpha, preset)
+        return io.BytesIO(json.dumps(body, separators=(",", ":")).encode("utf-8"))
+    except Exception as e:
+        logger.error("Mask output failed: %s", e)
+        raise ProcessingException(f"Image processing failed: {str(e)}")
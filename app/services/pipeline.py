@@ -0,0 +1,94 @@
+import io
+import logging
+from typing import BinaryIO, Dict, Optional, Tuple
+
+from PIL import Image
+
+from app.config.settings import settings
+from app.core.inference_pool import inference_pool
+from app.core import tracing
+from app.core.metrics import encode_seconds, input_megapixels, output_bytes
+from app.core.model_registry import model_registry
+from app.core.result_cache import mask_cache
+from app.core.segmentation import predict_alpha
+from app.models.schemas import EncodePreset, ImageFormat, MaskMode, OutputMode
+from app.services.animation import process_animation
+from app.services.file_validator import FileValidator
+from app.services.image_encoder import resolve_preset
+from app.services.mask_output import render_mask_output, validate_output
+from app.services.postprocessing import render_cutout
+
+logger = logging.getLogger(__name__)
+
+async def process_source(
+    source: BinaryIO,
+    output_format: ImageFormat,
+    mask_mode: MaskMode,
+    threshold: float,
+    preset: Optional[EncodePreset] = None,
+    output: OutputMode = OutputMode.CUTOUT,
+    model: Optional[str] = None,
+    digest: Optional[str] = None,
+    model_input: Optional[Image.Image] = None
+) -> Tuple[io.BytesIO, Tuple[int, int], str, Optional[Dict]]:
+    """Run one seekable image stream through validation, inference and encoding.
+
+    Returns the response body (the encoded cutout, or for mask-only outputs
+    the mask, RLE or bounding-box JSON), the original image size, the mask
+    cache status and, for animated inputs, the per-frame counts. ``model``
+    picks a registry model by name, ``None`` is the default one. ``digest``
+    and ``model_input`` (the reduced-scale decode) skip those steps when
+    they were already done while the image was downloaded.
+    """
+    validate_output(output, output_format)
+    # Masks are cached per revision, so a swapped model never serves stale ones
+    model_id = model_registry.resolve(model).model_id
+    header = await FileValidator.open_image(source)
+    original_size = header.size
+    input_megapixels.observe(original_size[0] * original_size[1] / 1e6)
+    logger.debug("Processing image with size: %s", original_size)
+
+    if FileValidator.is_animated(header):
+        # Animations bypass the mask cache: their masks are per frame
+        output_buffer, frames = await process_animation(
+            source, header, output_format, mask_mode, threshold, preset, output, model
+        )
+        output_bytes.observe(output_buffer.getbuffer().nbytes)
+        return output_buffer, original_size, "BYPASS", frames
+
+    content_digest = digest or await FileValidator.content_digest(source)
+    cache_key = mask_cache.make_key(
+        content_digest, model=model_id, mode=mask_mode.value, threshold=threshold,
+        guided_radius=settings.GUIDED_FILTER_RADIUS, guided_eps=settings.GUIDED_FILTER_EPS
+    )
+    with tracing.span("cache"):
+        alpha = await mask_cache.get(cache_key)
+    cache_status = "HIT" if alpha is not None else "MISS"
+
+    image = None
+    if alpha is None:
+        # The model only sees MODEL_INPUT_SIZE, so it gets a reduced-scale decode
+        input_size = (settings.MODEL_INPUT_SIZE, settings.MODEL_INPUT_SIZE)
+        if model_input is None:
+            model_input = await FileValidator.load_image(source, draft_size=input_size)
+        if mask_mode == MaskMode.REFINED:
+            # Refinement needs the full-resolution image as its guide
+            image = await FileValidator.load_image(source)
+        alpha = await predict_alpha(model_input, mask_mode, threshold, size=original_size, guide=image,
+                                    model=model)
+        del model_input
+        await mask_cache.set(cache_key, alpha)
+
+    preset = resolve_preset(preset)
+    if output != OutputMode.CUTOUT:
+        # Mask-only outputs are built from the alpha alone, so the
+        # full-resolution image is never decoded or composited
+        with tracing.span("encode", encode_seconds, output=output.value, preset=preset.value):
+            output_buffer = await inference_pool.run(render_mask_output, alpha, output, output_format, preset)
+    else:
+        if image is None:
+            image = await FileValidator.load_image(source)
+        with tracing.span("encode", encode_seconds, format=output_format.value, preset=preset.value):
+            output_buffer = await inference_pool.run(render_cutout, image, alpha, output_format, preset)
+    output_bytes.observe(output_buffer.getbuffer().nbytes)
+    return output_buffer, original_size, cache_status, None
@@ -0,0 +1,295 @@
+import io
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+from PIL import Image, ImageChops
+
+from app.config.settings import settings
+from app.models.exceptions import ProcessingException
+from app.models.schemas import EncodePreset, ImageFormat, MaskMode
+from app.services.image_encoder import encode_image, flatten_alpha
+
+logger = logging.getLogger(__name__)
+
+MASK_THRESHOLD = 0.5
+
+# These are plain module-level functions so they can be shipped to a
+# process executor without pickling the model manager.
+
+_local = threading.local()
+
+# scipy's default 2-D structuring element for binary opening
+_OPEN_KERNEL = cv2.getStructuringElement(cv2.MORPH_CROSS, (3, 3))
+
+def _mask_buffers(shape: Tuple[int, int]) -> Dict[str, np.ndarray]:
+    """Return this thread's reusable mask-resolution buffers for a shape."""
+    pool = getattr(_local, "buffers", None)
+    if pool is None:
+        pool = _local.buffers = {}
+
+    buffers = pool.get(shape)
+    if buffers is None:
+        height, width = shape
+        buffers = pool[shape] = {
+            "padded": np.empty((height + 2, width + 2), dtype=np.uint8),
+            "foreground": np.empty(shape, dtype=np.uint8),
+            "opened": np.empty(shape, dtype=np.uint8),
+            "probability": np.empty(shape, dtype=np.float32),
+            "soft": np.empty(shape, dtype=np.uint8)
+        }
+    return buffers
+
+def _is_probability(mask: np.ndarray) -> bool:
+    return mask.min() >= 0 and mask.max() <= 1
+
+def _binary_mask(mask: np.ndarray, threshold: float, buffers: Dict[str, np.ndarray]) -> np.ndarray:
+    """Threshold, fill holes and open the mask into a 0/255 buffer."""
+    padded = buffers["padded"]
+    interior = padded[1:-1, 1:-1]
+
+    # sigmoid(x) > t is x > logit(t), so raw logits are thresholded directly
+    # instead of materialising a second sigmoid of the whole mask.
+    if not _is_probability(mask):
+        with np.errstate(divide="ignore"):
+            threshold = float(np.log(threshold) - np.log1p(-threshold))
+
+    # Background is 1 inside a one-pixel background frame. Flooding from
+    # the frame reaches all border-connected background, so whatever is
+    # left at 1 is a hole: the same result as binary_fill_holes.
+    padded.fill(1)
+    np.less_equal(mask, threshold, out=interior)
+    cv2.floodFill(padded, None, (0, 0), 2, flags=4)
+    foreground = buffers["foreground"]
+    np.not_equal(interior, 2, out=foreground)
+    foreground *= 255
+
+    # A zero border matches scipy's binary_opening at the image edges
+    opened = buffers["opened"]
+    cv2.morphologyEx(foreground, cv2.MORPH_OPEN, _OPEN_KERNEL, dst=opened,
+                     borderType=cv2.BORDER_CONSTANT, borderValue=0)
+    return opened
+
+def _probability_mask(mask: np.ndarray, buffers: Dict[str, np.ndarray]) -> np.ndarray:
+    """Return the mask as [0, 1] float32 probabilities, in a reused buffer."""
+    probability = buffers["probability"]
+    if _is_probability(mask):
+        np.copyto(probability, mask)
+    else:
+        np.negative(mask, out=probability)
+        np.exp(probability, out=probability)
+        probability += 1
+        np.reciprocal(probability, out=probability)
+    return probability
+
+def _soft_mask(mask: np.ndarray, buffers: Dict[str, np.ndarray]) -> np.ndarray:
+    """Scale probabilities to a 0..255 buffer without thresholding."""
+    probability = _probability_mask(mask, buffers)
+    soft = buffers["soft"]
+    cv2.convertScaleAbs(probability, dst=soft, alpha=255.0)
+    return soft
+
+# Probabilities strictly between these are uncertain and always refined
+_BAND_LOW = 0.02
+_BAND_HIGH = 0.98
+
+_tile_executor: Optional[ThreadPoolExecutor] = None
+_tile_executor_lock = threading.Lock()
+
+def _get_tile_executor() -> ThreadPoolExecutor:
+    """Shared pool for refinement tiles (OpenCV and numpy release the GIL)."""
+    global _tile_executor
+    with _tile_executor_lock:
+        if _tile_executor is None:
+            _tile_executor = ThreadPoolExecutor(
+                max_workers=max(1, settings.REFINE_WORKERS),
+                thread_name_prefix="refine-tile"
+            )
+    return _tile_executor
+
+def _edge_band(probability: np.ndarray, radius: int) -> np.ndarray:
+    """Mask-resolution 0/1 map of pixels close enough to an edge to need refinement."""
+    band = cv2.inRange(probability, _BAND_LOW, _BAND_HIGH)
+    foreground = cv2.compare(probability, 0.5, cv2.CMP_GT)
+    band |= cv2.morphologyEx(foreground, cv2.MORPH_GRADIENT, _OPEN_KERNEL)
+    # The guided filter's own window spans two box filters of this radius
+    window = cv2.getStructuringElement(cv2.MORPH_RECT, (4 * radius + 1, 4 * radius + 1))
+    cv2.dilate(band, window, dst=band)
+    band //= 255
+    return band
+
+def _resize_region(low_res: np.ndarray, box: Tuple[int, int, int, int], size: Tuple[int, int],
+                   interpolation: int) -> np.ndarray:
+    """The ``box`` region of ``cv2.resize(low_res, size)`` without resizing the whole array."""
+    x0, y0, x1, y1 = box
+    scale_x = low_res.shape[1] / size[0]
+    scale_y = low_res.shape[0] / size[1]
+    # Same pixel-centre mapping as cv2.resize, offset to the tile origin
+    transform = np.array([
+        [scale_x, 0, (x0 + 0.5) * scale_x - 0.5],
+        [0, scale_y, (y0 + 0.5) * scale_y - 0.5]
+    ], dtype=np.float64)
+    return cv2.warpAffine(low_res, transform, (x1 - x0, y1 - y0),
+                          flags=interpolation | cv2.WARP_INVERSE_MAP,
+                          borderMode=cv2.BORDER_REPLICATE)
+
+def _refine_tile(coefficients: np.ndarray, guide: Image.Image, box: Tuple[int, int, int, int],
+                 size: Tuple[int, int], alpha: np.ndarray):
+    """Apply the guided-filter coefficients to one full-resolution tile of the alpha."""
+    x0, y0, x1, y1 = box
+    gray = np.asarray(guide.crop(box).convert("L"))
+    tile = _resize_region(coefficients, box, size, cv2.INTER_LINEAR)
+    refined = tile[..., 0]
+    refined *= gray
+    refined += tile[..., 1]
+    np.maximum(refined, 0, out=refined)
+    cv2.convertScaleAbs(refined, dst=alpha[y0:y1, x0:x1])
+
+def _guided_refine(probability: np.ndarray, guide: Image.Image, size: Tuple[int, int],
+                   out: Optional[np.ndarray] = None,
+                   preview: Optional[Image.Image] = None) -> np.ndarray:
+    """Snap a coarse alpha to image edges with a fast guided filter.
+
+    Filter coefficients are solved at mask resolution. The coarse alpha is
+    upscaled everywhere, and the coefficients are applied to the
+    full-resolution guide only in tiles that touch the band around the
+    mask's edges, so the work and temporaries grow with edge length rather
+    than image area. ``preview``, a reduced-scale decode of the guide,
+    saves downsampling the full image to solve the coefficients.
+    """
+    width, height = size
+    mask_h, mask_w = probability.shape
+    radius = max(1, settings.GUIDED_FILTER_RADIUS)
+    eps = settings.GUIDED_FILTER_EPS
+    window = (2 * radius + 1, 2 * radius + 1)
+
+    low_source = preview if preview is not None else guide
+    low_guide = low_source.resize((mask_w, mask_h), Image.Resampling.BOX).convert("L")
+    low_guide = np.asarray(low_guide, dtype=np.float32) * (1.0 / 255)
+
+    mean_i = cv2.boxFilter(low_guide, -1, window)
+    mean_p = cv2.boxFilter(probability, -1, window)
+    corr_ip = cv2.boxFilter(low_guide * probability, -1, window)
+    var_i = cv2.boxFilter(low_guide * low_guide, -1, window)
+    var_i -= mean_i * mean_i
+    var_i += eps
+
+    a = corr_ip
+    a -= mean_i * mean_p
+    a /= var_i
+    b = mean_p
+    b -= a * mean_i
+    a = cv2.boxFilter(a, -1, window)
+    b = cv2.boxFilter(b, -1, window)
+    # With the guide left in 0..255, 255 * (a * gray / 255 + b) = a * gray + 255 * b
+    b *= 255.0
+    # Interleaved so each tile resamples both maps in one pass
+    coefficients = cv2.merge([a, b])
+
+    coarse = cv2.convertScaleAbs(probability, alpha=255.0)
+    interpolation = cv2.INTER_LINEAR if width >= mask_w and height >= mask_h else cv2.INTER_AREA
+    alpha = cv2.resize(coarse, (width, height), dst=out, interpolation=interpolation)
+
+    band = _edge_band(probability, radius)
+    tile = max(64, settings.REFINE_TILE_SIZE)
+    boxes = []
+    for y0 in range(0, height, tile):
+        for x0 in range(0, width, tile):
+            x1, y1 = min(x0 + tile, width), min(y0 + tile, height)
+            # Tile bounds in mask coordinates, widened by a pixel for interpolation
+            mx0 = max(0, int(x0 * mask_w / width) - 1)
+            my0 = max(0, int(y0 * mask_h / height) - 1)
+            mx1 = int(np.ceil(x1 * mask_w / width)) + 1
+            my1 = int(np.ceil(y1 * mask_h / height)) + 1
+            if band[my0:my1, mx0:mx1].any():
+                boxes.append((x0, y0, x1, y1))
+
+    if len(boxes) > 1 and settings.REFINE_WORKERS > 1:
+        # Tiles write disjoint regions of the alpha, so they can run concurrently
+        futures = [
+            _get_tile_executor().submit(_refine_tile, coefficients, guide, box, size, alpha)
+            for box in boxes
+        ]
+        for future in futures:
+            future.result()
+    else:
+        for box in boxes:
+            _refine_tile(coefficients, guide, box, size, alpha)
+    return alpha
+
+def mask_to_alpha(mask: np.ndarray, size: Tuple[int, int],
+                  mode: MaskMode = MaskMode.BINARY,
+                  threshold: float = MASK_THRESHOLD,
+                  guide: Optional[Image.Image] = None,
+                  out: Optional[np.ndarray] = None,
+                  preview: Optional[Image.Image] = None) -> np.ndarray:
+    """Turn a model mask into a full-resolution uint8 alpha.
+
+    ``binary`` thresholds and cleans the mask, ``soft`` keeps the model's
+    probabilities and ``refined`` edge-aligns them to ``guide`` (the source
+    image, with ``preview`` an optional reduced-scale decode of it). When
+    ``out`` is given the alpha is written into it.
+    """
+    try:
+        buffers = _mask_buffers(mask.shape)
+        width, height = size
+
+        if mode == MaskMode.REFINED:
+            if guide is None:
+                raise ValueError("Refined mask mode needs the source image as a guide")
+            return _guided_refine(_probability_mask(mask, buffers), guide, size,
+                                  out=out, preview=preview)
+
+        if mode == MaskMode.SOFT:
+            low_res = _soft_mask(mask, buffers)
+        else:
+            low_res = _binary_mask(mask, threshold, buffers)
+
+        upscale = width >= mask.shape[1] and height >= mask.shape[0]
+        interpolation = cv2.INTER_LINEAR if upscale else cv2.INTER_AREA
+        return cv2.resize(low_res, (width, height), dst=out, interpolation=interpolation)
+
+    except Exception as e:
+        logger.error("Mask postprocessing failed: %s", e)
+        raise ProcessingException(f"Image processing failed: {str(e)}")
+
+def compose_cutout(image: Image.Image, alpha: np.ndarray) -> Image.Image:
+    """Write alpha straight into an RGBA copy of the image."""
+    result = image.convert("RGBA")
+    mask_img = Image.fromarray(alpha)
+
+    if image.mode in ("RGBA", "LA") or "transparency" in image.info:
+        mask_img = ImageChops.multiply(result.getchannel("A"), mask_img)
+
+    result.putalpha(mask_img)
+    return result
+
+def flatten_cutout(image: Image.Image, alpha: np.ndarray) -> Image.Image:
+    """The cutout composited over white, for formats without alpha.
+
+    Works from the source pixels directly, skipping the RGBA copy that
+    ``compose_cutout`` would make only to have it flattened again.
+    """
+    if image.mode in ("RGBA", "LA") or "transparency" in image.info:
+        source_alpha = np.asarray(image.convert("RGBA").getchannel("A"))
+        alpha = cv2.multiply(alpha, source_alpha, scale=1 / 255)
+    rgb = np.array(image if image.mode == "RGB" else image.convert("RGB"))
+    return Image.fromarray(flatten_alpha(rgb, alpha))
+
+def apply_mask(image: Image.Image, mask: np.ndarray) -> Image.Image:
+    """Turn a model mask into an RGBA cutout of the original image."""
+    return compose_cutout(image, mask_to_alpha(mask, image.size))
+
+def render_cutout(image: Image.Image, alpha: np.ndarray, output_format: ImageFormat,
+                  preset: Optional[EncodePreset] = None) -> io.BytesIO:
+    """Composite and encode the cutout in one executor hop."""
+    try:
+        if output_format == ImageFormat.JPEG:
+            return encode_image(flatten_cutout(image, alpha), output_format, preset)
+        return encode_image(compose_cutout(image, alpha), output_format, preset)
+    except Exception as e:
+        logger.error("Image processing failed: %s", e)
+        raise ProcessingException(f"Image processing failed: {str(e)}")
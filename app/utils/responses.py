@@ -1,5 +1,6 @@
+import io
 import json
-from typing import Any
+from typing import Any, Iterator
 from datetime import datetime
 from fastapi.responses import JSONResponse
 
@@ -28,3 +29,16 @@ class SafeJSONResponse(JSONResponse):
             return obj.dict()
         else:
             return str(obj)
+
+def iter_buffer(buffer: io.BytesIO, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+    """Stream an in-memory buffer in fixed-size chunks.
+    
+    Slicing the buffer's memoryview avoids the full-size copies of
+    ``getvalue()``; only one chunk at a time is materialised as bytes.
+    """
+    view = buffer.getbuffer()
+    try:
+        for offset in range(0, len(view), chunk_size):
+            yield bytes(view[offset:offset + chunk_size])
+    finally:
+        view.release()
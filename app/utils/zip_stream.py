@@ -0,0 +1,60 @@
+import io
+import time
+import zipfile
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only, non-seekable sink that collects written bytes until drained."""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+class ZipStreamWriter:
+    """Builds a zip archive incrementally so entries can be streamed as they finish.
+
+    Entries are stored uncompressed: the payloads are already-compressed images.
+    """
+
+    def __init__(self):
+        self._sink = _ChunkSink()
+        self._archive = zipfile.ZipFile(self._sink, mode="w", compression=zipfile.ZIP_STORED)
+
+    def add(self, name: str, buffer: io.BytesIO, chunk_size: int = 64 * 1024) -> None:
+        """Append an entry from an in-memory buffer (blocking: run off the event loop)."""
+        info = zipfile.ZipInfo(name, date_time=time.localtime()[:6])
+        info.compress_type = zipfile.ZIP_STORED
+        view = buffer.getbuffer()
+        try:
+            with self._archive.open(info, mode="w", force_zip64=len(view) > 0x7FFFFFFF) as entry:
+                for offset in range(0, len(view), chunk_size):
+                    entry.write(view[offset:offset + chunk_size])
+        finally:
+            view.release()
+
+    def add_bytes(self, name: str, data: bytes) -> None:
+        """Append a small entry such as a manifest."""
+        self._archive.writestr(zipfile.ZipInfo(name, date_time=time.localtime()[:6]), data)
+
+    def close(self) -> None:
+        """Write the central directory."""
+        self._archive.close()
+
+    def drain(self) -> bytes:
+        """Return archive bytes written since the last drain."""
+        return self._sink.drain()
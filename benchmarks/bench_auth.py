@@ -0,0 +1,135 @@
+"""Per-request authentication overhead: full JWT verification against the token cache and API keys.
+
+Replays a skewed stream of ``--calls`` authentications over ``--clients``
+distinct credentials, the way batch clients reuse one token for many
+calls, and reports the time per call. ``legacy`` is what every protected
+request did before: ``jwt.decode`` with its HMAC check. ``cached`` goes
+through ``AuthManager.authenticate``, so each token is verified on first
+sight and served from the verified-token cache after that; ``api_key``
+presents API keys, which are looked up by digest with no JWT at all.
+Both of the latter run with ``--revoked`` entries on the revocation list,
+which every call checks.
+
+First checks that revocations hold: a revoked token and a revoked API key
+are rejected, and the API key still is once the revocation list has been
+pruned after the token lifetime (API keys do not expire). ``--fake-redis``
+also runs this through the Redis backend against fakeredis (``pip install
+fakeredis lupa``). Exits non-zero when a check fails.
+
+    python -m benchmarks.bench_auth
+    python -m benchmarks.bench_auth --clients 50000 --calls 500000 --revoked 1000000 --fake-redis
+"""
+import argparse
+import asyncio
+import hashlib
+import random
+import secrets
+import sys
+import time
+from typing import Callable, List
+
+from app.config.settings import settings
+from app.core.auth import AuthManager, parse_api_keys, token_digest
+from app.models.exceptions import AuthenticationException
+from benchmarks.common import add_baseline_arguments, latency_summary, print_table, report_baseline
+
+def _stream(credentials: List[str], calls: int, seed: int = 0) -> List[str]:
+    rng = random.Random(seed)
+    # Every client is seen at least once, then a skewed tail of repeat calls
+    stream = list(credentials)
+    stream += [credentials[int(rng.paretovariate(1.2)) % len(credentials)]
+               for _ in range(max(0, calls - len(credentials)))]
+    return stream
+
+def _replay(check: Callable[[str], dict], stream: List[str]) -> List[float]:
+    clock = time.perf_counter
+    samples = []
+    for credential in stream:
+        started = clock()
+        check(credential)
+        samples.append(clock() - started)
+    return samples
+
+def _rejected(manager: AuthManager, credential: str) -> bool:
+    try:
+        manager.authenticate(credential)
+    except AuthenticationException:
+        return True
+    return False
+
+async def check_revocations(backend: str) -> List[str]:
+    """Revoke a token and an API key, prune the list after the token lifetime, and see what is rejected."""
+    manager = AuthManager()
+    if backend == "redis":
+        import fakeredis
+        manager.revocations.backend = "redis"
+        manager.revocations._redis = fakeredis.FakeAsyncRedis()
+    key = secrets.token_urlsafe(32)
+    manager.api_keys = parse_api_keys(f"client:{hashlib.sha256(key.encode()).hexdigest()}")
+    token = manager.issue_token("client")
+    failures = []
+    try:
+        for credential in (token, key):
+            await manager.revoke(credential, manager.authenticate(credential))
+        if not _rejected(manager, token) or not _rejected(manager, key):
+            failures.append(f"{backend}: revoked credential accepted")
+        # Long enough after revoking for every token revocation to have been pruned
+        await manager.revocations.sync(now=time.time() + settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60 + 1)
+        if not _rejected(manager, key):
+            failures.append(f"{backend}: revoked API key accepted again after the token lifetime")
+        if backend == "redis" and manager.revocations.redis_errors:
+            failures.append(f"{backend}: {manager.revocations.redis_errors} Redis error(s)")
+    finally:
+        await manager.revocations.close()
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=1000, help="distinct tokens (and API keys)")
+    parser.add_argument("--calls", type=int, default=200_000)
+    parser.add_argument("--revoked", type=int, default=100_000, help="entries on the revocation list")
+    parser.add_argument("--fake-redis", action="store_true", help="also check revocations through the Redis backend")
+    add_baseline_arguments(parser)
+    args = parser.parse_args()
+
+    failures = []
+    for backend in ("memory", "redis") if args.fake_redis else ("memory",):
+        failures += asyncio.run(check_revocations(backend))
+
+    manager = AuthManager()
+    tokens = [manager.create_access_token({"sub": f"client-{index}"}) for index in range(args.clients)]
+    keys = [secrets.token_urlsafe(32) for _ in range(args.clients)]
+    manager.api_keys = parse_api_keys(",".join(f"client-{index}:{hashlib.sha256(key.encode()).hexdigest()}"
+                                               for index, key in enumerate(keys)))
+    expires_at = time.time() + 3600
+
+    async def revoke_others():
+        for _ in range(args.revoked):
+            await manager.revocations.revoke(token_digest(secrets.token_urlsafe(16)), expires_at)
+
+    asyncio.run(revoke_others())
+
+    runs = {
+        "legacy": (manager.verify_token, _stream(tokens, args.calls)),
+        "cached": (manager.authenticate, _stream(tokens, args.calls)),
+        "api_key": (manager.authenticate, _stream(keys, args.calls))
+    }
+    rows = []
+    metrics = {}
+    for name, (check, stream) in runs.items():
+        samples = _replay(check, stream)
+        # latency_summary is unit-agnostic; fed microseconds, its "_ms" fields are microseconds
+        summary = latency_summary([sample * 1e6 for sample in samples])
+        rows.append([name, summary["p50_ms"], summary["p99_ms"], summary["mean_ms"], len(samples) / sum(samples)])
+        metrics[f"{name}.mean_us"] = summary["mean_ms"]
+
+    print(f"{args.clients} clients, {args.calls} calls, {args.revoked} revoked tokens; "
+          f"{manager.verified} verifications and {manager.cache_hits} cache hits in the cached run")
+    print_table(["path", "median us", "p99 us", "mean us", "calls/s"], rows)
+    if failures:
+        print(f"Revocation check failed: {'; '.join(failures)}", file=sys.stderr)
+        sys.exit(1)
+    report_baseline(args, metrics, {"clients": args.clients, "calls": args.calls, "revoked": args.revoked})
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Parity check and throughput benchmark for the inference backends.
+
+Loads the model once per backend, runs the sample images through
+``ModelManager.predict_masks`` and compares each backend's binary masks with
+the eager fp32 baseline (IoU at the 0.5 threshold). Then reports forward-pass
+throughput per batch size and the process RSS after loading. Exits non-zero
+when any backend's minimum IoU falls below ``--min-iou``, so it doubles as
+the backend parity test.
+
+Needs the model weights (``HF_TOKEN``); the onnx backend needs onnxruntime.
+
+    python -m benchmarks.bench_backends
+    python -m benchmarks.bench_backends --backends eager int8 --batch-sizes 1 4
+"""
+import argparse
+import asyncio
+import gc
+import glob
+import sys
+from typing import Dict, List
+
+import numpy as np
+from PIL import Image
+
+from app.config.settings import settings
+from app.core.inference_backends import BACKENDS
+from app.core.model_manager import ModelManager
+from benchmarks.common import current_rss_mb, print_table, time_call
+
+DEFAULT_IMAGES = "app/images/*.jpg"
+
+def mask_iou(a: np.ndarray, b: np.ndarray, threshold: float = 0.5) -> float:
+    """Intersection over union of two probability masks after thresholding."""
+    a = a > threshold
+    b = b > threshold
+    union = np.logical_or(a, b).sum()
+    return 1.0 if union == 0 else float(np.logical_and(a, b).sum() / union)
+
+def load_images(pattern: str) -> List[Image.Image]:
+    """Sample images, pre-resized to the model input so timings cover the backend."""
+    paths = sorted(glob.glob(pattern))
+    if not paths:
+        raise SystemExit(f"No images match {pattern}")
+    size = (settings.MODEL_INPUT_SIZE, settings.MODEL_INPUT_SIZE)
+    return [Image.open(path).convert("RGB").resize(size, Image.Resampling.BILINEAR) for path in paths]
+
+def run_backend(name: str, images: List[Image.Image], batch_sizes: List[int], repeat: int) -> Dict:
+    manager = ModelManager(backend=name)
+    asyncio.run(manager.load_model())
+    rss = current_rss_mb()
+
+    masks = [manager.predict_masks([image])[0] for image in images]
+
+    throughput = {}
+    for batch_size in batch_sizes:
+        batch = [images[i % len(images)] for i in range(batch_size)]
+        timing = time_call(lambda: manager.predict_masks(batch), repeat=repeat)
+        throughput[batch_size] = batch_size / (timing["median_ms"] / 1000)
+
+    manager.unload_model()
+    del manager
+    gc.collect()
+    return {"masks": masks, "throughput": throughput, "rss_mb": rss}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=list(BACKENDS))
+    parser.add_argument("--images", default=DEFAULT_IMAGES, help="glob of sample images")
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[1, 4])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--min-iou", type=float, default=0.95)
+    args = parser.parse_args()
+
+    images = load_images(args.images)
+    # The eager backend is the fp32 reference for the parity check
+    names = ["eager"] + [name for name in args.backends if name != "eager"]
+
+    results = {}
+    for name in names:
+        try:
+            results[name] = run_backend(name, images, args.batch_sizes, args.repeat)
+        except Exception as e:
+            print(f"{name}: failed to run ({e})", file=sys.stderr)
+
+    if "eager" not in results:
+        raise SystemExit("The eager baseline failed; nothing to compare against")
+
+    rows = []
+    failed = []
+    baseline = results["eager"]["masks"]
+    for name, result in results.items():
+        ious = [mask_iou(ref, mask) for ref, mask in zip(baseline, result["masks"])]
+        if min(ious) < args.min_iou:
+            failed.append(name)
+        rows.append(
+            [name, min(ious), float(np.mean(ious))]
+            + [result["throughput"][size] for size in args.batch_sizes]
+            + [result["rss_mb"]]
+        )
+
+    print(f"{len(images)} images, parity threshold IoU >= {args.min_iou}")
+    print_table(
+        ["backend", "min IoU", "mean IoU"]
+        + [f"img/s @{size}" for size in args.batch_sizes]
+        + ["RSS MB"],
+        rows
+    )
+    if failed:
+        print(f"Parity check failed for: {', '.join(failed)}", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Encode time against output size for every format and preset.
+
+Encodes a photo-like cutout (see ``benchmarks.common.make_upload``) with
+each ``EncodePreset`` per output format and reports the median time, the
+output size and the size relative to the "balanced" preset. Also compares
+the JPEG alpha flatten against the original white canvas + ``paste``.
+
+    python -m benchmarks.bench_encoding
+    python -m benchmarks.bench_encoding --sizes 4000x3000 --repeat 3
+"""
+import argparse
+import io
+
+from PIL import Image
+
+from app.models.schemas import EncodePreset, ImageFormat
+from app.services.postprocessing import compose_cutout, flatten_cutout, mask_to_alpha, render_cutout
+from benchmarks.bench_postprocessing import make_inputs
+from benchmarks.common import make_upload, print_table, time_call
+
+SIZES = ["1920x1080", "4000x3000"]
+
+def legacy_flatten(image: Image.Image, alpha) -> Image.Image:
+    """The original JPEG path: RGBA cutout, then a white canvas pasted through its alpha."""
+    cutout = compose_cutout(image, alpha)
+    background = Image.new("RGB", cutout.size, (255, 255, 255))
+    background.paste(cutout, mask=cutout.split()[-1])
+    return background
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--sizes", nargs="+", default=SIZES, help="image sizes as WIDTHxHEIGHT")
+    args = parser.parse_args()
+
+    encode_rows = []
+    flatten_rows = []
+    for size in args.sizes:
+        width, height = (int(value) for value in size.split("x"))
+        image = Image.open(io.BytesIO(make_upload(width, height, seed=0)))
+        image.load()
+        alpha = mask_to_alpha(make_inputs(width, height)[1], image.size)
+
+        for output_format in ImageFormat:
+            balanced = render_cutout(image, alpha, output_format, EncodePreset.BALANCED).getbuffer().nbytes
+            for preset in EncodePreset:
+                timing = time_call(lambda: render_cutout(image, alpha, output_format, preset), repeat=args.repeat)
+                nbytes = render_cutout(image, alpha, output_format, preset).getbuffer().nbytes
+                encode_rows.append([size, output_format.value, preset.value, timing["median_ms"],
+                                    nbytes / 1024, f"{nbytes / balanced:.2f}x"])
+
+        for name, func in (("legacy", legacy_flatten), ("vectorized", flatten_cutout)):
+            timing = time_call(lambda: func(image, alpha), repeat=args.repeat)
+            flatten_rows.append([size, name, timing["median_ms"]])
+
+    print_table(["size", "format", "preset", "median ms", "KB", "vs balanced"], encode_rows)
+    print()
+    print_table(["size", "JPEG flatten", "median ms"], flatten_rows)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""End-to-end load test of the API with a stub segmentation model.
+
+Starts the app in-process (its real lifespan, middleware, batching and
+postprocessing) with the deterministic model from ``benchmarks.stub_model``,
+so it runs offline with no Hugging Face download, and drives concurrent
+uploads of several image sizes through ``/api/remove-background``. Reports
+p50/p95/p99 latency, throughput, errors, peak RSS and the mean per-stage
+times from the ``Server-Timing`` headers, overall and per size.
+
+Results can be saved as a JSON baseline and later runs compared against it;
+a comparison exits 1 when a metric regressed beyond ``--tolerance``.
+
+    python -m benchmarks.bench_load
+    python -m benchmarks.bench_load --requests 400 --concurrency 16 --sizes 1920x1080 4000x3000
+    python -m benchmarks.bench_load --save-baseline benchmarks/load.json
+    python -m benchmarks.bench_load --baseline benchmarks/load.json
+
+Needs ``httpx`` (already required by FastAPI's test client).
+"""
+import argparse
+import asyncio
+import logging
+import os
+import tempfile
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+from benchmarks.common import (add_baseline_arguments, current_rss_mb, latency_summary, make_upload,
+                               peak_rss_mb, print_table, report_baseline, reset_peak_rss)
+
+SIZES = ["640x480", "1920x1080", "4000x3000"]
+
+def configure_environment(args, scratch: str) -> None:
+    """Settings are read at import time, so the app is configured before it is imported."""
+    os.environ.update({
+        "INFERENCE_MODE": "local",
+        "MODEL_OFFLINE": "true",
+        "INFERENCE_ARTIFACT_DIR": os.path.join(scratch, "artifacts"),
+        "RATE_LIMIT_BACKEND": "memory",
+        "RATE_LIMIT_REQUESTS": str(10 ** 9),
+        "MASK_CACHE_ENABLED": "true" if args.cache else "false",
+        "MASK_CACHE_REDIS": "false",
+        "JOB_QUEUE_BACKEND": "sqlite",
+        "JOB_SQLITE_PATH": os.path.join(scratch, "jobs.db"),
+        "JOB_STORAGE_DIR": os.path.join(scratch, "jobs"),
+        "INFERENCE_MAX_IN_FLIGHT": str(max(args.concurrency * 2, 32))
+    })
+
+def parse_server_timing(header: str) -> Dict[str, float]:
+    timings = {}
+    for entry in filter(None, (part.strip() for part in header.split(","))):
+        name, _, duration = entry.partition(";dur=")
+        if duration:
+            timings[name] = float(duration)
+    return timings
+
+async def run_load(args) -> Dict:
+    import httpx
+
+    from app.core.auth import auth_manager
+    from app.core.startup import startup_state
+    from app.main import app
+    from benchmarks.stub_model import install_stub_model
+
+    install_stub_model()
+    # Per-request INFO logs would dominate the profile of a load run
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    uploads = {
+        size: [make_upload(*map(int, size.split("x")), seed=seed) for seed in range(args.variants)]
+        for size in args.sizes
+    }
+    token = auth_manager.create_access_token({"sub": "bench"})
+    params = {"output_format": args.output_format, "mask_mode": args.mask_mode, "output": args.output}
+
+    async with app.router.lifespan_context(app):
+        load_started = time.perf_counter()
+        await startup_state.wait()
+        startup_seconds = time.perf_counter() - load_started
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None,
+                                     headers={"Authorization": f"Bearer {token}"}) as client:
+
+            async def upload(index: int):
+                size = args.sizes[index % len(args.sizes)]
+                data = uploads[size][(index // len(args.sizes)) % args.variants]
+                started = time.perf_counter()
+                response = await client.post(
+                    "/api/remove-background", params=params,
+                    files={"file": ("photo.jpg", data, "image/jpeg")}
+                )
+                latency_ms = (time.perf_counter() - started) * 1000
+                return size, response.status_code, latency_ms, response.headers.get("Server-Timing", "")
+
+            # Warm-up: one request per size, excluded from the results
+            await asyncio.gather(*(upload(index) for index in range(len(args.sizes))))
+            rss_before = current_rss_mb()
+            reset_peak_rss()
+
+            pending = iter(range(args.requests))
+            outcomes = []
+
+            async def client_worker():
+                for index in pending:
+                    outcomes.append(await upload(index))
+
+            started = time.perf_counter()
+            await asyncio.gather(*(client_worker() for _ in range(args.concurrency)))
+            elapsed = time.perf_counter() - started
+
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    stages: Dict[str, List[float]] = defaultdict(list)
+    errors = 0
+    megapixels = 0.0
+    for size, status, latency_ms, server_timing in outcomes:
+        if status != 200:
+            errors += 1
+            continue
+        latencies[size].append(latency_ms)
+        width, height = map(int, size.split("x"))
+        megapixels += width * height / 1e6
+        for stage, duration in parse_server_timing(server_timing).items():
+            stages[stage].append(duration)
+
+    return {
+        "elapsed": elapsed,
+        "startup_seconds": startup_seconds,
+        "errors": errors,
+        "megapixels": megapixels,
+        "latencies": latencies,
+        "stages": {stage: sum(values) / len(values) for stage, values in stages.items()},
+        "rss_before_mb": rss_before,
+        "peak_rss_mb": peak_rss_mb()
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--sizes", nargs="+", default=SIZES, help="upload sizes as WIDTHxHEIGHT")
+    parser.add_argument("--variants", type=int, default=4, help="distinct images per size")
+    parser.add_argument("--output-format", default="png", choices=["png", "jpeg", "webp"])
+    parser.add_argument("--mask-mode", default="binary", choices=["binary", "soft", "refined"])
+    parser.add_argument("--output", default="cutout", choices=["cutout", "mask", "rle", "bbox"])
+    parser.add_argument("--cache", action="store_true", help="keep the mask cache on (repeats become hits)")
+    add_baseline_arguments(parser)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="rmbg-bench-") as scratch:
+        configure_environment(args, scratch)
+        result = asyncio.run(run_load(args))
+
+    overall = latency_summary([value for values in result["latencies"].values() for value in values])
+    completed = sum(len(values) for values in result["latencies"].values())
+    throughput = completed / result["elapsed"]
+
+    rows = [["all", completed, overall["p50_ms"], overall["p95_ms"], overall["p99_ms"], overall["max_ms"]]]
+    metrics = {
+        "all.p50_ms": overall["p50_ms"],
+        "all.p95_ms": overall["p95_ms"],
+        "all.p99_ms": overall["p99_ms"],
+        "throughput.requests_per_s": throughput,
+        "throughput.megapixels_per_s": result["megapixels"] / result["elapsed"],
+        "memory.peak_rss_mb": result["peak_rss_mb"]
+    }
+    for size in args.sizes:
+        summary = latency_summary(result["latencies"][size])
+        rows.append([size, len(result["latencies"][size]), summary["p50_ms"], summary["p95_ms"],
+                     summary["p99_ms"], summary["max_ms"]])
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            metrics[f"{size}.{key}"] = summary[key]
+
+    print_table(["size", "ok", "p50 ms", "p95 ms", "p99 ms", "max ms"], rows)
+    print()
+    print_table(["stage", "mean ms"], [[stage, mean] for stage, mean in sorted(result["stages"].items())])
+    print()
+    print(f"{completed} ok, {result['errors']} errors in {result['elapsed']:.2f}s at concurrency "
+          f"{args.concurrency}: {throughput:.2f} req/s, {metrics['throughput.megapixels_per_s']:.2f} MP/s")
+    print(f"startup {result['startup_seconds']:.2f}s, RSS {result['rss_before_mb']:.0f}MB before load, "
+          f"peak {result['peak_rss_mb']:.0f}MB")
+
+    config = {key: getattr(args, key) for key in
+              ("requests", "concurrency", "sizes", "variants", "output_format", "mask_mode", "output", "cache")}
+    report_baseline(args, metrics, config)
+    if result["errors"]:
+        raise SystemExit(f"{result['errors']} requests failed")
+
+if __name__ == "__main__":
+    main()
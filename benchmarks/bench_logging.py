@@ -0,0 +1,113 @@
+"""Per-request cost of logging on the calling thread, synchronous handlers against the queue.
+
+Each simulated request logs what the API logs for one request: a
+structured access record (user, sizes, stage timings) and one message
+with arguments. ``sync`` is the previous setup, a stream and a file handler
+formatting and writing on the caller; the ``queue`` variants only enqueue,
+and a listener thread formats and writes. Reports caller-side latency per
+request (the event loop's cost) and how long the listener then needed to
+drain the queue.
+
+    python -m benchmarks.bench_logging
+    python -m benchmarks.bench_logging --requests 50000 --sample-rate 10
+"""
+import argparse
+import logging
+import logging.handlers
+import os
+import queue
+import tempfile
+import time
+
+from app.core.logging_setup import (
+    SAMPLED, JsonFormatter, NonBlockingQueueHandler, SuccessSampler, TextFormatter
+)
+from benchmarks.common import add_baseline_arguments, latency_summary, print_table, report_baseline
+
+FIELDS = {
+    "trace_id": "3a05564dbd1d9cf22a35c843b19be2f6", "request": "remove_background", "duration_ms": 412.7,
+    "output_format": "png", "mask_mode": "binary", "output": "cutout", "model": "default", "user": "user-17",
+    "original_size": "1920x1080", "output_bytes": 1843211, "cache": "MISS",
+    "stages": {"header": 0.4, "digest": 1.2, "cache": 0.02, "decode": 21.3, "batch_wait": 9.8,
+               "preprocess": 48.1, "inference": 260.4, "postprocess": 22.6, "encode": 48.7}
+}
+
+def make_outputs(directory: str, formatter: logging.Formatter):
+    # A file stands in for stdout so the terminal's speed does not skew the result
+    outputs = [
+        logging.StreamHandler(open(os.path.join(directory, "stdout.log"), "w")),
+        logging.handlers.RotatingFileHandler(os.path.join(directory, "app.log"),
+                                             maxBytes=50 * 1024 * 1024, backupCount=2)
+    ]
+    for output in outputs:
+        output.setFormatter(formatter)
+    return outputs
+
+def run_case(name: str, requests: int, sample_rate: int, directory: str):
+    json_output = name.endswith("json")
+    formatter = JsonFormatter() if json_output else TextFormatter()
+    outputs = make_outputs(directory, formatter)
+    logger = logging.getLogger(f"bench.{name}")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+
+    listener = None
+    if name.startswith("queue"):
+        log_queue = queue.Queue(requests * 2 + 1)
+        handler = NonBlockingQueueHandler(log_queue)
+        handler.addFilter(SuccessSampler(sample_rate))
+        logger.addHandler(handler)
+        listener = logging.handlers.QueueListener(log_queue, *outputs, respect_handler_level=True)
+        listener.start()
+    else:
+        for output in outputs:
+            logger.addHandler(output)
+
+    samples = []
+    started = time.perf_counter()
+    for index in range(requests):
+        call_started = time.perf_counter()
+        logger.info("Queued job %s (priority=%d)", FIELDS["trace_id"], index % 10)
+        logger.info("request", extra={"fields": FIELDS, **SAMPLED})
+        samples.append((time.perf_counter() - call_started) * 1000)
+    emitted = time.perf_counter()
+    if listener is not None:
+        listener.stop()
+    drained = time.perf_counter()
+
+    for handler in logger.handlers + outputs:
+        handler.close()
+    logger.handlers = []
+    summary = latency_summary(samples)
+    return {
+        "p50_us": summary["p50_ms"] * 1000,
+        "p99_us": summary["p99_ms"] * 1000,
+        "max_us": summary["max_ms"] * 1000,
+        "emit_s": emitted - started,
+        "drain_s": drained - emitted
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--sample-rate", type=int, default=10,
+                        help="LOG_SUCCESS_SAMPLE_RATE for the sampled case")
+    add_baseline_arguments(parser)
+    args = parser.parse_args()
+
+    cases = [("sync_text", 1), ("queue_text", 1), ("queue_json", 1), ("queue_json_sampled", args.sample_rate)]
+    rows = []
+    results = {}
+    for name, sample_rate in cases:
+        with tempfile.TemporaryDirectory() as directory:
+            result = run_case(name, args.requests, sample_rate, directory)
+        rows.append([name, sample_rate, result["p50_us"], result["p99_us"], result["max_us"],
+                     result["emit_s"], result["drain_s"]])
+        results[f"{name}.p50_us"] = result["p50_us"]
+        results[f"{name}.p99_us"] = result["p99_us"]
+
+    print_table(["handler", "sample 1/N", "p50 us", "p99 us", "max us", "caller s", "listener drain s"], rows)
+    report_baseline(args, results, {"requests": args.requests, "sample_rate": args.sample_rate})
+
+if __name__ == "__main__":
+    main()
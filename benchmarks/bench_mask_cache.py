@@ -0,0 +1,174 @@
+"""Mask cache tiers: in-process LRU hits, Redis hits and misses, with the Redis tier in fakeredis.
+
+First checks the Redis tier against an in-process fakeredis (``pip install
+fakeredis lupa``): packed masks survive the round trip, a mask another
+process stored is a Redis hit after an LRU miss and is then promoted into
+the LRU, and with Redis down the cache keeps serving from the LRU and counts
+the errors. Then measures ``MaskCache.get`` per tier and the packed size of
+``--size`` masks. Exits non-zero when a check fails.
+
+    python -m benchmarks.bench_mask_cache
+    python -m benchmarks.bench_mask_cache --size 2048 --lookups 2000
+"""
+import argparse
+import asyncio
+import logging
+import sys
+import time
+from typing import List
+
+import numpy as np
+
+from app.core.result_cache import MaskCache, _pack_alpha, _unpack_alpha
+from benchmarks.common import latency_summary, print_table
+
+def make_mask(width: int, height: int, seed: int) -> np.ndarray:
+    """A matte-like mask: an opaque blob with a soft edge on a transparent background."""
+    rng = np.random.default_rng(seed)
+    ys, xs = np.mgrid[0:height, 0:width].astype(np.float32)
+    cx, cy = width * rng.uniform(0.35, 0.65), height * rng.uniform(0.35, 0.65)
+    radius = min(width, height) * rng.uniform(0.2, 0.35)
+    distance = np.sqrt((xs - cx) ** 2 + (ys - cy) ** 2)
+    return (np.clip((radius - distance) / 4 + 0.5, 0, 1) * 255).astype(np.uint8)
+
+def fake_cache(server=None, **fake_options) -> MaskCache:
+    """A cache with its Redis tier in fakeredis; caches given the same ``server`` share it."""
+    import fakeredis
+
+    cache = MaskCache()
+    cache.enabled = True
+    cache.use_redis = True
+    cache._redis = fakeredis.FakeAsyncRedis(server=server, **fake_options)
+    return cache
+
+def check_round_trip() -> List[str]:
+    failures = []
+    for height, width in ((1, 1), (1, 257), (333, 1), (480, 640), (1023, 769)):
+        alpha = make_mask(width, height, seed=height)
+        unpacked = _unpack_alpha(_pack_alpha(alpha))
+        if unpacked.dtype != np.uint8 or unpacked.shape != alpha.shape or not np.array_equal(unpacked, alpha):
+            failures.append(f"round trip: {height}x{width} mask came back {unpacked.dtype} {unpacked.shape}")
+    return failures
+
+async def check_redis_hit() -> List[str]:
+    """A mask stored by one process is a Redis hit in another, then an LRU hit there."""
+    import fakeredis
+
+    server = fakeredis.FakeServer()
+    writer, reader = fake_cache(server), fake_cache(server)
+    alpha = make_mask(320, 240, seed=1)
+    key = MaskCache.make_key("digest", model="test")
+    failures = []
+    try:
+        await writer.set(key, alpha)
+        ttl = await writer._redis.ttl(f"mask:{key}")
+        if not 0 < ttl <= writer.redis_ttl:
+            failures.append(f"redis hit: stored mask has TTL {ttl}s")
+
+        first = await reader.get(key)
+        if first is None or not np.array_equal(first, alpha):
+            failures.append("redis hit: LRU miss did not return the mask from Redis")
+        if (reader.redis_hits, reader.hits, reader.misses) != (1, 0, 0):
+            failures.append(f"redis hit: counted {reader.get_stats()}")
+
+        # Promoted: gone from Redis, the next lookup is still served by the LRU
+        await reader._redis.delete(f"mask:{key}")
+        second = await reader.get(key)
+        if second is None or not np.array_equal(second, alpha) or reader.hits != 1:
+            failures.append("redis hit: mask was not promoted into the LRU")
+        if reader.redis_errors or writer.redis_errors:
+            failures.append(f"redis hit: {reader.redis_errors + writer.redis_errors} Redis error(s)")
+    finally:
+        await writer.close()
+        await reader.close()
+    return failures
+
+async def check_fallback() -> List[str]:
+    """With Redis down, masks are stored and served by the LRU and each failure is counted."""
+    cache = fake_cache(connected=False)
+    alpha = make_mask(320, 240, seed=2)
+    key = MaskCache.make_key("digest", model="test")
+    # Every Redis call logs the expected failure
+    cache_logger = logging.getLogger("app.core.result_cache")
+    level = cache_logger.level
+    cache_logger.setLevel(logging.ERROR)
+    failures = []
+    try:
+        await cache.set(key, alpha)
+        cached = await cache.get(key)
+        missing = await cache.get(MaskCache.make_key("other", model="test"))
+    finally:
+        cache_logger.setLevel(level)
+        await cache.close()
+    if cached is None or not np.array_equal(cached, alpha) or cache.hits != 1:
+        failures.append("fallback: stored mask was not served from the LRU")
+    if missing is not None or cache.misses != 1:
+        failures.append("fallback: unknown key was not a miss")
+    # One failed store, one failed lookup for the miss; the LRU hit never asks Redis
+    if cache.redis_errors != 2:
+        failures.append(f"fallback: {cache.redis_errors} Redis errors counted, expected 2")
+    return failures
+
+async def measure(size: int, lookups: int) -> List[List]:
+    cache = fake_cache()
+    masks = [make_mask(size, size, seed) for seed in range(8)]
+    keys = [MaskCache.make_key(f"digest-{seed}", model="test") for seed in range(len(masks))]
+    for key, alpha in zip(keys, masks):
+        await cache.set(key, alpha)
+
+    async def timed(before=None) -> List[float]:
+        samples = []
+        for index in range(lookups):
+            key = keys[index % len(keys)]
+            if before is not None:
+                await before(key)
+            started = time.perf_counter()
+            await cache.get(key)
+            samples.append((time.perf_counter() - started) * 1000)
+        return samples
+
+    async def forget(key):
+        # Misses store nothing, so the key may already be gone
+        alpha = cache._entries.pop(key, None)
+        if alpha is not None:
+            cache.current_bytes -= alpha.nbytes
+
+    async def forget_everywhere(key):
+        await forget(key)
+        await cache._redis.delete(f"mask:{key}")
+
+    try:
+        runs = {
+            "lru": await timed(),
+            "redis": await timed(before=forget),
+            "miss": await timed(before=forget_everywhere)
+        }
+    finally:
+        await cache.close()
+
+    packed = sum(len(_pack_alpha(alpha)) for alpha in masks) / len(masks)
+    rows = []
+    for name, samples in runs.items():
+        summary = latency_summary(samples)
+        rows.append([name, summary["p50_ms"], summary["p99_ms"], packed / 1024 if name == "redis" else "-"])
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=1024, help="mask width and height")
+    parser.add_argument("--lookups", type=int, default=500)
+    args = parser.parse_args()
+
+    failures = check_round_trip()
+    failures += asyncio.run(check_redis_hit())
+    failures += asyncio.run(check_fallback())
+
+    rows = asyncio.run(measure(args.size, args.lookups))
+    print(f"{args.size}x{args.size} masks ({args.size * args.size / 1024:.0f} KB raw), {args.lookups} lookups per tier")
+    print_table(["tier", "median ms", "p99 ms", "packed KB"], rows)
+    if failures:
+        print(f"Mask cache check failed: {'; '.join(failures)}", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""Latency cost of each mask postprocessing mode.
+
+Times ``mask_to_alpha`` for the binary, soft and refined modes on a
+1024x1024 model mask upsampled to several output sizes, so per-tier
+defaults can be chosen from the per-megapixel cost.
+
+    python -m benchmarks.bench_mask_modes
+"""
+import argparse
+
+from app.models.schemas import MaskMode
+from app.services.postprocessing import mask_to_alpha
+from benchmarks.bench_postprocessing import SIZES, make_inputs
+from benchmarks.common import print_table, time_call
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rows = []
+    for width, height in SIZES:
+        image, mask = make_inputs(width, height)
+        image.load()
+        megapixels = width * height / 1e6
+        baseline = None
+        for mode in MaskMode:
+            timing = time_call(
+                lambda: mask_to_alpha(mask, image.size, mode=mode, guide=image),
+                repeat=args.repeat
+            )
+            baseline = baseline or timing["median_ms"]
+            rows.append([
+                f"{width}x{height}", mode.value, timing["median_ms"],
+                timing["median_ms"] / megapixels, timing["median_ms"] / baseline
+            ])
+
+    print_table(["size", "mode", "median ms", "ms/MP", "x binary"], rows)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Response size and latency of the mask-only outputs against the RGBA cutout.
+
+For each size, times what happens after the mask is known: the cutout
+path decodes the full-resolution upload, composites and encodes it, while
+``output=mask|rle|bbox`` work from the alpha alone. Reports the median time
+and the response size of each output.
+
+    python -m benchmarks.bench_output_modes
+    python -m benchmarks.bench_output_modes --sizes 4000x3000 --format webp
+"""
+import argparse
+import io
+
+from app.models.schemas import EncodePreset, ImageFormat, OutputMode
+from app.services.file_validator import FileValidator
+from app.services.mask_output import render_mask_output
+from app.services.postprocessing import mask_to_alpha, render_cutout
+from benchmarks.bench_postprocessing import make_inputs
+from benchmarks.common import make_upload, print_table, time_call
+
+SIZES = ["1024x768", "1920x1080", "4000x3000"]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--sizes", nargs="+", default=SIZES, help="image sizes as WIDTHxHEIGHT")
+    parser.add_argument("--format", default="png", choices=["png", "webp"])
+    parser.add_argument("--preset", default="balanced", choices=[preset.value for preset in EncodePreset])
+    args = parser.parse_args()
+    output_format = ImageFormat(args.format)
+    preset = EncodePreset(args.preset)
+
+    rows = []
+    for size in args.sizes:
+        width, height = (int(value) for value in size.split("x"))
+        upload = io.BytesIO(make_upload(width, height, seed=0))
+        alpha = mask_to_alpha(make_inputs(width, height)[1], (width, height))
+
+        def cutout():
+            return render_cutout(FileValidator._load(upload, None), alpha, output_format, preset)
+
+        outputs = {OutputMode.CUTOUT: cutout}
+        for output in (OutputMode.MASK, OutputMode.RLE, OutputMode.BBOX):
+            outputs[output] = lambda output=output: render_mask_output(alpha, output, output_format, preset)
+
+        baseline = None
+        for output, func in outputs.items():
+            timing = time_call(func, repeat=args.repeat)
+            nbytes = func().getbuffer().nbytes
+            baseline = baseline or (timing["median_ms"], nbytes)
+            rows.append([size, output.value, timing["median_ms"], f"{baseline[0] / timing['median_ms']:.1f}x",
+                         nbytes / 1024, f"{nbytes / baseline[1]:.3f}"])
+
+    print_table(["size", "output", "median ms", "speedup", "KB", "size vs cutout"], rows)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Micro-benchmark for mask postprocessing and compositing.
+
+Compares the original copy-heavy postprocessing (sigmoid, clip, uint8/bool
+round trips, scipy morphology, PIL LANCZOS resize, Image.new + paste)
+against the current ``app.services.postprocessing`` pipeline. Reports time per megapixel and
+the peak RSS increase of one call, measured in a fresh process.
+
+    python -m benchmarks.bench_postprocessing
+"""
+import argparse
+
+import numpy as np
+from PIL import Image
+from scipy import ndimage
+
+from app.services.postprocessing import apply_mask
+from benchmarks.common import peak_memory_delta_mb, print_table, time_call
+
+SIZES = [(1024, 1024), (2048, 1536), (4000, 3000), (6000, 4000)]
+MASK_SHAPE = (1024, 1024)
+
+def legacy_apply_mask(image: Image.Image, mask: np.ndarray) -> Image.Image:
+    """The postprocessing that used to live in ModelManager.process_image."""
+    if mask.min() < 0 or mask.max() > 1:
+        mask = 1 / (1 + np.exp(-mask))
+    mask = np.clip(mask, 0, 1)
+    binary_mask = (mask > 0.5).astype(np.uint8) * 255
+    binary_mask = ndimage.binary_fill_holes(binary_mask > 127)
+    binary_mask = binary_mask.astype(np.uint8) * 255
+    binary_mask = ndimage.binary_opening(binary_mask > 127, iterations=1).astype(np.uint8) * 255
+    mask_img = Image.fromarray(binary_mask)
+    mask_img = mask_img.resize(image.size, Image.Resampling.LANCZOS)
+    result = Image.new("RGBA", image.size, (0, 0, 0, 0))
+    if image.mode != "RGBA":
+        image = image.convert("RGBA")
+    result.paste(image, mask=mask_img)
+    return result
+
+IMPLEMENTATIONS = {"legacy": legacy_apply_mask, "current": apply_mask}
+
+def make_inputs(width: int, height: int):
+    """Synthetic RGB image and a blob-shaped probability mask with holes."""
+    ys, xs = np.mgrid[0:height, 0:width]
+    pixels = np.stack([(xs % 256), (ys % 256), ((xs + ys) % 256)], axis=-1).astype(np.uint8)
+    image = Image.fromarray(pixels)
+
+    my, mx = np.mgrid[-1:1:MASK_SHAPE[0] * 1j, -1:1:MASK_SHAPE[1] * 1j]
+    logits = 8 * (0.6 - np.sqrt(mx ** 2 + my ** 2))
+    logits[::97, ::89] = -8
+    mask = (1 / (1 + np.exp(-logits))).astype(np.float32)
+    return image, mask
+
+def _measure(name: str, width: int, height: int, measure: bool = False, state=None):
+    if not measure:
+        image, mask = make_inputs(width, height)
+        image.load()
+        return image, mask
+    image, mask = state
+    IMPLEMENTATIONS[name](image, mask)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--no-memory", action="store_true", help="skip the peak RSS runs")
+    args = parser.parse_args()
+
+    rows = []
+    for width, height in SIZES:
+        image, mask = make_inputs(width, height)
+        megapixels = width * height / 1e6
+        for name, func in IMPLEMENTATIONS.items():
+            timing = time_call(lambda: func(image, mask), repeat=args.repeat)
+            peak = float("nan") if args.no_memory else peak_memory_delta_mb(_measure, name, width, height)
+            rows.append([
+                f"{width}x{height}", name, timing["median_ms"],
+                timing["median_ms"] / megapixels, peak
+            ])
+
+    print_table(["size", "impl", "median ms", "ms/MP", "peak +MB"], rows)
+
+if __name__ == "__main__":
+    main()
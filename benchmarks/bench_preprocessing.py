@@ -0,0 +1,95 @@
+"""Per-image preprocessing time and allocations, image processor against the native path.
+
+``processor`` is a transformers image processor configured like the RMBG
+one (1024x1024 bilinear resize, ImageNet normalisation), or the model's own
+``AutoProcessor`` with ``--processor`` (a local directory or a cached
+repository). ``native`` is ``app.core.preprocessing.Preprocessor`` filling
+its reusable batch tensor, ``native_cl`` the same in channels-last layout.
+Allocations are the tracemalloc peak per batch, which covers the NumPy
+intermediates the processor creates; the native path's only allocation
+is the resized image. Also reports the largest difference from the
+processor's output.
+
+    python -m benchmarks.bench_preprocessing
+    python -m benchmarks.bench_preprocessing --batch-sizes 1 8 --processor /models/rmbg-2.0
+"""
+import argparse
+import tracemalloc
+
+import numpy as np
+from PIL import Image
+
+from app.config.settings import settings
+from app.core.preprocessing import Preprocessor
+from benchmarks.common import add_baseline_arguments, print_table, report_baseline, time_call
+
+IMAGENET_MEAN = [0.485, 0.456, 0.406]
+IMAGENET_STD = [0.229, 0.224, 0.225]
+# Inputs arrive as reduced-scale draft decodes of the upload, so they are near the model size
+SIZES = ["1024x768", "1600x1200"]
+
+def load_processor(path: str):
+    if path:
+        from transformers import AutoProcessor
+        return AutoProcessor.from_pretrained(path, trust_remote_code=True, local_files_only=True)
+    from transformers import ViTImageProcessor
+    size = settings.MODEL_INPUT_SIZE
+    return ViTImageProcessor(size={"height": size, "width": size}, image_mean=IMAGENET_MEAN,
+                             image_std=IMAGENET_STD, resample=Image.Resampling.BILINEAR)
+
+def run_processor(processor, images):
+    inputs = processor(images, return_tensors="pt")
+    return inputs["pixel_values"] if "pixel_values" in inputs else inputs["images"]
+
+def peak_allocation_mb(func) -> float:
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1] / 1e6
+    finally:
+        tracemalloc.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--sizes", nargs="+", default=SIZES, help="input sizes as WIDTHxHEIGHT")
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[1, 8])
+    parser.add_argument("--processor", default="", help="load this AutoProcessor instead of the stand-in")
+    add_baseline_arguments(parser)
+    args = parser.parse_args()
+
+    processor = load_processor(args.processor)
+    paths = {
+        "processor": lambda images: run_processor(processor, images),
+        "native": Preprocessor.from_processor(processor),
+        "native_cl": Preprocessor.from_processor(processor, channels_last=True)
+    }
+    if paths["native"] is None:
+        raise SystemExit(f"{type(processor).__name__} does not expose its resize and normalisation settings")
+
+    generator = np.random.default_rng(0)
+    rows = []
+    results = {}
+    for size in args.sizes:
+        width, height = (int(value) for value in size.split("x"))
+        for batch_size in args.batch_sizes:
+            images = [Image.fromarray(generator.integers(0, 256, (height, width, 3), dtype=np.uint8))
+                      for _ in range(batch_size)]
+            expected = run_processor(processor, images).float()
+            baseline = None
+            for name, func in paths.items():
+                timing = time_call(lambda: func(images), repeat=args.repeat)
+                per_image = timing["median_ms"] / batch_size
+                baseline = baseline or per_image
+                difference = float((func(images).cpu().float() - expected).abs().max())
+                allocated = peak_allocation_mb(lambda: func(images)) / batch_size
+                rows.append([size, batch_size, name, per_image, f"{baseline / per_image:.1f}x",
+                             allocated, f"{difference:.1e}"])
+                results[f"{name}.{size}.b{batch_size}.ms_per_image"] = per_image
+
+    print_table(["input", "batch", "path", "ms/image", "speedup", "alloc MB/image", "max diff"], rows)
+    report_baseline(args, results, {"sizes": args.sizes, "batch_sizes": args.batch_sizes,
+                                    "processor": args.processor or "stand-in"})
+
+if __name__ == "__main__":
+    main()
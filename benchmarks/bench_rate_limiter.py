@@ -0,0 +1,198 @@
+"""Load benchmark for the rate limiter backends at many distinct users.
+
+Replays a random stream of checks over ``--users`` distinct identifiers and
+reports per-check latency (median, p99) and the memory held by the limiter
+state afterwards. The original list-of-timestamps limiter is included for
+comparison. Pass ``--redis-url`` to also measure the Redis Lua backend
+(sequential round trips, so this mostly measures network latency).
+
+``--fake-redis`` runs the Lua scripts in an in-process fakeredis (``pip
+install fakeredis lupa``) instead of a server: it first checks that each
+script allows exactly the limit, keeps keys apart, sets an expiry and
+refills, and that ``RateLimiter`` keeps limiting with the in-process
+limiter when Redis raises, then measures the scripts without network
+latency. Exits non-zero when a check fails.
+
+    python -m benchmarks.bench_rate_limiter
+    python -m benchmarks.bench_rate_limiter --redis-url redis://localhost:6379
+    python -m benchmarks.bench_rate_limiter --fake-redis
+"""
+import argparse
+import asyncio
+import logging
+import random
+import sys
+import time
+import tracemalloc
+from typing import Dict, List
+
+from app.core.rate_limiter import RateLimiter, RedisRateLimit, SlidingWindowCounter, TokenBucket
+from benchmarks.common import latency_summary, print_table
+
+LIMIT = 100
+WINDOW = 3600.0
+
+class LegacyRateLimiter:
+    """The original limiter: a list of timestamps per user, rebuilt on every check."""
+
+    def __init__(self, limit: int, window: float):
+        self.limit = limit
+        self.window = window
+        self.requests: Dict[str, List[float]] = {}
+
+    def allow(self, key: str, now: float) -> bool:
+        window_start = now - self.window
+        if key in self.requests:
+            self.requests[key] = [t for t in self.requests[key] if t > window_start]
+        else:
+            self.requests[key] = []
+        if len(self.requests[key]) >= self.limit:
+            return False
+        self.requests[key].append(now)
+        return True
+
+IMPLEMENTATIONS = {
+    "legacy": LegacyRateLimiter,
+    "sliding_window": SlidingWindowCounter,
+    "token_bucket": TokenBucket
+}
+
+def _workload(users: int, checks: int, seed: int = 0) -> List[str]:
+    rng = random.Random(seed)
+    keys = [f"user-{i}" for i in range(users)]
+    # Every user is seen at least once, then a skewed tail of repeat visitors
+    stream = list(keys)
+    stream += [keys[int(rng.paretovariate(1.2)) % users] for _ in range(max(0, checks - users))]
+    return stream
+
+def _replay(limiter, stream: List[str], samples=None):
+    clock = time.perf_counter
+    step = 3 * WINDOW / len(stream)  # simulated clock: the stream spans three windows
+    now = 0.0
+    for key in stream:
+        now += step
+        if samples is None:
+            limiter.allow(key, now)
+        else:
+            started = clock()
+            limiter.allow(key, now)
+            samples.append(clock() - started)
+
+def _row(name: str, samples: List[float], state_mb: float) -> List:
+    """Table row from per-check seconds, in microseconds."""
+    summary = latency_summary([sample * 1000 for sample in samples])
+    return [name, summary["p50_ms"] * 1000, summary["p99_ms"] * 1000, summary["max_ms"] * 1000, state_mb]
+
+def run_local(name: str, stream: List[str]) -> List:
+    samples = []
+    _replay(IMPLEMENTATIONS[name](LIMIT, WINDOW), stream, samples)
+
+    # Separate pass: tracemalloc would distort the timings above
+    tracemalloc.start()
+    limiter = IMPLEMENTATIONS[name](LIMIT, WINDOW)
+    _replay(limiter, stream)
+    state_mb = tracemalloc.get_traced_memory()[0] / (1024 * 1024)
+    tracemalloc.stop()
+    return _row(name, samples, state_mb)
+
+def fake_remote(algorithm: str, limit: int, window: float, **fake_options) -> RedisRateLimit:
+    """A Redis limiter running its script in fakeredis instead of against a server."""
+    import fakeredis
+
+    remote = RedisRateLimit("redis://fakeredis", algorithm, limit, window)
+    remote._redis = fakeredis.FakeAsyncRedis(**fake_options)
+    remote._script = remote._redis.register_script(remote.script_source)
+    return remote
+
+async def check_script(algorithm: str) -> List[str]:
+    """Limit, key isolation, expiry and refill of one Lua script."""
+    failures = []
+    limit, window = 5, 0.5
+    remote = fake_remote(algorithm, limit, window)
+    try:
+        burst = [await remote.allow("a") for _ in range(limit + 2)]
+        if burst != [True] * limit + [False] * 2:
+            failures.append(f"{algorithm}: burst of {limit + 2} gave {burst}")
+        if not await remote.allow("b"):
+            failures.append(f"{algorithm}: a second key shares the first key's limit")
+        ttl = await remote._redis.pttl(remote.KEY_PREFIX + "a")
+        if not 0 < ttl <= window * 2 * 1000:
+            failures.append(f"{algorithm}: state TTL is {ttl}ms")
+        # Two windows later either algorithm has its full limit back
+        await asyncio.sleep(window * 2)
+        refilled = [await remote.allow("a") for _ in range(limit)]
+        if not all(refilled):
+            failures.append(f"{algorithm}: only {sum(refilled)} of {limit} allowed after refilling")
+    finally:
+        await remote.close()
+    return failures
+
+async def check_fallback(algorithm: str) -> List[str]:
+    """With Redis down, RateLimiter still enforces the limit per process and counts the errors."""
+    limiter = RateLimiter()
+    limiter.limit = 5
+    limiter.local = IMPLEMENTATIONS[algorithm](limiter.limit, WINDOW)
+    limiter.remote = fake_remote(algorithm, limiter.limit, WINDOW, connected=False)
+    # Every check logs the expected Redis failure
+    rate_limiter_logger = logging.getLogger("app.core.rate_limiter")
+    level = rate_limiter_logger.level
+    rate_limiter_logger.setLevel(logging.ERROR)
+    try:
+        allowed = [await limiter.check_rate_limit("user") for _ in range(limiter.limit + 1)]
+    finally:
+        rate_limiter_logger.setLevel(level)
+        await limiter.close()
+    failures = []
+    if allowed != [True] * limiter.limit + [False]:
+        failures.append(f"fallback/{algorithm}: got {allowed}")
+    if limiter.redis_errors != limiter.limit + 1:
+        failures.append(f"fallback/{algorithm}: {limiter.redis_errors} Redis errors counted")
+    return failures
+
+async def run_redis(url: str, algorithm: str, stream: List[str], fake: bool = False) -> List:
+    limiter = fake_remote(algorithm, LIMIT, WINDOW) if fake else RedisRateLimit(url, algorithm, LIMIT, WINDOW)
+    limiter.KEY_PREFIX = "ratelimit:bench:"
+    samples = []
+    try:
+        for key in stream:
+            started = time.perf_counter()
+            await limiter.allow(key)
+            samples.append(time.perf_counter() - started)
+    finally:
+        await limiter.close()
+    return _row(f"{'fakeredis' if fake else 'redis'}/{algorithm}", samples, float("nan"))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--checks", type=int, default=500_000)
+    parser.add_argument("--redis-url", help="also benchmark the Redis backend")
+    parser.add_argument("--redis-checks", type=int, default=20_000)
+    parser.add_argument("--fake-redis", action="store_true",
+                        help="check and measure the Redis scripts and fallback against fakeredis")
+    args = parser.parse_args()
+
+    failures = []
+    if args.fake_redis:
+        for algorithm in ("sliding_window", "token_bucket"):
+            failures += asyncio.run(check_script(algorithm))
+            failures += asyncio.run(check_fallback(algorithm))
+
+    stream = _workload(args.users, args.checks)
+    rows = [run_local(name, stream) for name in IMPLEMENTATIONS]
+
+    redis_stream = random.Random(1).sample(stream, min(args.redis_checks, len(stream)))
+    for algorithm in ("sliding_window", "token_bucket"):
+        if args.fake_redis:
+            rows.append(asyncio.run(run_redis(None, algorithm, redis_stream, fake=True)))
+        if args.redis_url:
+            rows.append(asyncio.run(run_redis(args.redis_url, algorithm, redis_stream)))
+
+    print(f"{args.users} users, {len(stream)} checks, limit {LIMIT}/{WINDOW:.0f}s")
+    print_table(["backend", "median us", "p99 us", "max us", "state MB"], rows)
+    if failures:
+        print(f"Redis limiter check failed: {'; '.join(failures)}", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
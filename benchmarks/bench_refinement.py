@@ -0,0 +1,116 @@
+"""Full-area versus edge-band tiled refinement for large images.
+
+Compares the previous refined-mode guided filter, which applied the
+coefficients to every full-resolution pixel, with the current band-limited
+tiled version in ``app.services.postprocessing``. Reports latency, peak RSS
+increase of one call (fresh process) and how far the two alphas differ.
+Latency and memory of the tiled version should follow the subject's edge
+length: compare ``--shape blob`` with ``--shape ring`` (twice the edge).
+
+    python -m benchmarks.bench_refinement
+    python -m benchmarks.bench_refinement --shape ring --sizes 6000x4000
+"""
+import argparse
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from app.config.settings import settings
+from app.models.schemas import MaskMode
+from app.services.postprocessing import mask_to_alpha
+from benchmarks.common import peak_memory_delta_mb, print_table, time_call
+
+DEFAULT_SIZES = ["3000x2000", "4000x3000", "6000x4000"]
+MASK_SHAPE = (1024, 1024)
+
+def legacy_guided_refine(probability: np.ndarray, guide: Image.Image, preview: Image.Image) -> np.ndarray:
+    """The refined mode before band tiling: full-resolution coefficient maps."""
+    width, height = guide.size
+    mask_h, mask_w = probability.shape
+    radius = max(1, settings.GUIDED_FILTER_RADIUS)
+    window = (2 * radius + 1, 2 * radius + 1)
+
+    gray = np.asarray(guide.convert("L"))
+    low_guide = cv2.resize(gray, (mask_w, mask_h), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low_guide *= 1.0 / 255
+
+    mean_i = cv2.boxFilter(low_guide, -1, window)
+    mean_p = cv2.boxFilter(probability, -1, window)
+    corr_ip = cv2.boxFilter(low_guide * probability, -1, window)
+    var_i = cv2.boxFilter(low_guide * low_guide, -1, window)
+    var_i -= mean_i * mean_i
+    var_i += settings.GUIDED_FILTER_EPS
+    a = corr_ip
+    a -= mean_i * mean_p
+    a /= var_i
+    b = mean_p
+    b -= a * mean_i
+    a = cv2.boxFilter(a, -1, window)
+    b = cv2.boxFilter(b, -1, window)
+    b *= 255.0
+    refined = cv2.resize(a, (width, height), interpolation=cv2.INTER_LINEAR)
+    refined *= gray
+    refined += cv2.resize(b, (width, height), interpolation=cv2.INTER_LINEAR)
+    np.maximum(refined, 0, out=refined)
+    return cv2.convertScaleAbs(refined)
+
+def current_refine(probability: np.ndarray, guide: Image.Image, preview: Image.Image) -> np.ndarray:
+    return mask_to_alpha(probability, guide.size, mode=MaskMode.REFINED, guide=guide, preview=preview)
+
+IMPLEMENTATIONS = {"full-area": legacy_guided_refine, "band-tiled": current_refine}
+
+def make_inputs(width: int, height: int, shape: str):
+    """Textured image, its model-input-sized preview and a soft-edged subject mask."""
+    ys, xs = np.mgrid[-1:1:MASK_SHAPE[0] * 1j, -1:1:MASK_SHAPE[1] * 1j]
+    radius = np.sqrt(xs ** 2 + ys ** 2)
+    if shape == "ring":
+        distance = 0.2 - np.abs(radius - 0.5)
+    else:
+        distance = 0.6 - radius
+    probability = (1 / (1 + np.exp(-40 * distance))).astype(np.float32)
+
+    subject = cv2.resize(probability, (width, height), interpolation=cv2.INTER_LINEAR)
+    rng = np.random.default_rng(0)
+    noise = rng.integers(0, 40, size=(height // 8, width // 8), dtype=np.uint8)
+    noise = cv2.resize(noise, (width, height), interpolation=cv2.INTER_NEAREST)
+    gray = (subject * 180 + 40).astype(np.uint8) + noise
+    image = Image.fromarray(np.dstack([gray, gray // 2 + 60, 255 - gray]))
+    # Stands in for the reduced-scale decode the pipeline feeds the model
+    preview = image.reduce(max(1, min(width, height) // MASK_SHAPE[0]))
+    return image, probability, preview
+
+def _measure(name: str, width: int, height: int, shape: str, measure: bool = False, state=None):
+    if not measure:
+        return make_inputs(width, height, shape)
+    IMPLEMENTATIONS[name](state[1], state[0], state[2])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--shape", choices=["blob", "ring"], default="blob")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--no-memory", action="store_true", help="skip the peak RSS runs")
+    args = parser.parse_args()
+
+    rows = []
+    for size in args.sizes:
+        width, height = (int(v) for v in size.split("x"))
+        image, probability, preview = make_inputs(width, height, args.shape)
+        megapixels = width * height / 1e6
+        reference = legacy_guided_refine(probability, image, preview)
+        for name, func in IMPLEMENTATIONS.items():
+            timing = time_call(lambda: func(probability, image, preview), repeat=args.repeat)
+            diff = np.abs(func(probability, image, preview).astype(np.int16) - reference)
+            peak = (float("nan") if args.no_memory
+                    else peak_memory_delta_mb(_measure, name, width, height, args.shape))
+            rows.append([
+                size, name, timing["median_ms"], timing["median_ms"] / megapixels, peak,
+                float(diff.mean()), int(diff.max())
+            ])
+
+    print(f"shape={args.shape}, tile={settings.REFINE_TILE_SIZE}, workers={settings.REFINE_WORKERS}")
+    print_table(["size", "impl", "median ms", "ms/MP", "peak +MB", "mean |diff|", "max |diff|"], rows)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Micro-benchmarks for each stage a request goes through.
+
+Times, per image size: decoding (full and JPEG draft) per input format,
+upload and header validation, content hashing, mask postprocessing per mask
+mode, compositing plus encoding per output format, and rate-limit checks.
+Results can be saved as a JSON baseline and later runs compared against it
+to catch regressions before deploying.
+
+    python -m benchmarks.bench_stages
+    python -m benchmarks.bench_stages --save-baseline benchmarks/stages.json
+    python -m benchmarks.bench_stages --baseline benchmarks/stages.json --tolerance 0.2
+"""
+import argparse
+import asyncio
+import io
+import time
+
+import numpy as np
+from PIL import Image
+from starlette.datastructures import Headers, UploadFile
+
+from app.config.settings import settings
+from app.core.rate_limiter import RateLimiter
+from app.models.schemas import ImageFormat, MaskMode
+from app.services.file_validator import FileValidator
+from app.services.postprocessing import mask_to_alpha, render_cutout
+from benchmarks.bench_postprocessing import make_inputs
+from benchmarks.common import add_baseline_arguments, latency_summary, print_table, report_baseline, time_call
+
+SIZES = [(1024, 768), (1920, 1080), (4000, 3000)]
+INPUT_FORMATS = ["JPEG", "PNG", "WEBP"]
+
+def encode_input(image: Image.Image, image_format: str) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format, quality=90)
+    return buffer.getvalue()
+
+def bench_decode(image: Image.Image, repeat: int):
+    """Full decode per input format, plus the reduced-scale JPEG decode the model path uses."""
+    input_size = (settings.MODEL_INPUT_SIZE, settings.MODEL_INPUT_SIZE)
+    for image_format in INPUT_FORMATS:
+        source = io.BytesIO(encode_input(image, image_format))
+        yield f"decode.{image_format.lower()}", time_call(lambda: FileValidator._load(source, None), repeat)
+        if image_format == "JPEG":
+            yield "decode.jpeg_draft", time_call(lambda: FileValidator._load(source, input_size), repeat)
+
+def bench_validation(image: Image.Image, repeat: int, loop: asyncio.AbstractEventLoop):
+    """Upload checks, the header-only open (including its executor hop) and the content digest."""
+    data = encode_input(image, "JPEG")
+    source = io.BytesIO(data)
+    upload = UploadFile(source, size=len(data), filename="photo.jpg",
+                        headers=Headers({"content-type": "image/jpeg"}))
+    yield "validate.upload", time_call(lambda: FileValidator.validate_image_file(upload), repeat)
+    yield "validate.header", time_call(
+        lambda: loop.run_until_complete(FileValidator.open_image(source)), repeat
+    )
+    yield "validate.digest", time_call(lambda: FileValidator._digest(source), repeat)
+
+def bench_postprocess(image: Image.Image, mask: np.ndarray, repeat: int):
+    for mode in MaskMode:
+        yield f"postprocess.{mode.value}", time_call(
+            lambda: mask_to_alpha(mask, image.size, mode, guide=image), repeat
+        )
+
+def bench_encode(image: Image.Image, mask: np.ndarray, repeat: int):
+    alpha = mask_to_alpha(mask, image.size)
+    for output_format in ImageFormat:
+        yield f"encode.{output_format.value}", time_call(
+            lambda: render_cutout(image, alpha, output_format), repeat
+        )
+
+def bench_rate_limit(loop: asyncio.AbstractEventLoop, checks: int = 20000, users: int = 5000):
+    """Per-check latency of the configured in-memory limiter across many users."""
+    limiter = RateLimiter()
+    limiter.remote = None
+    keys = [f"user-{i % users}" for i in range(checks)]
+
+    async def run():
+        samples = []
+        for key in keys:
+            started = time.perf_counter()
+            await limiter.check_rate_limit(key)
+            samples.append((time.perf_counter() - started) * 1000)
+        return samples
+
+    summary = latency_summary(loop.run_until_complete(run()))
+    return {"median_us": summary["p50_ms"] * 1000, "p99_us": summary["p99_ms"] * 1000}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--sizes", nargs="+", default=[f"{w}x{h}" for w, h in SIZES],
+                        help="image sizes as WIDTHxHEIGHT")
+    add_baseline_arguments(parser)
+    args = parser.parse_args()
+
+    loop = asyncio.new_event_loop()
+    rows = []
+    results = {}
+    for size in args.sizes:
+        width, height = (int(value) for value in size.split("x"))
+        image, mask = make_inputs(width, height)
+        megapixels = width * height / 1e6
+        stages = [
+            *bench_decode(image, args.repeat),
+            *bench_validation(image, args.repeat, loop),
+            *bench_postprocess(image, mask, args.repeat),
+            *bench_encode(image, mask, args.repeat)
+        ]
+        for stage, timing in stages:
+            rows.append([size, stage, timing["median_ms"], timing["min_ms"], timing["median_ms"] / megapixels])
+            results[f"{stage}.{size}.median_ms"] = timing["median_ms"]
+
+    rate_limit = bench_rate_limit(loop)
+    results["rate_limit.median_us"] = rate_limit["median_us"]
+    results["rate_limit.p99_us"] = rate_limit["p99_us"]
+    loop.close()
+
+    print_table(["size", "stage", "median ms", "min ms", "ms/MP"], rows)
+    print()
+    print_table(["rate limiter", "median us", "p99 us"],
+                [[settings.RATE_LIMIT_ALGORITHM, rate_limit["median_us"], rate_limit["p99_us"]]])
+    report_baseline(args, results, {"sizes": args.sizes, "repeat": args.repeat})
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""Image URL ingestion against the download-then-upload round trip, with a local stand-in image host.
+
+A threaded HTTP server on localhost plays the client's image host, sending
+each image at ``--bandwidth`` MB/s per connection after ``--latency-ms``.
+The API runs in-process with the stub model (as in ``bench_load``).
+``upload`` is what clients did before: download the image, then post it
+as a multipart upload; the in-process API has no network in between, so
+the upload's transfer time is added at ``--upload-bandwidth``. ``url``
+posts only the URL; the API downloads it, hashing and decoding as the
+bytes arrive. Both are run one request at a time (latency) and as one
+batch request of all the images (downloads overlap with inference of
+earlier items).
+
+    python -m benchmarks.bench_url_ingest
+    python -m benchmarks.bench_url_ingest --images 16 --bandwidth 5 --upload-bandwidth 2 --size 3000x2000
+"""
+import argparse
+import asyncio
+import logging
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+
+from benchmarks.common import add_baseline_arguments, latency_summary, make_upload, print_table, report_baseline
+
+CHUNK_SIZE = 16 * 1024
+
+def start_image_host(images: Dict[str, bytes], bandwidth_mb_s: float, latency_ms: float) -> ThreadingHTTPServer:
+    """Serve ``images`` by path, throttled per connection."""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            data = images.get(self.path)
+            if data is None:
+                self.send_response(404)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            time.sleep(latency_ms / 1000)
+            self.send_response(200)
+            self.send_header("Content-Type", "image/jpeg")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            started = time.perf_counter()
+            for offset in range(0, len(data), CHUNK_SIZE):
+                self.wfile.write(data[offset:offset + CHUNK_SIZE])
+                # Pace the body to the configured bandwidth
+                due = started + (offset + CHUNK_SIZE) / (bandwidth_mb_s * 1e6)
+                time.sleep(max(0.0, due - time.perf_counter()))
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+async def run(args) -> Dict:
+    import httpx
+
+    from app.core.auth import auth_manager
+    from app.core.startup import startup_state
+    from app.main import app
+    from benchmarks.stub_model import install_stub_model
+
+    install_stub_model()
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    width, height = map(int, args.size.split("x"))
+    images = {f"/image_{index}.jpg": make_upload(width, height, seed=index) for index in range(args.images)}
+    server = start_image_host(images, args.bandwidth, args.latency_ms)
+    host = f"http://127.0.0.1:{server.server_address[1]}"
+    urls = [host + path for path in images]
+    token = auth_manager.create_access_token({"sub": "bench"})
+    results: Dict = {}
+
+    try:
+        async with app.router.lifespan_context(app):
+            await startup_state.wait()
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None,
+                                         headers={"Authorization": f"Bearer {token}"}) as api, \
+                    httpx.AsyncClient(timeout=None) as downloader:
+
+                async def send(size: int):
+                    await asyncio.sleep(size / (args.upload_bandwidth * 1e6))
+
+                async def via_upload(url: str) -> float:
+                    started = time.perf_counter()
+                    data = (await downloader.get(url)).content
+                    await send(len(data))
+                    response = await api.post("/api/remove-background",
+                                              files={"file": ("image.jpg", data, "image/jpeg")})
+                    response.raise_for_status()
+                    return (time.perf_counter() - started) * 1000
+
+                async def via_url(url: str) -> float:
+                    started = time.perf_counter()
+                    response = await api.post("/api/remove-background", data={"url": url})
+                    response.raise_for_status()
+                    return (time.perf_counter() - started) * 1000
+
+                async def batch_upload() -> float:
+                    started = time.perf_counter()
+                    # The client downloads everything (concurrently) before it can upload
+                    bodies = await asyncio.gather(*(downloader.get(url) for url in urls))
+                    files = [("files", (f"image_{index}.jpg", body.content, "image/jpeg"))
+                             for index, body in enumerate(bodies)]
+                    await send(sum(len(body.content) for body in bodies))
+                    response = await api.post("/api/remove-background/batch", files=files)
+                    response.raise_for_status()
+                    return (time.perf_counter() - started) * 1000
+
+                async def batch_url() -> float:
+                    started = time.perf_counter()
+                    response = await api.post("/api/remove-background/batch", data={"urls": urls})
+                    response.raise_for_status()
+                    return (time.perf_counter() - started) * 1000
+
+                # Warm-up (the mask cache is off, so repeats are not hits)
+                await via_url(urls[0])
+                await via_upload(urls[0])
+                for name, func in (("upload", via_upload), ("url", via_url)):
+                    results[name] = [await func(url) for url in urls]
+                results["batch_upload"] = [await batch_upload()]
+                results["batch_url"] = [await batch_url()]
+    finally:
+        server.shutdown()
+    results["image_bytes"] = sum(len(data) for data in images.values()) / len(images)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--images", type=int, default=8)
+    parser.add_argument("--size", default="1920x1080", help="image size as WIDTHxHEIGHT")
+    parser.add_argument("--bandwidth", type=float, default=10.0, help="MB/s per connection from the image host")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="image host time to first byte")
+    parser.add_argument("--upload-bandwidth", type=float, default=10.0, help="MB/s from the client to the API")
+    add_baseline_arguments(parser)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="rmbg-bench-") as scratch:
+        os.environ.update({
+            "INFERENCE_MODE": "local",
+            "MODEL_OFFLINE": "true",
+            "INFERENCE_ARTIFACT_DIR": os.path.join(scratch, "artifacts"),
+            "RATE_LIMIT_BACKEND": "memory",
+            "RATE_LIMIT_REQUESTS": str(10 ** 9),
+            "MASK_CACHE_ENABLED": "false",
+            "JOB_QUEUE_BACKEND": "sqlite",
+            "JOB_SQLITE_PATH": os.path.join(scratch, "jobs.db"),
+            "JOB_STORAGE_DIR": os.path.join(scratch, "jobs"),
+            # The stand-in host is on localhost
+            "URL_FETCH_ALLOW_PRIVATE": "true"
+        })
+        results = asyncio.run(run(args))
+
+    rows = []
+    metrics = {}
+    for name in ("upload", "url"):
+        summary = latency_summary(results[name])
+        rows.append([f"single {name}", args.images, summary["p50_ms"], summary["p95_ms"], summary["max_ms"]])
+        metrics[f"single_{name}.p50_ms"] = summary["p50_ms"]
+    for name in ("batch_upload", "batch_url"):
+        elapsed: List[float] = results[name]
+        rows.append([name.replace("_", " "), args.images, elapsed[0], elapsed[0], elapsed[0]])
+        metrics[f"{name}.ms"] = elapsed[0]
+
+    print(f"{args.images} images of {args.size} ({results['image_bytes'] / 1e6:.2f}MB each) at "
+          f"{args.bandwidth:g}MB/s per connection, {args.latency_ms:g}ms to first byte, "
+          f"uploads at {args.upload_bandwidth:g}MB/s")
+    print_table(["mode", "images", "p50 ms", "p95 ms", "max ms"], rows)
+    report_baseline(args, metrics, {"images": args.images, "size": args.size, "bandwidth": args.bandwidth,
+                                    "latency_ms": args.latency_ms, "upload_bandwidth": args.upload_bandwidth})
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""Shared helpers for the benchmark scripts.
+
+Benchmarks are plain scripts run from the repository root, e.g.
+``python -m benchmarks.bench_postprocessing``.
+"""
+import io
+import json
+import multiprocessing
+import platform
+import resource
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+from PIL import Image
+
+def _proc_status_mb(field: str) -> float:
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) / 1024
+    raise KeyError(field)
+
+def current_rss_mb() -> float:
+    """Resident set size of this process in MB (0 where unavailable)."""
+    try:
+        return _proc_status_mb("VmRSS")
+    except (OSError, KeyError):
+        return 0.0
+
+def peak_rss_mb() -> float:
+    """High-water resident set size of this process in MB."""
+    try:
+        return _proc_status_mb("VmHWM")
+    except (OSError, KeyError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is bytes on macOS and kilobytes on Linux
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def reset_peak_rss() -> bool:
+    """Reset the RSS high-water mark (Linux only); returns whether it worked."""
+    try:
+        with open("/proc/self/clear_refs", "w") as clear_refs:
+            clear_refs.write("5")
+        return True
+    except OSError:
+        return False
+
+def time_call(func: Callable, repeat: int = 5, warmup: int = 1) -> Dict[str, float]:
+    """Time a callable and return median/min/max in milliseconds."""
+    for _ in range(warmup):
+        func()
+
+    samples: List[float] = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+
+    return {
+        "median_ms": statistics.median(samples),
+        "min_ms": min(samples),
+        "max_ms": max(samples)
+    }
+
+def _isolated_target(queue, func, args):
+    setup = func(*args, measure=False)
+    baseline = current_rss_mb() if reset_peak_rss() else peak_rss_mb()
+    func(*args, measure=True, state=setup)
+    queue.put(peak_rss_mb() - baseline)
+
+def peak_memory_delta_mb(func: Callable, *args) -> float:
+    """Run ``func`` in a fresh process and report how far it raised peak RSS.
+
+    ``func(*args, measure=False)`` prepares inputs and returns them; the
+    measured call is ``func(*args, measure=True, state=<inputs>)``. Running in
+    a new process, with the high-water mark reset after setup where the OS
+    allows it, keeps earlier allocations from hiding the peak.
+    """
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=_isolated_target, args=(queue, func, args))
+    process.start()
+    delta = queue.get()
+    process.join()
+    return delta
+
+def make_upload(width: int, height: int, seed: int) -> bytes:
+    """A photo-like JPEG: smooth background with a brighter noisy blob off-centre."""
+    rng = np.random.default_rng(seed)
+    ys, xs = np.mgrid[0:height, 0:width].astype(np.float32)
+    cx, cy = width * rng.uniform(0.35, 0.65), height * rng.uniform(0.35, 0.65)
+    radius = min(width, height) * rng.uniform(0.2, 0.35)
+    blob = np.exp(-(((xs - cx) ** 2 + (ys - cy) ** 2) / (2 * radius ** 2)))
+    base = 40 + 60 * (xs / width)[..., None] + 140 * blob[..., None]
+    pixels = base + rng.normal(0, 8, (height, width, 3))
+    buffer = io.BytesIO()
+    Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8)).save(buffer, format="JPEG", quality=90)
+    return buffer.getvalue()
+
+def print_table(headers: List[str], rows: List[List]) -> None:
+    """Print rows as a simple aligned text table."""
+    cells = [[str(h) for h in headers]] + [
+        [f"{c:.2f}" if isinstance(c, float) else str(c) for c in row] for row in rows
+    ]
+    widths = [max(len(row[i]) for row in cells) for i in range(len(headers))]
+    for index, row in enumerate(cells):
+        print("  ".join(cell.rjust(width) for cell, width in zip(row, widths)))
+        if index == 0:
+            print("  ".join("-" * width for width in widths))
+
+def latency_summary(samples_ms: List[float]) -> Dict[str, float]:
+    """p50/p95/p99, mean and max of a list of millisecond samples."""
+    ordered = sorted(samples_ms)
+    if not ordered:
+        return {"p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0, "mean_ms": 0.0, "max_ms": 0.0}
+
+    def percentile(fraction: float) -> float:
+        return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+    return {
+        "p50_ms": percentile(0.50),
+        "p95_ms": percentile(0.95),
+        "p99_ms": percentile(0.99),
+        "mean_ms": statistics.fmean(ordered),
+        "max_ms": ordered[-1]
+    }
+
+# Metrics whose name ends with one of these get better as they grow;
+# everything else (latencies, memory) gets better as it shrinks.
+HIGHER_IS_BETTER = ("_per_s",)
+
+def save_baseline(path: str, metrics: Dict[str, float], config: Optional[Dict] = None) -> None:
+    """Write flat ``name -> value`` results plus the run configuration as JSON."""
+    with open(path, "w") as baseline:
+        json.dump({
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "host": {"python": platform.python_version(), "machine": platform.machine(),
+                     "cpus": multiprocessing.cpu_count()},
+            "config": config or {},
+            "metrics": metrics
+        }, baseline, indent=2, sort_keys=True)
+    print(f"Baseline written to {path}")
+
+def compare_to_baseline(path: str, metrics: Dict[str, float], tolerance: float,
+                        config: Optional[Dict] = None, min_delta: float = 0.0) -> bool:
+    """Print current results against a saved baseline.
+
+    A metric regresses when it is worse than the baseline by more than
+    ``tolerance`` (a fraction, 0.1 = 10%) and by more than ``min_delta`` in
+    absolute terms, which keeps timer noise on tiny values from failing a
+    run. Returns whether nothing regressed.
+    """
+    with open(path) as baseline_file:
+        baseline = json.load(baseline_file)
+    if config is not None and baseline.get("config", {}) != config:
+        print(f"warning: {path} was recorded with a different configuration: {baseline.get('config')}")
+
+    rows = []
+    regressions = 0
+    for name, value in sorted(metrics.items()):
+        previous = baseline["metrics"].get(name)
+        if previous is None:
+            rows.append([name, "-", value, "-", "new"])
+            continue
+        change = (value - previous) / previous if previous else 0.0
+        worse = -change if name.endswith(HIGHER_IS_BETTER) else change
+        if abs(value - previous) <= min_delta:
+            status = "ok"
+        else:
+            status = "REGRESSED" if worse > tolerance else ("improved" if worse < -tolerance else "ok")
+        regressions += status == "REGRESSED"
+        rows.append([name, float(previous), float(value), f"{change * 100:+.1f}%", status])
+
+    print_table(["metric", "baseline", "current", "change", "status"], rows)
+    print(f"{regressions} regression(s) beyond {tolerance * 100:.0f}% against {path}")
+    return regressions == 0
+
+def add_baseline_arguments(parser) -> None:
+    """The ``--save-baseline`` / ``--baseline`` / ``--tolerance`` options shared by the suite."""
+    parser.add_argument("--save-baseline", metavar="PATH", help="write the results as a JSON baseline")
+    parser.add_argument("--baseline", metavar="PATH", help="compare against a saved baseline, exit 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=0.15,
+                        help="allowed regression as a fraction of the baseline (default 0.15)")
+    parser.add_argument("--min-delta", type=float, default=0.05,
+                        help="ignore absolute changes up to this size, in the metric's unit (default 0.05)")
+
+def report_baseline(args, metrics: Dict[str, float], config: Optional[Dict] = None) -> None:
+    """Save and/or compare results as requested on the command line; exits 1 on regression."""
+    if args.save_baseline:
+        save_baseline(args.save_baseline, metrics, config)
+    if args.baseline and not compare_to_baseline(args.baseline, metrics, args.tolerance, config, args.min_delta):
+        sys.exit(1)
@@ -0,0 +1,87 @@
+"""Deterministic stand-in for RMBG-2.0 so the API can be benchmarked offline.
+
+The stub keeps the shape of the real pipeline: the processor resizes and
+normalises to ``MODEL_INPUT_SIZE`` like the RMBG processor, and the model
+is a small fixed convolution stack producing one logit map per image, so
+preprocessing, batching, the inference backend and postprocessing all run
+for real. Only the weights are fake, and they never touch the network.
+
+    from benchmarks.stub_model import install_stub_model
+    install_stub_model()  # before the app's lifespan starts
+"""
+import numpy as np
+import torch
+from PIL import Image
+
+from app.config.settings import settings
+from app.core.inference_backends import create_backend
+from app.core.model_manager import ModelManager
+
+IMAGENET_MEAN = (0.485, 0.456, 0.406)
+IMAGENET_STD = (0.229, 0.224, 0.225)
+
+class StubProcessor:
+    """Resize to the model input size and normalise, like the RMBG processor."""
+
+    # Named like a transformers image processor's settings, which the
+    # native preprocessing path reads
+    resample = Image.Resampling.BILINEAR
+
+    def __init__(self, size: int):
+        self.size = size
+        self.image_mean = np.array(IMAGENET_MEAN, dtype=np.float32)
+        self.image_std = np.array(IMAGENET_STD, dtype=np.float32)
+
+    def __call__(self, images, return_tensors: str = "pt"):
+        batch = np.stack([
+            (np.asarray(image.convert("RGB").resize((self.size, self.size), self.resample),
+                        dtype=np.float32) / 255.0 - self.image_mean) / self.image_std
+            for image in images
+        ])
+        return {"pixel_values": torch.from_numpy(batch).permute(0, 3, 1, 2).contiguous()}
+
+class StubSegmentationModel(torch.nn.Module):
+    """Fixed-weight convolutions: foreground is whatever is brighter than its surroundings."""
+
+    def __init__(self, channels: int = 8):
+        super().__init__()
+        generator = torch.Generator().manual_seed(0)
+        self.encoder = torch.nn.Conv2d(3, channels, 3, stride=2, padding=1)
+        self.decoder = torch.nn.Conv2d(channels, 1, 3, padding=1)
+        with torch.no_grad():
+            self.encoder.weight.copy_(torch.randn(self.encoder.weight.shape, generator=generator) * 0.1)
+            self.encoder.bias.zero_()
+            self.decoder.weight.fill_(1.0 / (channels * 9))
+            self.decoder.bias.zero_()
+
+    def forward(self, pixel_values: torch.Tensor):
+        features = torch.relu(self.encoder(pixel_values))
+        logits = self.decoder(features)
+        logits = logits - logits.mean(dim=(2, 3), keepdim=True)
+        # Same output convention as RMBG-2.0: a list of logit maps
+        return [torch.nn.functional.interpolate(logits * 8, size=pixel_values.shape[-2:], mode="bilinear")]
+
+def _load_stub_weights(self: ModelManager, source: str, local_only: bool):
+    with self._timed("load_weights"):
+        self.model = StubSegmentationModel()
+    with self._timed("load_processor"):
+        self.processor = StubProcessor(settings.MODEL_INPUT_SIZE)
+
+    self.model.to(self.device)
+    self.model.eval()
+
+    with self._timed("prepare_backend"):
+        self.backend = create_backend(self.backend_name, self.device, self.model_id)
+        self.backend.prepare(self.model)
+        if self.backend.replaces_model:
+            self.model = None
+
+def install_stub_model() -> None:
+    """Make every ``ModelManager`` in this process load the stub instead of RMBG-2.0.
+
+    Only affects this process, so the API must run with ``INFERENCE_MODE=local``;
+    set ``MODEL_OFFLINE=true`` too so no Hugging Face login is attempted, and
+    point ``INFERENCE_ARTIFACT_DIR`` at a scratch directory so traced or ONNX
+    artifacts of the stub never replace the real model's.
+    """
+    ModelManager._load_weights = _load_stub_weights
@@ -0,0 +1,202 @@
+"""Find the CPU thread topology with the best throughput on this host.
+
+Sweeps torch intra-op threads, torch inter-op threads, image executor
+workers (INFERENCE_WORKERS) and BATCH_MAX_SIZE against a synthetic
+workload: concurrent photo-like JPEG uploads through the same pipeline as
+``/api/remove-background``. Each configuration runs in a fresh process,
+since torch fixes its inter-op thread count once per process, and is
+scored by throughput and p99 latency. The best configuration (the highest
+throughput, among those within ``--max-p99-ms`` if given) is written to
+TUNING_FILE, which ``Settings`` reads at startup. The workload (and the
+stub model behind ``--stub``) is shared with the rest of the benchmark
+suite; the API itself only needs the tuning file.
+
+    python -m benchmarks.tune
+    python -m benchmarks.tune --threads 2 4 8 --workers 2 4 --batch-sizes 1 4 --concurrency 16
+    python -m benchmarks.tune --max-p99-ms 2500 --output /etc/rmbg/tuning.json
+    python -m benchmarks.tune --stub --requests 24     # try the sweep without the model
+"""
+import argparse
+import asyncio
+import io
+import itertools
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from app.config.settings import settings
+from app.core.thread_topology import available_cpus
+from benchmarks.common import latency_summary, make_upload
+
+# Setting names in the order the sweep varies them
+TUNED = ["TORCH_NUM_THREADS", "TORCH_INTEROP_THREADS", "INFERENCE_WORKERS", "BATCH_MAX_SIZE"]
+
+def _powers_of_two(limit: int) -> List[int]:
+    values = [2 ** exponent for exponent in range(limit.bit_length()) if 2 ** exponent <= limit]
+    return sorted(set(values + [limit]))
+
+async def run_workload(args) -> Dict:
+    """Serve ``args.requests`` uploads at ``args.concurrency`` with the settings of this process."""
+    from app.core.inference_pool import inference_pool
+    from app.core.model_registry import model_registry
+    from app.models.schemas import ImageFormat, MaskMode
+    from app.services.pipeline import process_source
+    from app.services.postprocessing import MASK_THRESHOLD
+
+    uploads = [make_upload(*map(int, size.split("x")), seed=seed) for seed, size in enumerate(args.sizes)]
+
+    async def upload(index: int) -> float:
+        started = time.perf_counter()
+        async with inference_pool.reserve():
+            await process_source(io.BytesIO(uploads[index % len(uploads)]), ImageFormat.PNG,
+                                 MaskMode.BINARY, MASK_THRESHOLD)
+        return (time.perf_counter() - started) * 1000
+
+    inference_pool.start()
+    try:
+        await model_registry.preload()
+        # One round at full concurrency warms the executors and batch sizes up
+        await asyncio.gather(*(upload(index) for index in range(args.concurrency)))
+        pending = iter(range(args.requests))
+        latencies: List[float] = []
+
+        async def client():
+            for index in pending:
+                latencies.append(await upload(index))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+    finally:
+        await model_registry.close()
+        inference_pool.shutdown()
+
+    summary = latency_summary(latencies)
+    return {"requests_per_s": len(latencies) / elapsed, "p50_ms": summary["p50_ms"], "p99_ms": summary["p99_ms"]}
+
+def run_trial(args):
+    """Trial process: apply the topology from the environment, run the workload, print the result."""
+    import logging
+    from app.core.thread_topology import thread_topology
+
+    logging.basicConfig(level=logging.WARNING)
+    thread_topology.apply()
+    if args.stub:
+        from benchmarks.stub_model import install_stub_model
+        install_stub_model()
+    result = asyncio.run(run_workload(args))
+    print(json.dumps(result))
+
+def measure(config: Dict[str, int], args, scratch: str) -> Optional[Dict]:
+    """Run one configuration in a fresh process; ``None`` if it failed or timed out."""
+    env = {
+        **os.environ,
+        **{name: str(value) for name, value in config.items()},
+        # Trials measure exactly their configuration, with no cache hits or log file
+        "TUNING_FILE": "",
+        "INFERENCE_MODE": "local",
+        "MASK_CACHE_ENABLED": "false",
+        "LOG_FILE": "",
+        "LOG_LEVEL": "WARNING",
+        "INFERENCE_MAX_IN_FLIGHT": str(max(args.concurrency * 2, 32))
+    }
+    if args.stub:
+        env.update(MODEL_OFFLINE="true", INFERENCE_ARTIFACT_DIR=os.path.join(scratch, "artifacts"))
+    command = [sys.executable, "-m", "benchmarks.tune", "--trial", "--requests", str(args.requests),
+               "--concurrency", str(args.concurrency), "--sizes", *args.sizes]
+    if args.stub:
+        command.append("--stub")
+    try:
+        completed = subprocess.run(command, env=env, capture_output=True, text=True, timeout=args.trial_timeout)
+    except subprocess.TimeoutExpired:
+        print(f"  timed out after {args.trial_timeout}s", file=sys.stderr)
+        return None
+    if completed.returncode != 0:
+        print(completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else
+              f"  exited with {completed.returncode}", file=sys.stderr)
+        return None
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def write_tuning(path: str, best: Dict, trials: List[Dict], args):
+    document = {
+        "settings": {name: best[name] for name in TUNED},
+        "cpus": available_cpus(),
+        "tuned_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "workload": {"requests": args.requests, "concurrency": args.concurrency, "sizes": args.sizes,
+                     "stub": args.stub, "max_p99_ms": args.max_p99_ms},
+        "result": {key: best[key] for key in ("requests_per_s", "p50_ms", "p99_ms")},
+        "trials": trials
+    }
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    # Written next to the target and renamed, so a starting API never reads half a file
+    with tempfile.NamedTemporaryFile("w", dir=directory, suffix=".tmp", delete=False) as tmp:
+        json.dump(document, tmp, indent=2)
+    os.replace(tmp.name, path)
+
+def main():
+    cpus = available_cpus()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", nargs="+", type=int, default=_powers_of_two(cpus),
+                        help="torch intra-op thread counts to try")
+    parser.add_argument("--interop-threads", nargs="+", type=int, default=[1],
+                        help="torch inter-op thread counts to try (forward passes are already serialised)")
+    parser.add_argument("--workers", nargs="+", type=int, default=sorted({1, max(1, cpus // 2), cpus}),
+                        help="INFERENCE_WORKERS values to try")
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[1, 4, 8],
+                        help="BATCH_MAX_SIZE values to try")
+    parser.add_argument("--requests", type=int, default=64, help="measured requests per configuration")
+    parser.add_argument("--concurrency", type=int, default=8, help="requests in flight at once")
+    parser.add_argument("--sizes", nargs="+", default=["1920x1080"], help="upload sizes as WIDTHxHEIGHT")
+    parser.add_argument("--max-p99-ms", type=float, default=0,
+                        help="only pick configurations whose p99 stays below this (0 = no limit)")
+    parser.add_argument("--trial-timeout", type=float, default=900, help="seconds before a trial is abandoned")
+    parser.add_argument("--output", default=settings.TUNING_FILE or "tuning.json",
+                        help="where to write the best configuration")
+    parser.add_argument("--dry-run", action="store_true", help="measure and report without writing")
+    parser.add_argument("--stub", action="store_true",
+                        help="use the deterministic stub model (no download, not representative)")
+    parser.add_argument("--trial", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.trial:
+        run_trial(args)
+        return
+
+    grid = list(itertools.product(args.threads, args.interop_threads, args.workers, args.batch_sizes))
+    print(f"{len(grid)} configurations on {cpus} CPUs, {args.requests} requests each at concurrency "
+          f"{args.concurrency}")
+    header = ("threads", "interop", "workers", "batch", "req/s", "p50 ms", "p99 ms")
+    print("  ".join(f"{column:>8}" for column in header), flush=True)
+
+    trials = []
+    with tempfile.TemporaryDirectory(prefix="rmbg-tune-") as scratch:
+        for values in grid:
+            config = dict(zip(TUNED, values))
+            result = measure(config, args, scratch)
+            if result is None:
+                print("  ".join(f"{value:>8}" for value in values) + "    failed", flush=True)
+                continue
+            trials.append({**config, **result})
+            print("  ".join(f"{value:>8}" for value in values) + "  " + "  ".join(
+                f"{result[key]:>8.2f}" for key in ("requests_per_s", "p50_ms", "p99_ms")), flush=True)
+
+    eligible = [trial for trial in trials if not args.max_p99_ms or trial["p99_ms"] <= args.max_p99_ms]
+    if not eligible:
+        raise SystemExit("No configuration completed" if not trials else
+                         f"No configuration kept p99 under {args.max_p99_ms:.0f}ms")
+    best = max(eligible, key=lambda trial: (trial["requests_per_s"], -trial["p99_ms"]))
+    summary = ", ".join(f"{name}={best[name]}" for name in TUNED)
+    print(f"\nBest: {summary} ({best['requests_per_s']:.2f} req/s, p99 {best['p99_ms']:.0f}ms)")
+    if args.dry_run:
+        return
+    write_tuning(args.output, best, trials, args)
+    print(f"Wrote {args.output}; the API reads it at startup (environment variables still take precedence)")
+
+if __name__ == "__main__":
+    main()